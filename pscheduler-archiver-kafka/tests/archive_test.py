@@ -0,0 +1,179 @@
+"""
+tests for the archive command, run against a stand-in for the Kafka
+producer
+"""
+
+import imp
+import os
+import sys
+import types
+import unittest
+
+
+class StubKafkaError(Exception):
+    pass
+
+
+class StubFuture(object):
+
+    def __init__(self, producer, value):
+        self.producer = producer
+        self.value = value
+
+    def get(self, timeout=None):
+        StubProducer.outstanding -= 1
+        self.producer.acknowledged.append(self.value)
+        if '"ack"' in self.value:
+            raise StubKafkaError("Acknowledgement failed")
+
+
+class StubProducer(object):
+
+    """
+    Records what happens to it instead of talking to Kafka.
+    """
+
+    created = []
+    outstanding = 0
+    most_outstanding = 0
+
+    def __init__(self, bootstrap_servers=None, **options):
+        self.servers = bootstrap_servers
+        self.options = options
+        self.sent = []
+        self.acknowledged = []
+        self.closed = False
+        StubProducer.created.append(self)
+
+    def send(self, topic, value):
+        assert not self.closed, "Sent with a closed producer"
+        if '"send"' in value:
+            raise StubKafkaError("Send failed")
+        self.sent.append((topic, value))
+        StubProducer.outstanding += 1
+        StubProducer.most_outstanding = max(StubProducer.most_outstanding,
+                                            StubProducer.outstanding)
+        return StubFuture(self, value)
+
+    def close(self, timeout=None):
+        self.closed = True
+
+
+def load_archiver():
+    """
+    Load the archive program as a module with the stand-in producer.
+    """
+    kafka = types.ModuleType("kafka")
+    kafka.KafkaProducer = StubProducer
+    errors = types.ModuleType("kafka.errors")
+    errors.KafkaError = StubKafkaError
+    kafka.errors = errors
+
+    saved = dict((name, sys.modules.get(name)) for name in ["kafka", "kafka.errors"])
+    sys.modules["kafka"] = kafka
+    sys.modules["kafka.errors"] = errors
+    try:
+        path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "..", "kafka", "archive")
+        return imp.load_source("kafka_archive", path)
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                del sys.modules[name]
+            else:
+                sys.modules[name] = module
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        StubProducer.created = []
+        StubProducer.outstanding = 0
+        StubProducer.most_outstanding = 0
+        self.archiver = load_archiver()
+
+    def job(self, result, attempts=0, **data):
+        job_data = { "schema": 2, "topic": "topic", "server": "server:9092" }
+        job_data.update(data)
+        return { "data": job_data, "result": result, "attempts": attempts }
+
+
+    def test_ordering(self):
+        jobs = [ self.job({"n": n}, **{"max-in-flight": 3}) for n in range(10) ]
+        results = self.archiver.archive_batch(jobs)
+        self.assertEqual(results, [ {"succeeded": True} ] * 10)
+        self.assertEqual(len(StubProducer.created), 1)
+        producer = StubProducer.created[0]
+        self.assertEqual([ value for topic, value in producer.sent ],
+                         [ '{"n": %d}' % (n) for n in range(10) ])
+        self.assertEqual(producer.acknowledged, [ value for topic, value in producer.sent ])
+
+
+    def test_in_flight_window(self):
+        for window in [ 1, 4, 100 ]:
+            StubProducer.most_outstanding = 0
+            jobs = [ self.job({"n": n}, **{"max-in-flight": window}) for n in range(20) ]
+            self.archiver.archive_batch(jobs)
+            self.assertEqual(StubProducer.most_outstanding, min(window, 20))
+            self.assertEqual(StubProducer.outstanding, 0)
+
+
+    def test_per_result_failure(self):
+        jobs = [
+            self.job({"n": 0}),
+            self.job({"fail": "ack"}),
+            self.job({"n": 2}),
+            self.job({"fail": "send"}),
+            self.job({"n": 4}),
+            self.job({"n": 5}, schema=3)
+        ]
+        results = self.archiver.archive_batch(jobs)
+        self.assertEqual([ result["succeeded"] for result in results ],
+                         [ True, False, True, False, True, False ])
+        self.assertTrue("Acknowledgement failed" in results[1]["error"])
+        self.assertTrue("Send failed" in results[3]["error"])
+        self.assertTrue("Unsupported schema" in results[5]["error"])
+        self.assertFalse("retry" in results[1])
+
+
+    def test_retry(self):
+        policy = [ {"attempts": 2, "wait": "PT1M"} ]
+        results = self.archiver.archive_batch([
+            self.job({"fail": "ack"}, attempts=0, **{"retry-policy": policy}),
+            self.job({"fail": "ack"}, attempts=2, **{"retry-policy": policy})
+        ])
+        self.assertEqual(results[0]["retry"], "PT1M")
+        self.assertFalse("retry" in results[1])
+
+
+    def test_producer_reuse(self):
+        self.archiver.archive(self.job({"n": 0}))
+        self.archiver.archive(self.job({"n": 1}, topic="other"))
+        self.assertEqual(len(StubProducer.created), 1)
+        self.archiver.archive(self.job({"n": 2}, **{"linger-ms": 5}))
+        self.assertEqual(len(StubProducer.created), 2)
+        self.assertEqual(StubProducer.created[1].options, {"linger_ms": 5})
+
+
+    def test_failed_producer_replaced_once(self):
+        # Both sends of the first producer fail, the second after a
+        # new producer has replaced it.  Only the first should go.
+        jobs = [
+            self.job({"fail": "ack"}, **{"max-in-flight": 2}),
+            self.job({"fail": "ack"}, **{"max-in-flight": 2}),
+            self.job({"n": 2}, **{"max-in-flight": 2}),
+            self.job({"n": 3}, **{"max-in-flight": 2})
+        ]
+        results = self.archiver.archive_batch(jobs)
+        self.assertEqual([ result["succeeded"] for result in results ],
+                         [ False, False, True, True ])
+        self.assertEqual(len(StubProducer.created), 2)
+        first, second = StubProducer.created
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(len(second.sent), 2)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
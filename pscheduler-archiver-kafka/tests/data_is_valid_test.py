@@ -0,0 +1,64 @@
+"""
+tests for the data-is-valid command
+"""
+
+import pscheduler
+import unittest
+
+class DataIsValidTest(pscheduler.ArchiverDataIsValidUnitTest):
+    name = 'kafka'
+
+    """
+    Data validation tests.
+    """
+
+
+    def test_schema(self):
+        self.assert_cmd('{"topic": "t", "server": "s"}')
+        self.assert_cmd('{"schema": 1, "topic": "t", "server": "s"}')
+        self.assert_cmd('{"schema": 2, "topic": "t", "server": "s"}')
+        self.assert_cmd('{"schema": 3, "topic": "t", "server": "s"}', expected_valid=False)
+
+
+    def test_required(self):
+        for schema in [ 1, 2 ]:
+            self.assert_cmd('{"schema": %d, "topic": "t"}' % (schema), expected_valid=False)
+            self.assert_cmd('{"schema": %d, "server": "s"}' % (schema), expected_valid=False)
+        self.assert_cmd('{"topic": 1, "server": "s"}', expected_valid=False)
+
+
+    def test_v1_rejects_v2(self):
+        for item in [ '"linger-ms": 5', '"batch-size": 16384', '"max-in-flight": 10',
+                      '"connection-expires": "PT5M"',
+                      '"retry-policy": [{"attempts": 3, "wait": "PT1M"}]' ]:
+            self.assert_cmd('{"topic": "t", "server": "s", %s}' % (item), expected_valid=False)
+            self.assert_cmd('{"schema": 1, "topic": "t", "server": "s", %s}' % (item),
+                            expected_valid=False)
+
+
+    def test_v2(self):
+        self.assert_cmd('''{"schema": 2, "topic": "t", "server": "s",
+                            "linger-ms": 0, "batch-size": 16384, "max-in-flight": 10,
+                            "connection-expires": "PT5M",
+                            "retry-policy": [{"attempts": 3, "wait": "PT1M"}]}''')
+        self.assert_cmd('{"schema": 2, "topic": "t", "server": "s", "linger-ms": -1}',
+                        expected_valid=False)
+        self.assert_cmd('{"schema": 2, "topic": "t", "server": "s", "batch-size": 0}',
+                        expected_valid=False)
+        self.assert_cmd('{"schema": 2, "topic": "t", "server": "s", "max-in-flight": 0}',
+                        expected_valid=False)
+        self.assert_cmd('{"schema": 2, "topic": "t", "server": "s", "connection-expires": "soon"}',
+                        expected_valid=False)
+        self.assert_cmd('{"schema": 2, "topic": "t", "server": "s", "retry-policy": []',
+                        expected_valid=False)
+
+
+    def test_additional(self):
+        self.assert_cmd('{"topic": "t", "server": "s", "invalid-property": 123}', expected_valid=False)
+        self.assert_cmd('{"schema": 2, "topic": "t", "server": "s", "invalid-property": 123}',
+                        expected_valid=False)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,12 @@
+"""
+tests for the enumerate command.
+"""
+
+import pscheduler
+import unittest
+
+class EnumerateTest(pscheduler.ArchiverEnumerateUnitTest):
+    name = 'kafka'
+        
+if __name__ == '__main__':
+    unittest.main()
@@ -264,6 +264,7 @@ make -C api-server \
      "DSN_FILE=%{dsn_file}" \
      "LIMITS_FILE=%{_pscheduler_limit_config}" \
      "RUN_DIR=%{run_dir}" \
+     "CLASSES_DIR=%{_pscheduler_classes}" \
      install
 
 mkdir -p ${RPM_BUILD_ROOT}/%{server_conf_dir}
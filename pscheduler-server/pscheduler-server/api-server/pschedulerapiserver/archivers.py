@@ -49,9 +49,8 @@ def archivers_name_data_is_valid(name):
         return bad_request("No archive data provided")
 
     try:
-        returncode, stdout, stderr = pscheduler.run_program(
-            ["pscheduler", "internal", "invoke", "archiver",
-             name, "data-is-valid"],
+        returncode, stdout, stderr = pscheduler.plugin_invoke(
+            "archiver", name, "data-is-valid",
             stdin=data)
 
         if returncode != 0:
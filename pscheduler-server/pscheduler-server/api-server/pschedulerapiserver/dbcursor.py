@@ -8,6 +8,8 @@ import sys
 import threading
 import time
 
+from pschedulerapiserver import application
+
 from .log import log
 
 module = sys.modules[__name__]
@@ -15,66 +17,206 @@ module = sys.modules[__name__]
 module.tries = 10
 module.interval = 0.5
 
+# Connections held by each process.  Apache's mod_wsgi runs 15
+# threads per process by default; leaving a little headroom keeps
+# threads from waiting while connections are recycled.
+module.pool_size = 16
+module.pool_timeout = 30
+
 module.threadlocal = threading.local()
 
 module.dsn = None   # DSN for DB connection
+module.pool = None  # Pool of connections
+
+# Notifications are heard by a single listener per process and
+# counted so that threads can wait for them without a connection.
+module.listen_lock = threading.Lock()
+module.listen_changed = threading.Condition(module.listen_lock)
+module.listen_counts = {}      # Channel -> notifications heard
+module.listen_active = set()   # Channels actually being listened to
+module.listener = None
 
 
 def dbcursor_init(dsn):
     """Initialize the module.  Yes, this is global state."""
     module.dsn = dsn
+    module.pool = pscheduler.PgConnectionPool(
+        dsn, module.pool_size,
+        name="api",
+        timeout=module.pool_timeout,
+        connector=__connect)
+
+
+def __connect(dsn, autocommit, name):
+    """Make a new connection for the pool, retrying if necessary."""
+
+    tries = module.tries
+
+    while True:
+        try:
+            return pscheduler.pg_connection(dsn, autocommit=autocommit,
+                                            name=name)
+        except psycopg2.OperationalError as ex:
+            tries -= 1
+            if not tries:
+                log.warning("Failed to connect to the database.")
+                raise ex
+            log.debug("Attempt failed, %d left", tries)
+            time.sleep(module.interval)
 
 
 
 class DBCursor:
 
+    """
+    Holds the connection this thread has checked out of the pool for
+    the duration of a request.
+    """
+
     def __init__(self):
         self.db = None
-        self.ccursor = None  # Dodges conflict with a method name.
 
 
     def cursor(self):
-        """Get the cursor, reconnecting if necessary."""
-
-        # Make sure we have a working database connection
+        """
+        Get a new cursor, checking out a connection if necessary.
+        Callers may hold several at once, since the results of
+        cursors are held on the client side.
+        """
 
-        if self.db is None or self.db.closed:
+        assert module.pool is not None, "dbcursor_init() was never called"
 
-            # Reset everything.
+        if self.db is not None and self.db.closed:
+            self.release(discard=True)
 
-            self.db = None
-            self.ccursor = None
+        if self.db is None:
+            self.db = module.pool.getconn()
 
-            assert (module.dsn is not None)
+        return self.db.cursor()
 
-            tries = module.tries
 
-            while tries:
-                try:
-                    self.db = pscheduler.pg_connection(module.dsn, name="api")
-                    break
-                except psycopg2.OperationalError as ex:
-                    reason = ex
-                    tries -= 1
-                    log.debug("Attempt failed, %d left", tries)
-                    time.sleep(module.interval)
+    def release(self, discard=False):
+        """Return the connection to the pool."""
 
-            if self.db is None:
-                log.warning("Failed to connect to the database.")
-                raise reason;
+        if self.db is None:
+            return
 
-        # Make sure we have a cursor.
+        module.pool.putconn(self.db, discard=discard)
+        self.db = None
 
-        if self.ccursor is None or self.ccursor.closed():
-            self.ccursor = self.db.cursor()
 
-        return self.ccursor
 
+def __thread_cursor():
+    """Get this thread's DBCursor"""
+    try:
+        return module.threadlocal.cursor
+    except AttributeError:
+        module.threadlocal.cursor = DBCursor()
+        return module.threadlocal.cursor
 
 
 def dbcursor():
     """Get this thread's database cursor"""
-    return getattr(module.threadlocal, "cursor", DBCursor()).cursor()
+    return __thread_cursor().cursor()
+
+
+def dbcursor_release(discard=False):
+    """Give back this thread's database connection, if it has one."""
+    __thread_cursor().release(discard=discard)
+
+
+def dbcursor_stats():
+    """Return statistics on this process's connection pool."""
+    return module.pool.stats()
+
+
+def __listener():
+    """Listen for notifications on all requested channels forever."""
+
+    db = None
+
+    while True:
+
+        try:
+
+            if db is None:
+                db = pscheduler.PgConnection(module.dsn, name="api-listen")
+                with module.listen_lock:
+                    module.listen_active = set()
+
+            with module.listen_lock:
+                new_channels = set(module.listen_counts) - module.listen_active
+            for channel in new_channels:
+                db.listen(channel)
+            if new_channels:
+                with module.listen_lock:
+                    module.listen_active |= new_channels
+                    module.listen_changed.notify_all()
+
+            # Wake up now and then to pick up new channels.
+            if db.wait(1):
+                with module.listen_lock:
+                    for channel, payload, count in db.notifications():
+                        if channel in module.listen_counts:
+                            module.listen_counts[channel] += 1
+                    module.listen_changed.notify_all()
+
+        except Exception as ex:
+            log.warning("Notification listener failed: %s", str(ex))
+            db = None
+            time.sleep(module.interval)
+
+
+def dbcursor_notification_count(channel):
+    """
+    Return the number of notifications heard on a channel, starting
+    to listen for them if necessary.  The count can be passed to
+    dbcursor_wait_notification() to wait for the next one.
+    """
+
+    with module.listen_lock:
+
+        if module.listener is None:
+            module.listener = threading.Thread(target=__listener)
+            module.listener.setDaemon(True)
+            module.listener.start()
+
+        if channel not in module.listen_counts:
+            module.listen_counts[channel] = 0
+
+        # Don't miss anything that happens before listening starts.
+        deadline = time.time() + module.pool_timeout
+        while channel not in module.listen_active \
+              and time.time() < deadline:
+            module.listen_changed.wait(deadline - time.time())
+
+        return module.listen_counts[channel]
+
+
+def dbcursor_wait_notification(channel, count, timeout):
+    """
+    Wait up to 'timeout' seconds for a notification on a channel
+    beyond the 'count' returned by dbcursor_notification_count().
+    Returns True if one arrived.  This thread's database connection
+    is given back while waiting.
+    """
+
+    dbcursor_release()
+
+    deadline = time.time() + timeout
+    with module.listen_lock:
+        while module.listen_counts.get(channel, 0) == count:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            module.listen_changed.wait(remaining)
+        return True
+
+
+@application.teardown_request
+def dbcursor_teardown(exception):
+    dbcursor_release()
+
 
 
 def dbcursor_query(query,
@@ -97,7 +239,7 @@ def dbcursor_query(query,
             cursor.execute(query, args)
         except psycopg2.OperationalError as ex:
             log.debug("Operational Error: %s", ex)
-            cursor.close()
+            dbcursor_release(discard=True)
             tries -= 1
             if tries == 0:
                 raise psycopg2.Error("Too many tries to run the query; giving up")
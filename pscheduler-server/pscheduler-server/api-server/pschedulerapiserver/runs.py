@@ -2,8 +2,10 @@
 # Run-Related Pages
 #
 
+import collections
 import copy
 import pscheduler
+import threading
 import time
 
 from pschedulerapiserver import application
@@ -12,7 +14,8 @@ from flask import request
 
 from .access import *
 from .args import arg_integer
-from .dbcursor import dbcursor_query
+from .dbcursor import dbcursor_query, dbcursor_notification_count, \
+    dbcursor_wait_notification
 from .json import *
 from .limitproc import *
 from .log import log
@@ -54,12 +57,16 @@ def task_uuid_runtimes(task):
 
 
 
-def __evaluate_limits(
-    task,       # Task UUID
-    start_time  # When the task should start
+def __evaluate_limits_many(
+    task,        # Task UUID
+    start_times  # List of when the runs should start
     ):
 
-    """Evaluate the limits for a run."""
+    """
+    Evaluate the limits for a list of runs of the same task.  Returns
+    a list of (passed, diags, priority) tuples, one per start time,
+    and a response to be returned if something went wrong.
+    """
 
     log.debug("Applying limits")
     # Let this throw what it may; callers have to catch it.
@@ -67,38 +74,156 @@ def __evaluate_limits(
         "SELECT json, duration, hints FROM task where uuid = %s", [task])
     if cursor.rowcount == 0:
         # TODO: This or bad_request when the task isn't there?
-        return False, None, not_found()
+        return None, not_found()
     task_spec, duration, hints = cursor.fetchone()
     cursor.close()
     log.debug("Task is %s, duration is %s" % (task_spec, duration))
 
-    limit_input = copy.copy(task_spec)
-    limit_input['run_schedule'] = {
-        'start': pscheduler.datetime_as_iso8601(start_time),
-        'duration': pscheduler.timedelta_as_iso8601(duration)
-    }
+    schedules = [
+        {
+            'start': pscheduler.datetime_as_iso8601(start_time),
+            'duration': pscheduler.timedelta_as_iso8601(duration)
+        }
+        for start_time in start_times
+    ]
 
-    log.debug("Checking limits against %s" % str(limit_input))
+    log.debug("Checking limits against %s for %s"
+              % (str(task_spec), str(schedules)))
 
     processor, whynot = limitprocessor()
     if processor is None:
         log.debug("Limit processor is not initialized. %s", whynot)
-        return False, None, no_can_do("Limit processor is not initialized: %s" % whynot)
+        return None, no_can_do("Limit processor is not initialized: %s" % whynot)
 
     # Don't pass hints since that would have been covered when the
     # task was submitted and only the scheduler will be submitting
     # runs.
-    passed, limits_passed, diags, _new_task, priority \
-        = processor.process(limit_input, hints, rewrite=False, prioritize=True)
+    evaluations = []
+    for passed, limits_passed, diags, _new_task, priority \
+        in processor.process_many(task_spec, hints, schedules,
+                                  rewrite=False, prioritize=True):
+        log.debug("Passed: %s.  Diags: %s" % (passed, diags))
+        evaluations.append((passed, diags, priority))
+
+    return evaluations, None
+
 
-    log.debug("Passed: %s.  Diags: %s" % (passed, diags))
 
+def __evaluate_limits(
+    task,       # Task UUID
+    start_time  # When the task should start
+    ):
+
+    """Evaluate the limits for a run."""
+
+    evaluations, response = __evaluate_limits_many(task, [ start_time ])
+    if response is not None:
+        return False, None, response, None
+    passed, diags, priority = evaluations[0]
     return passed, diags, None, priority
 
 
 
+def __post_run_list(
+    task,      # Task UUID
+    run_list   # List of runs to post
+    ):
+
+    """
+    Post a list of runs for a task in order, stopping at the first one
+    that can't be posted.  Each item is a dictionary with a
+    'start-time' and, on participants other than the lead, the 'run'
+    UUID the lead assigned.  Returns a list of dictionaries, one per
+    run attempted, with the run's 'href' and 'participant-data' or, if
+    the last one failed, an 'error' and whether or not it was a
+    'conflict'.
+    """
+
+    results = []
+
+    # Vet everything before posting anything.  Posting stops at the
+    # first item that isn't valid.
+
+    runs = []
+    invalid = None
+
+    for item in run_list:
+
+        try:
+            pscheduler.json_check_schema(item, 1)
+            start_time = pscheduler.iso8601_as_datetime(item['start-time'])
+            run = item.get('run', None)
+            if run is not None and not uuid_is_valid(run):
+                raise ValueError("Invalid run UUID")
+        except KeyError:
+            invalid = "Missing start time"
+            break
+        except ValueError as ex:
+            invalid = str(ex)
+            break
+
+        runs.append((start_time, run))
+
+    # Limits for all of the runs are evaluated at once so work that
+    # doesn't depend on when they happen is only done once.
+
+    try:
+        evaluations, response = __evaluate_limits_many(
+            task, [ start_time for start_time, _ in runs ])
+    except Exception as ex:
+        log.exception()
+        return [ { 'error': str(ex), 'conflict': False } ]
+    if response is not None:
+        return [ { 'error': response.get_data().strip(), 'conflict': False } ]
+
+    for (start_time, run), (passed, diags, priority) \
+        in zip(runs, evaluations):
+
+        try:
+            if passed:
+                diag_message = None
+            else:
+                diag_message = "Run forbidden by limits:\n%s" % (diags)
+
+            cursor = dbcursor_query(
+                "SELECT * FROM api_run_post(%s, %s, %s, %s, %s, %s)",
+                [task, start_time, run, diag_message, priority, diags],
+                onerow=True)
+            succeeded, uuid, conflicts, error_message = cursor.fetchone()
+            cursor.close()
+            if conflicts or not succeeded:
+                results.append({ 'error': error_message,
+                                 'conflict': bool(conflicts) })
+                break
+
+            cursor = dbcursor_query(
+                "SELECT part_data FROM run WHERE uuid = %s", [uuid],
+                onerow=True)
+            part_data = cursor.fetchone()[0]
+            cursor.close()
+
+        except Exception as ex:
+            log.exception()
+            results.append({ 'error': str(ex), 'conflict': False })
+            break
+
+        results.append({
+            'href': base_url() + '/' + uuid,
+            'participant-data': part_data
+        })
+
+    else:
+        if invalid is not None:
+            results.append({ 'error': invalid, 'conflict': False })
+
+    log.debug("Posted %d of %d runs", len(results), len(run_list))
+
+    return results
+
+
+
 # Established runs for a task
-@application.route("/tasks/<task>/runs", methods=['GET', 'POST'])
+@application.route("/tasks/<task>/runs", methods=['GET', 'POST', 'PUT'])
 def tasks_uuid_runs(task):
 
     if not uuid_is_valid(task):
@@ -158,7 +283,11 @@ def tasks_uuid_runs(task):
 
 
         try:
-            data = pscheduler.json_load(request.data, max_schema=1)
+            data = pscheduler.json_load(request.data)
+            # A list is a batch of runs posted all at once.
+            if isinstance(data, list):
+                return ok_json(__post_run_list(task, data))
+            pscheduler.json_check_schema(data, 1)
             start_time = pscheduler.iso8601_as_datetime(data['start-time'])
         except KeyError:
             return bad_request("Missing start time")
@@ -201,6 +330,57 @@ def tasks_uuid_runs(task):
         log.debug("New run posted to %s", url)
         return ok_json(url)
 
+    elif request.method == 'PUT':
+
+        # This is the batch equivalent of a PUT of part-data-full to
+        # each run, used after a list of runs has been posted.
+
+        log.debug("Run list PUT: %s --> %s", request.url, request.data)
+
+        requester, key = task_requester_key(task)
+        if requester is None:
+            return not_found()
+
+        if not access_write_task(requester, key):
+            return forbidden()
+
+        try:
+            run_list = pscheduler.json_load(request.data)
+            if not isinstance(run_list, list):
+                raise ValueError("Must be a list of runs")
+            updates = [ (pscheduler.json_dump(item['part-data-full']),
+                         item['run'])
+                        for item in run_list ]
+        except (KeyError, TypeError):
+            return bad_request("Missing run or part-data-full")
+        except ValueError as ex:
+            return bad_request("Invalid JSON: %s" % (str(ex)))
+
+        for part_data_full, run in updates:
+
+            if not uuid_is_valid(run):
+                return bad_request("Invalid run UUID %s" % (run))
+
+            cursor = dbcursor_query("""
+                          UPDATE
+                              run
+                          SET
+                              part_data_full = %s
+                          WHERE
+                              uuid = %s
+                              AND task = (SELECT id FROM task WHERE uuid = %s)
+                          """,
+                       [ part_data_full, run, task ])
+
+            rowcount = cursor.rowcount
+            cursor.close()
+            if rowcount != 1:
+                return not_found("No run %s" % (run))
+
+        log.debug("Full data updated for %d runs", len(updates))
+
+        return ok()
+
     else:
 
         return not_allowed()
@@ -557,6 +737,50 @@ def tasks_uuid_runs_run(task, run):
 
 
 
+#
+# Cache of formatted results
+#
+
+class FormattedResultCache(object):
+
+    """
+    Bounded, least-recently-used cache of formatted results keyed by
+    run UUID and format.  Only results of finished runs, which don't
+    change, belong here.
+    """
+
+    def __init__(self, size=1000):
+        self.size = size
+        self.items = collections.OrderedDict()  # (Run, format) -> text
+        self.lock = threading.Lock()
+
+    def get(self, run, format):
+        """
+        Return the formatted text for a run or None if there is none.
+        """
+        with self.lock:
+            try:
+                text = self.items.pop((run, format))
+            except KeyError:
+                return None
+            # Re-inserting makes this the most recently used.
+            self.items[(run, format)] = text
+            return text
+
+    def put(self, run, format, text):
+        with self.lock:
+            self.items.pop((run, format), None)
+            self.items[(run, format)] = text
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+
+formatted_results = FormattedResultCache()
+
+# How long to wait for a result when asked to
+RESULT_WAIT = 10
+
+
 #
 # Merged results, optionally formatted.
 #
@@ -586,53 +810,92 @@ def tasks_uuid_runs_run_result(task, run):
 
 
 
+    # Formatted results can come from the cache, so only JSON needs
+    # the result itself right away.
+    if format == 'application/json':
+        result_column = "run.result_merged::TEXT"
+    else:
+        result_column = "run.result_merged IS NOT NULL"
+
+
     #
     # Camp on the run for a result
     #
 
-    # 40 tries at 0.25s intervals == 10 sec.
-    tries = 40 if wait else 1
+    deadline = time.time() + RESULT_WAIT
+
+    while True:
 
-    while tries:
+        if wait:
+            notifications = dbcursor_notification_count("run_change")
 
         cursor = dbcursor_query("""
             SELECT
                 test.name,
-                run.result_merged,
-                task.json #> '{test, spec}'
+                %s,
+                run_state_is_finished(run.state)
             FROM
                 run
                 JOIN task ON task.id = run.task
                 JOIN test ON test.id = task.test
             WHERE
-                task.uuid = %s
-                AND run.uuid = %s
-            """, [task, run])
+                task.uuid = %%s
+                AND run.uuid = %%s
+            """ % (result_column), [task, run])
 
         if cursor.rowcount == 0:
             cursor.close()
             return not_found()
 
-        # TODO: Make sure we got back one row with two columns.
+        # TODO: Make sure we got back one row with three columns.
         row = cursor.fetchone()
         cursor.close()
 
-        if not wait and row[1] is None:
-            time.sleep(0.25)
-            tries -= 1
-        else:
+        if row[1] or not wait:
             break
 
-    if tries == 0:
-        return not_found()
-
+        # Sleep until the run changes or we run out of time.
+        remaining = deadline - time.time()
+        if remaining <= 0 \
+           or not dbcursor_wait_notification("run_change", notifications,
+                                             remaining):
+            return not_found()
 
-    test_type, merged_result, test_spec = row
 
+    test_type, merged, finished = row
 
     # JSON requires no formatting.
     if format == 'application/json':
-        return ok_json(merged_result)
+        return ok_json(None if merged is None
+                       else pscheduler.json_load(merged, strip=False))
+
+    if not merged:
+        return not_found()
+
+    formatted = formatted_results.get(run, format)
+    if formatted is not None:
+        return ok(formatted, mimetype=format)
+
+    cursor = dbcursor_query("""
+        SELECT
+            run.result_merged::TEXT,
+            task.json #> '{test, spec}'
+        FROM
+            run
+            JOIN task ON task.id = run.task
+        WHERE
+            task.uuid = %s
+            AND run.uuid = %s
+        """, [task, run])
+
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        return not_found()
+
+    merged_text, test_spec = row
+
+    merged_result = pscheduler.json_load(merged_text, strip=False)
 
     if not merged_result['succeeded']:
         if format == 'text/plain':
@@ -646,13 +909,17 @@ def tasks_uuid_runs_run_result(task, run):
         "result": merged_result
         }
 
-    returncode, stdout, stderr = pscheduler.run_program(
-        [ "pscheduler", "internal", "invoke", "test", test_type,
-          "result-format", format ],
+    returncode, stdout, stderr = pscheduler.plugin_invoke(
+        "test", test_type, "result-format",
+        args=[format],
         stdin = pscheduler.json_dump(formatter_input)
         )
 
     if returncode != 0:
         return error("Failed to format result: " + stderr)
 
-    return ok(stdout.rstrip(), mimetype=format)
+    formatted = stdout.rstrip()
+    if finished:
+        formatted_results.put(run, format, formatted)
+
+    return ok(formatted, mimetype=format)
@@ -8,7 +8,7 @@ from pschedulerapiserver import application
 
 from flask import request
 
-from .dbcursor import dbcursor_query
+from .dbcursor import dbcursor_query, dbcursor_stats
 from .json import *
 from .response import *
 
@@ -52,6 +52,37 @@ def stat_control_pause():
 
 
 
+#
+# API Server
+#
+
+@application.route("/stat/api/db-pool", methods=['GET'])
+def stat_api_db_pool():
+    """Statistics on the database pool of the process serving this request"""
+    return ok_json(dbcursor_stats())
+
+
+
+#
+# Runner
+#
+
+@application.route("/stat/runner/db-pool", methods=['GET'])
+def stat_runner_db_pool():
+    """Statistics on the runner's database pool as of its last heartbeat"""
+    cursor = dbcursor_query(
+        "SELECT stats -> 'db-pool' FROM heartbeat WHERE name = 'runner'")
+    if cursor.rowcount == 0:
+        cursor.close()
+        return not_found()
+    stats = cursor.fetchone()[0]
+    cursor.close()
+    if stats is None:
+        return not_found()
+    return ok_json(stats)
+
+
+
 #
 # Archiving
 #
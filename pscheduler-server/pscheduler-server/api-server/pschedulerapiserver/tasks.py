@@ -224,9 +224,8 @@ def tasks():
         # See if the test spec is valid
 
         try:
-            returncode, stdout, stderr = pscheduler.run_program(
-                [ "pscheduler", "internal", "invoke", "test",
-                  task['test']['type'], "spec-is-valid" ],
+            returncode, stdout, stderr = pscheduler.plugin_invoke(
+                "test", task['test']['type'], "spec-is-valid",
                 stdin = pscheduler.json_dump(task['test']['spec'])
                 )
 
@@ -249,9 +248,8 @@ def tasks():
             # Data
 
             try:
-                returncode, stdout, stderr = pscheduler.run_program(
-                    [ "pscheduler", "internal", "invoke", "archiver",
-                      archive["archiver"], "data-is-valid" ],
+                returncode, stdout, stderr = pscheduler.plugin_invoke(
+                    "archiver", archive["archiver"], "data-is-valid",
                     stdin=pscheduler.json_dump(archive["data"]),
                 )
                 if returncode != 0:
@@ -316,9 +314,8 @@ def tasks():
         if new_task is not None:
             try:
                 task = new_task
-                returncode, stdout, stderr = pscheduler.run_program(
-                    [ "pscheduler", "internal", "invoke", "test",
-                      task['test']['type'], "spec-is-valid" ],
+                returncode, stdout, stderr = pscheduler.plugin_invoke(
+                    "test", task['test']['type'], "spec-is-valid",
                     stdin = pscheduler.json_dump(task["test"]["spec"])
                 )
 
@@ -337,9 +334,8 @@ def tasks():
 
         try:
 
-            returncode, stdout, stderr = pscheduler.run_program(
-                [ "pscheduler", "internal", "invoke", "test",
-                  task['test']['type'], "participants" ],
+            returncode, stdout, stderr = pscheduler.plugin_invoke(
+                "test", task['test']['type'], "participants",
                 stdin = pscheduler.json_dump(task['test']['spec']),
                 timeout=5
                 )
@@ -371,46 +367,46 @@ def tasks():
 
         tool_offers = {}
 
-        for participant_no in range(0, len(participants)):
-
-            participant = participants[participant_no]
-
-            try:
-
-                # Make sure the other participants are running pScheduler
-
-                participant_api = pscheduler.api_url_hostport(participant)
-
-                log.debug("Pinging %s" % (participant))
-                status, result = pscheduler.url_get(
-                    participant_api, throw=False, timeout=10,
-                    bind=lead_bind)
-
-                if status == 400:
-                    raise TaskPostingException(result)
-                elif status in [ 202, 204, 205, 206, 207, 208, 226,
-                                 300, 301, 302, 303, 304, 205, 306, 307, 308 ] \
-                    or ( (status >= 400) and (status <=499) ):
-                    raise TaskPostingException("Host is not running pScheduler")
-                elif status != 200:
-                    raise TaskPostingException("returned status %d: %s"
-                                               % (status, result))
-
-
-                # TODO: This will fail with a very large test spec.
-                status, result = pscheduler.url_get(
-                    "%s/tools" % (participant_api),
-                    params=tool_params,
-                    throw=False,
-                    bind=lead_bind
-                    )
-                if status != 200:
-                    raise TaskPostingException("%d: %s" % (status, result))
-                tools.append(result)
-            except TaskPostingException as ex:
-                return error("Error getting tools from %s: %s" \
-                                     % (participant, str(ex)))
+        # Make sure the participants are running pScheduler, then ask
+        # them all what tools they have, each set at once.
+
+        participant_apis = [ pscheduler.api_url_hostport(participant)
+                             for participant in participants ]
+
+        log.debug("Pinging %s" % (participants))
+        pings = pscheduler.url_get_many(participant_apis, timeout=10,
+                                        bind=lead_bind)
+
+        for participant, (status, result) in zip(participants, pings):
+
+            if status == 400:
+                reason = result
+            elif status in [ 202, 204, 205, 206, 207, 208, 226,
+                             300, 301, 302, 303, 304, 205, 306, 307, 308 ] \
+                or ( (status >= 400) and (status <=499) ):
+                reason = "Host is not running pScheduler"
+            elif status != 200:
+                reason = "returned status %d: %s" % (status, result)
+            else:
+                continue
+
+            return error("Error getting tools from %s: %s" \
+                         % (participant, reason))
+
+        # TODO: This will fail with a very large test spec.
+        offers = pscheduler.url_get_many(
+            [ "%s/tools" % (participant_api)
+              for participant_api in participant_apis ],
+            params=tool_params,
+            bind=lead_bind
+            )
+
+        for participant, (status, result) in zip(participants, offers):
+            if status != 200:
+                return error("Error getting tools from %s: %d: %s" \
+                             % (participant, status, result))
             log.debug("Participant %s offers tools %s", participant, result)
+            tools.append(result)
             tool_offers[participant] = result
 
         if len(tools) != nparticipants:
@@ -478,70 +474,78 @@ def tasks():
 
         task_params = { "key": task["_key"] } if "_key" in task else {}
 
-        for participant in range(1,nparticipants):
+        # Post the task to all of the other participants at once, then
+        # fetch the details of what they posted.
 
-            part_name = participants[participant]
-            log.debug("Tasking participant %s", part_name)
-            try:
+        other_participants = range(1, nparticipants)
+        part_names = [ participants[participant]
+                       for participant in other_participants ]
+        post_urls = [ pscheduler.api_url_hostport(part_name,
+                                                  'tasks/' + task_uuid)
+                      for part_name in part_names ]
 
-                # Post the task
+        try:
+
+            log.debug("Tasking %s: %s", part_names, task)
 
-                log.debug("Tasking %d@%s: %s", participant, part_name, task)
-                post_url = pscheduler.api_url_hostport(part_name,
-                                                       'tasks/' + task_uuid)
+            post_params = []
+            for participant in other_participants:
+                params = dict(task_params)
+                params["participant"] = participant
+                post_params.append(params)
 
-                task_params["participant"] = participant
+            posts = pscheduler.url_post_many(
+                post_urls,
+                params=post_params,
+                data=task,
+                bind=lead_bind,
+                json=False)
 
-                log.debug("Posting task to %s", post_url)
-                status, result = pscheduler.url_post(
-                    post_url,
-                    params=task_params,
-                    data=task,
-                    bind=lead_bind,
-                    json=False,
-                    throw=False)
-                log.debug("Remote returned %d: %s", status, result)
+            for part_name, (status, result) in zip(part_names, posts):
+                log.debug("%s returned %d: %s", part_name, status, result)
                 if status != 200:
                     raise TaskPostingException("Unable to post task to %s: %s"
                                                % (part_name, result))
                 tasks_posted.append(result)
 
-                # Fetch the task's details and add the list of limits
-                # passed to our own.
+            # Fetch the tasks' details and add the list of limits
+            # passed to our own.
+
+            details = pscheduler.url_get_many(post_urls,
+                                              params={ "detail": True },
+                                              bind=lead_bind)
 
-                status, result = pscheduler.url_get(post_url,
-                                                    params={ "detail": True },
-                                                    bind=lead_bind,
-                                                    throw=False)
+            for part_name, post_url, (status, result) \
+                in zip(part_names, post_urls, details):
                 if status != 200:
                     raise TaskPostingException(
                         "Unable to fetch posted task from %s: %s"
                         % (part_name, result))
                 log.debug("Fetched %s", result)
                 try:
-                    details = result["detail"]["spec-limits-passed"]
-                    log.debug("Details from %s: %s", post_url, details)
-                    limits_passed.extend(details)
+                    part_limits = result["detail"]["spec-limits-passed"]
+                    log.debug("Details from %s: %s", post_url, part_limits)
+                    limits_passed.extend(part_limits)
                 except KeyError:
                     pass
 
-            except TaskPostingException as ex:
+        except TaskPostingException as ex:
 
-                # Disable the task locally and let it get rid of the
-                # other participants.
+            # Disable the task locally and let it get rid of the
+            # other participants.
 
-                posted_to = "%s/%s" % (request.url, task_uuid)
-                parsed = list(urlparse.urlsplit(posted_to))
-                parsed[1] = "%s"
-                template = urlparse.urlunsplit(parsed)
+            posted_to = "%s/%s" % (request.url, task_uuid)
+            parsed = list(urlparse.urlsplit(posted_to))
+            parsed[1] = "%s"
+            template = urlparse.urlunsplit(parsed)
 
-                try:
-                    dbcursor_query("SELECT api_task_disable(%s, %s)",
-                                   [task_uuid, template])
-                except Exception:
-                    log.exception()
+            try:
+                dbcursor_query("SELECT api_task_disable(%s, %s)",
+                               [task_uuid, template])
+            except Exception:
+                log.exception()
 
-                return error("Error while tasking %s: %s" % (part_name, ex))
+            return error("Error while tasking participants: %s" % (ex))
 
 
         # Update the list of limits passed in the local database
@@ -738,9 +742,8 @@ def tasks_uuid_cli(uuid):
     json, test = row
 
     try:
-        returncode, stdout, stderr = pscheduler.run_program(
-            [ "pscheduler", "internal", "invoke", "test",
-              test, "spec-to-cli" ], stdin = json )
+        returncode, stdout, stderr = pscheduler.plugin_invoke(
+            "test", test, "spec-to-cli", stdin = json )
         if returncode != 0:
             return error("Unable to convert test spec: " + stderr)
     except Exception as ex:
@@ -83,9 +83,8 @@ def tests_name_spec_is_valid(name):
         return bad_request("No test spec provided")
 
     try:
-        returncode, stdout, stderr = pscheduler.run_program(
-            ["pscheduler", "internal", "invoke", "test",
-             name, "spec-is-valid"],
+        returncode, stdout, stderr = pscheduler.plugin_invoke(
+            "test", name, "spec-is-valid",
             stdin=spec)
 
         if returncode != 0:
@@ -143,9 +142,8 @@ def tests_name_participants(name):
         return bad_request("No test spec provided")
 
     try:
-        returncode, stdout, stderr = pscheduler.run_program(
-            [ "pscheduler", "internal", "invoke", "test", name,
-              "participants"],
+        returncode, stdout, stderr = pscheduler.plugin_invoke(
+            "test", name, "participants",
             stdin = spec,
             )
     except KeyError:
@@ -0,0 +1,119 @@
+--
+-- Benchmark for run conflict checks and time proposals
+--
+-- This loads 100,000 runs onto the schedule of an installed database
+-- and reports how long run_has_conflicts() and api_proposed_times()
+-- take.  Everything happens in a transaction that is rolled back, so
+-- the schedule is left as it was found.  It needs at least one task
+-- whose test isn't in a background scheduling class and should be run
+-- as the pScheduler database's owner:
+--
+--     psql -d pscheduler -f benchmark-schedule.sql
+--
+-- This file is not part of the database build.
+--
+
+BEGIN TRANSACTION;
+
+-- Loading runs directly bypasses the checks and the participant data
+-- lookups done by run_alter, which would make loading take forever.
+-- The triggers that maintain run_latest and run_busy stay in place.
+ALTER TABLE run DISABLE TRIGGER run_alter;
+
+DO $$
+DECLARE
+    runs_to_load CONSTANT INTEGER := 100000;
+    iterations CONSTANT INTEGER := 1000;
+    task_ids BIGINT[];
+    task_uuids UUID[];
+    horizon INTERVAL;
+    spacing INTERVAL;
+    started TIMESTAMP WITH TIME ZONE;
+    elapsed INTERVAL;
+    gaps BIGINT;
+    proposed TIMESTAMP WITH TIME ZONE;
+BEGIN
+
+    SELECT INTO task_ids, task_uuids
+        array_agg(task.id), array_agg(task.uuid)
+    FROM
+        task
+        JOIN test ON test.id = task.test
+        JOIN scheduling_class ON scheduling_class.id = test.scheduling_class
+    WHERE NOT scheduling_class.anytime;
+
+    IF task_ids IS NULL THEN
+        RAISE EXCEPTION 'Need at least one task with a non-background test.';
+    END IF;
+
+    SELECT INTO horizon schedule_horizon FROM configurables;
+    spacing := horizon / runs_to_load;
+
+
+    -- Load up the schedule with short runs that overlap some of their
+    -- neighbors, leaving gaps here and there.
+
+    started := clock_timestamp();
+
+    INSERT INTO run (task, uuid, times, priority)
+    SELECT
+        task_ids[1 + (n % array_length(task_ids, 1))],
+        gen_random_uuid(),
+        tstzrange(
+            normalized_now() + (spacing * n),
+            normalized_now() + (spacing * n) + (spacing * (random() * 1.5)),
+            '[)'),
+        (random() * 10)::INTEGER
+    FROM generate_series(0, runs_to_load - 1) n;
+
+    RAISE NOTICE 'Loaded % runs in %', runs_to_load,
+        clock_timestamp() - started;
+
+
+    -- Conflict checks at random times
+
+    started := clock_timestamp();
+    FOR n IN 1..iterations
+    LOOP
+        proposed := normalized_now() + (horizon * random());
+        PERFORM run_has_conflicts(
+            task_ids[1 + (n % array_length(task_ids, 1))], proposed, 5);
+    END LOOP;
+    elapsed := clock_timestamp() - started;
+
+    RAISE NOTICE 'run_has_conflicts: % per call', elapsed / iterations;
+
+
+    -- Proposals for windows of an hour at random times
+
+    gaps := 0;
+    started := clock_timestamp();
+    FOR n IN 1..iterations
+    LOOP
+        proposed := normalized_now() + (horizon * random());
+        gaps := gaps + (SELECT count(*) FROM api_proposed_times(
+            task_uuids[1 + (n % array_length(task_uuids, 1))],
+            proposed, proposed + 'PT1H'::INTERVAL, 5));
+    END LOOP;
+    elapsed := clock_timestamp() - started;
+
+    RAISE NOTICE 'api_proposed_times (1 hour): % per call, % gaps on average',
+        elapsed / iterations, gaps::NUMERIC / iterations;
+
+
+    -- Proposals covering the whole horizon
+
+    started := clock_timestamp();
+    FOR n IN 1..10
+    LOOP
+        PERFORM count(*) FROM api_proposed_times(
+            task_uuids[1 + (n % array_length(task_uuids, 1))]);
+    END LOOP;
+    elapsed := clock_timestamp() - started;
+
+    RAISE NOTICE 'api_proposed_times (horizon): % per call', elapsed / 10;
+
+END;
+$$ LANGUAGE plpgsql;
+
+ROLLBACK;
@@ -50,8 +50,19 @@ BEGIN
     END IF;
 
     -- Version 1 to version 2
+    -- Adds statistics reported by the program
+    IF t_version = 1
+    THEN
+        ALTER TABLE heartbeat ADD COLUMN
+        stats JSONB;
+
+        t_version := t_version + 1;
+    END IF;
+
+
+    -- Version 2 to version 3
     -- ...Description...
-    -- IF t_version = 1
+    -- IF t_version = 2
     -- THEN
     --     ALTER TABLE tool DROP COLUMN version;
     --
@@ -121,16 +132,21 @@ $$ LANGUAGE plpgsql;
 
 DO $$ BEGIN PERFORM drop_function_all('heartbeat'); END $$;
 
-CREATE OR REPLACE FUNCTION heartbeat(new_name TEXT, new_next_time INTERVAL DEFAULT NULL)
+CREATE OR REPLACE FUNCTION heartbeat(
+    new_name TEXT,
+    new_next_time INTERVAL DEFAULT NULL,
+    new_stats JSONB DEFAULT NULL  -- Statistics, NULL to leave as-is
+)
 RETURNS VOID
 AS $$
 BEGIN
 
-    INSERT INTO heartbeat (name, next_time)
-    VALUES (new_name, new_next_time)
+    INSERT INTO heartbeat (name, next_time, stats)
+    VALUES (new_name, new_next_time, new_stats)
     ON CONFLICT (name) DO UPDATE
     SET
-        next_time = new_next_time
+        next_time = new_next_time,
+        stats = COALESCE(new_stats, heartbeat.stats)
     ;
 
 END;
@@ -133,7 +133,6 @@ AS $$
 DECLARE
     entry RECORD;
     status http_result;
-    status_family INTEGER;
     timeout_seconds FLOAT;
 BEGIN
 
@@ -161,7 +160,39 @@ BEGIN
         RAISE EXCEPTION 'Unsupported operation %', entry.operation;
     END IF;
 
-    status_family := (status.status/100)::INTEGER;
+    PERFORM http_queue_record(row_id, status.status, status.returned);
+
+END;
+$$ LANGUAGE plpgsql;
+
+
+
+-- Record the outcome of an attempt to carry out an item in the table,
+-- removing it if it succeeded or expired and scheduling another
+-- attempt otherwise.  This is used by processes that perform the
+-- HTTP operations outside the database.
+
+DO $$ BEGIN PERFORM drop_function_all('http_queue_record'); END $$;
+
+CREATE OR REPLACE FUNCTION http_queue_record(
+    row_id BIGINT,
+    status INTEGER,
+    returned TEXT
+)
+RETURNS VOID
+AS $$
+DECLARE
+    entry RECORD;
+    status_family INTEGER;
+BEGIN
+
+    SELECT INTO entry * from http_queue WHERE id = row_id;
+    IF NOT FOUND
+    THEN
+        RETURN;
+    END IF;
+
+    status_family := (status/100)::INTEGER;
 
     IF status_family IN (1, 2, 3) -- Successful results
         OR now() + entry.try_interval > entry.expires
@@ -173,13 +204,13 @@ BEGIN
         UPDATE http_queue
         SET
             attempts = attempts + 1,
- 	    last_status = status.status,
- 	    last_returned = status.returned,
+ 	    last_status = status,
+ 	    last_returned = returned,
             last_attempt = now(),
             next_attempt = now() + entry.try_interval
         WHERE id = row_id;
     END IF;
- 
+
 END;
 $$ LANGUAGE plpgsql;
 
@@ -271,25 +271,10 @@ BEGIN
     proposed_times := tstzrange(proposed_start,
         proposed_start + taskrec.duration, '[)');
 
-    RETURN ( 
-        -- Exclusive can't collide with anything
-        ( taskrec.exclusive
-          AND EXISTS (SELECT * FROM run_conflictable
-                      WHERE
-		          times && proposed_times
-			  AND COALESCE(priority, 0) >= COALESCE(proposed_priority, 0)
-		     )
-	)
-        -- Non-exclusive can't collide with exclusive
-          OR ( NOT taskrec.exclusive
-               AND EXISTS (SELECT * FROM run_conflictable
-                           WHERE
-			       exclusive
-			       AND times && proposed_times
-			       AND COALESCE(priority, 0) >= COALESCE(proposed_priority, 0)
-		    )
-	    )
-        );
+    RETURN EXISTS (
+        SELECT * FROM run_busy_conflicts(proposed_times, taskrec.exclusive,
+                                         proposed_priority)
+    );
 
 END;
 $$ LANGUAGE plpgsql;
@@ -635,27 +620,11 @@ BEGIN
         RETURN TRUE;
     END IF;
 
-    RETURN NOT (
-        -- Exclusive can't collide with anything                                                                                    
-        ( runrec.exclusive
-          AND EXISTS (SELECT * FROM run_conflictable
-                      WHERE
-                          times && runrec.times
-                          AND COALESCE(priority, 0) >= COALESCE(runrec.priority, 0)
-                          AND id <> run_id
-                     )
-        )
-        -- Non-exclusive can't collide with exclusive          
-          OR ( NOT runrec.exclusive
-               AND EXISTS (SELECT * FROM run_conflictable
-                           WHERE
-                               exclusive
-                               AND times && runrec.times
-                               AND COALESCE(priority, 0) >= COALESCE(runrec.priority, 0)
-                               AND id <> run_id
-                    )
-            )
-        );
+    RETURN NOT EXISTS (
+        SELECT * FROM run_busy_conflicts(runrec.times, runrec.exclusive,
+                                         runrec.priority)
+        WHERE run <> run_id
+    );
 
 END;
 $$ LANGUAGE plpgsql;
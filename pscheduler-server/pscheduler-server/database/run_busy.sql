@@ -0,0 +1,200 @@
+--
+-- Table of runs that occupy time on the schedule.  This is a
+-- precomputed copy of what's in the run_conflictable view, maintained
+-- as runs come and go so that conflict checks and proposals of free
+-- time don't have to join four tables for every candidate.
+--
+
+DO $$
+DECLARE
+    t_name TEXT;            -- Name of the table being worked on
+    t_version INTEGER;      -- Current version of the table
+    t_version_old INTEGER;  -- Version of the table at the start
+BEGIN
+
+    --
+    -- Preparation
+    --
+
+    t_name := 'run_busy';
+
+    t_version := table_version_find(t_name);
+    t_version_old := t_version;
+
+
+    --
+    -- Upgrade Blocks
+    --
+
+    -- Version 0 (nonexistant) to version 1
+    IF t_version = 0
+    THEN
+
+        CREATE TABLE run_busy (
+
+        	-- Run occupying the time
+        	run		BIGINT
+        			UNIQUE
+        			REFERENCES run(id)
+        			ON DELETE CASCADE,
+
+        	-- Range of times occupied
+        	times		TSTZRANGE
+        			NOT NULL,
+
+        	-- Priority of the run
+        	priority	INTEGER
+        			NOT NULL,
+
+        	-- Whether or not the run's scheduling class is exclusive
+        	exclusive	BOOLEAN
+        			NOT NULL,
+
+        	-- Whether or not the run is in progress
+        	running		BOOLEAN
+        			NOT NULL
+        );
+
+        -- Populate the table from existing runs
+
+        INSERT INTO run_busy
+        SELECT
+            id,
+            times,
+            COALESCE(priority, 0),
+            exclusive,
+            state = run_state_running()
+        FROM run_conflictable;
+
+        -- One index per scheduling class so each kind of lookup only
+        -- has to search the runs that can get in its way.
+        CREATE INDEX run_busy_times_exclusive ON run_busy
+            USING GIST (times) WHERE exclusive;
+        CREATE INDEX run_busy_times_normal ON run_busy
+            USING GIST (times) WHERE NOT exclusive;
+
+	t_version := t_version + 1;
+
+    END IF;
+
+
+    -- Version 1 to version 2
+    -- IF t_version = 1
+    -- THEN
+    --
+    --    t_version := t_version + 1;
+    --END IF;
+
+
+    --
+    -- Cleanup
+    --
+
+    PERFORM table_version_set(t_name, t_version, t_version_old);
+
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Note that deletions from the run table are taken care of by the
+-- foreign key's cascade.
+
+DO $$ BEGIN PERFORM drop_function_all('run_busy_update'); END $$;
+
+CREATE OR REPLACE FUNCTION run_busy_update()
+RETURNS TRIGGER
+AS $$
+DECLARE
+    class_exclusive BOOLEAN;
+BEGIN
+
+    -- Runs that didn't start no longer occupy anything.
+    IF NEW.state = run_state_nonstart()
+    THEN
+        DELETE FROM run_busy WHERE run = NEW.id;
+        RETURN NEW;
+    END IF;
+
+    IF TG_OP = 'UPDATE'
+    THEN
+        -- Most updates are results being filled in, which don't
+        -- change anything here.
+        IF NEW.times <> OLD.times OR NEW.state <> OLD.state
+        THEN
+            UPDATE run_busy
+            SET
+                times = NEW.times,
+                running = NEW.state = run_state_running()
+            WHERE run = NEW.id;
+        END IF;
+        RETURN NEW;
+    END IF;
+
+    SELECT INTO class_exclusive
+        scheduling_class.exclusive
+    FROM
+        task
+        JOIN test ON test.id = task.test
+        JOIN scheduling_class ON scheduling_class.id = test.scheduling_class
+    WHERE
+        task.id = NEW.task
+        AND NOT scheduling_class.anytime;
+
+    -- Anytime runs never conflict with anything.
+    IF NOT FOUND
+    THEN
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO run_busy (run, times, priority, exclusive, running)
+    VALUES (NEW.id, NEW.times, COALESCE(NEW.priority, 0), class_exclusive,
+            NEW.state = run_state_running());
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DROP TRIGGER IF EXISTS run_busy_update ON run;
+CREATE TRIGGER run_busy_update AFTER INSERT OR UPDATE ON run
+    FOR EACH ROW EXECUTE PROCEDURE run_busy_update();
+
+
+
+-- Find runs that would conflict with a proposed run.  Runs of
+-- exclusive tasks can't overlap anything; others can't overlap
+-- exclusive runs.  Only runs at or above the proposed priority count,
+-- plus those already running if 'include_running' is true.
+
+DO $$ BEGIN PERFORM drop_function_all('run_busy_conflicts'); END $$;
+
+CREATE OR REPLACE FUNCTION run_busy_conflicts(
+    proposed_times TSTZRANGE,
+    proposed_exclusive BOOLEAN,
+    proposed_priority INTEGER = NULL,
+    include_running BOOLEAN = FALSE
+)
+RETURNS SETOF run_busy
+AS $$
+BEGIN
+
+    RETURN QUERY
+        SELECT * FROM run_busy
+        WHERE
+            exclusive
+            AND times && proposed_times
+            AND ( priority >= COALESCE(proposed_priority, 0)
+                  OR (include_running AND running) )
+        UNION ALL
+        SELECT * FROM run_busy
+        WHERE
+            proposed_exclusive
+            AND NOT exclusive
+            AND times && proposed_times
+            AND ( priority >= COALESCE(proposed_priority, 0)
+                  OR (include_running AND running) );
+
+    RETURN;
+
+END;
+$$ LANGUAGE plpgsql;
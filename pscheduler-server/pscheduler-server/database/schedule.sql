@@ -189,6 +189,46 @@ AS
 
 
 
+-- Start times for a window of upcoming runs of a repeating task,
+-- beginning at the time in schedule_runs_to_schedule's trynext.  This
+-- applies the same limits as that view does: times must fall before
+-- the task's end, within its maximum number of runs and inside the
+-- scheduling horizon.
+
+DO $$ BEGIN PERFORM drop_function_all('schedule_bulk_times'); END $$;
+
+CREATE OR REPLACE FUNCTION schedule_bulk_times(
+    task_id BIGINT,
+    first_time TIMESTAMP WITH TIME ZONE,
+    max_count INTEGER
+)
+RETURNS SETOF TIMESTAMP WITH TIME ZONE
+AS $$
+BEGIN
+
+    RETURN QUERY
+        SELECT first_time + (task.repeat * n)
+        FROM
+            task,
+            configurables,
+            generate_series(0, max_count - 1) n
+        WHERE
+            task.id = task_id
+            AND task.repeat IS NOT NULL
+            AND ( (task.max_runs IS NULL) OR (task.runs + n < task.max_runs) )
+            AND ( (task.until IS NULL)
+                  OR (first_time + (task.repeat * n) < task.until) )
+            AND first_time + (task.repeat * n) + task.duration + task.slip
+                < normalized_now() + configurables.schedule_horizon
+        ORDER BY n;
+
+    RETURN;
+
+END;
+$$ LANGUAGE plpgsql;
+
+
+
 
 -- Runs that overlap but shouldn't (for diagnostic use)
 DROP VIEW IF EXISTS schedule_overlap;
@@ -337,8 +377,6 @@ DECLARE
     horizon_end TIMESTAMP WITH TIME ZONE;
     taskrec RECORD;
     time_range TSTZRANGE;
-    last_end TIMESTAMP WITH TIME ZONE;
-    run_record RECORD;
 BEGIN
 
     -- Validate the input
@@ -399,13 +437,10 @@ BEGIN
 
     time_range := tstzrange(range_start, range_end, '[)');
 
-    last_end := range_start;
 
-
-    -- Sift through everything on the timeline that overlaps with the
-    -- time range and find the gaps.  Other than non-starters, the
-    -- runs we care about avoiding are represented by this truth
-    -- table:
+    -- Find the gaps between everything on the timeline that overlaps
+    -- with the time range.  Other than non-starters, the runs we care
+    -- about avoiding are represented by this truth table:
     --
     -- Proposed  ||         Run on Timeline         |
     -- Run       || Background | Normal | Exclusive |
@@ -413,64 +448,43 @@ BEGIN
     -- Background|| Ignore     | Ignore |   Ignore  |
     -- Normal    || Ignore     | Ignore |   Avoid   |
     -- Exclusive || Ignore     | Avoid  |   Avoid   |
+    --
+    -- The run_busy table holds only the runs that can be avoided, so
+    -- this is a single index lookup.  A gap starts where the latest
+    -- end of everything before it falls and must be at least as long
+    -- as the task to be proposed.
 
-    -- TODO: Can this be selected out of run_conflictable?
-
-    FOR run_record IN
-        SELECT run.*
-        FROM
-            run
-            JOIN task ON task.id = run.task
-            JOIN test ON test.id = task.test
-            JOIN scheduling_class
-                 ON scheduling_class.id = test.scheduling_class
+    RETURN QUERY
+        WITH busy AS (
+            SELECT
+                lower(times) AS busy_start,
+                -- Clamp the end time to the horizon
+                LEAST(upper(times), horizon_end) AS busy_end
+            FROM
+                run_busy_conflicts(time_range, taskrec.exclusive,
+                                   proposed_priority, TRUE)
+        ),
+        gaps AS (
+            SELECT
+                GREATEST(range_start, max(busy_end) OVER (
+                    ORDER BY busy_start, busy_end
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING))
+                    AS gap_start,
+                busy_start AS gap_end
+            FROM busy
+            UNION ALL
+            -- If the end of the last run is before the end of the
+            -- range, that's also a gap.
+            SELECT
+                GREATEST(range_start, (SELECT max(busy_end) FROM busy)),
+                range_end
+        )
+        SELECT gap_start, gap_end
+        FROM gaps
         WHERE
-            -- Overlap
-	    times && time_range
-	    -- Higher priority than proposed or already running
-	    AND ( run.priority >= proposed_priority
-	          OR run.state = run_state_running() )
-            -- Ignore non-starters
-            AND state <> run_state_nonstart()
-            -- Ignore background
-            AND NOT scheduling_class.anytime
-            AND (
-                -- Always avoid exclusive runs
-                (scheduling_class.exclusive)
-                -- Avoid normal runs if the proposed run is exclusive
-                OR (taskrec.exclusive AND NOT scheduling_class.exclusive)
-            )
-        ORDER BY times
-    LOOP
-
-        -- Clamp the end time to the horizon
-        IF upper(run_record.times) > horizon_end
-        THEN
-            run_record.times = tstzrange( lower(run_record.times), horizon_end,
-                '[)' );
-        END IF;
-
-        -- A run that starts beyond the last end implies a gap, but
-        -- the gap must be longer than the duration of the task for it
-        -- to one that can be proposed.
-        IF lower(run_record.times) > last_end
-           AND lower(run_record.times) - last_end >= taskrec.duration
-        THEN
-            RETURN QUERY
-                SELECT last_end AS lower, lower(run_record.times) AS upper;
-        END IF;
-
-        last_end := upper(run_record.times);
-
-    END LOOP;
-
-    -- If the end of the last run is before the end of the range,
-    -- that's also a gap.
-    IF last_end < range_end
-       AND range_end - last_end >= taskrec.duration
-    THEN
-        RETURN QUERY SELECT last_end, range_end;
-    END IF;
+            gap_end > gap_start
+            AND gap_end - gap_start >= taskrec.duration
+        ORDER BY gap_start;
 
     RETURN;
 
@@ -4,11 +4,13 @@
 
 import pscheduler
 from powstream_defaults import *
+import collections
 import ConfigParser
 import datetime
 import os
 import re
 import shutil
+import struct
 import sys
 import time
 import pytz
@@ -19,6 +21,18 @@ DELAY_BUCKET_DIGITS = 2 #number of digits to round delay buckets
 DELAY_BUCKET_FORMAT = '%.2f' #Set buckets to nearest 2 decimal places
 CLOCK_ERROR_DIGITS = 2 #number of digits to round clock error
 
+#OWAMP session file constants (version 3 of the file format)
+OWP_MAGIC = 'OwA\0'
+OWP_FILE_VERSION = 3
+#magic, version, header length, finished, next seq, skip ranges, record count, skip offset, record offset
+OWP_HEADER = struct.Struct('>4sIQIIIQQQ')
+#seq, send timestamp, send error (scale, multiplier), recv error (scale, multiplier), recv timestamp, ttl
+OWP_RECORD_FORMAT = 'IQBBBBQB'
+OWP_RECORD_FIELDS = len(OWP_RECORD_FORMAT)
+OWP_RECORD_SIZE = struct.calcsize('>' + OWP_RECORD_FORMAT)
+OWP_TIMESTAMP_SCALE = float(2 ** 32) #timestamps and errors are 32.32 fixed point
+OWP_BLOCK_RECORDS = 4096 #number of records to decode at a time
+
 #logger
 log = pscheduler.Log(prefix="tool-powstream", quiet=True)
 
@@ -202,6 +216,7 @@ def parse_raw_owamp_output(file, raw_output=False, bucket_width=TIME_SCALE):
             if seq_number in packets_seen:
                 results['packets-duplicated'] += 1
                 continue
+            packets_seen[seq_number] = True
             
             #sent
             results['packets-sent'] += 1
@@ -215,7 +230,7 @@ def parse_raw_owamp_output(file, raw_output=False, bucket_width=TIME_SCALE):
             
             #delay histogram
             ##calculate delay in terms of seconds. OWAMP uses odd timestamps so need the divide by 2 ^ 32
-            delay = (float(destination_timestamp) - float(source_timestamp)) / pow(2, 32)
+            delay = float(int(destination_timestamp) - int(source_timestamp)) / pow(2, 32)
             #round and add 0 to prevent -0.00
             delay_bucket = DELAY_BUCKET_FORMAT%(round(delay/bucket_width, DELAY_BUCKET_DIGITS) + 0)
             if delay_bucket in results['histogram-latency']:
@@ -250,3 +265,150 @@ def parse_raw_owamp_output(file, raw_output=False, bucket_width=TIME_SCALE):
     results['succeeded'] = True
     
     return results
+
+##
+# Raised when a session file can't be read natively
+class OWPFileError(Exception):
+    pass
+
+##
+# Convert the scale and multiplier of an OWAMP error estimate to seconds
+def owp_error_estimate(scale, multiplier):
+    return (multiplier << (scale & 0x3F)) / OWP_TIMESTAMP_SCALE
+
+##
+# Generate blocks of records from an OWAMP session file, each one a
+# tuple of per-field sequences in the order of OWP_RECORD_FORMAT
+def read_owp_records(path, block_records=OWP_BLOCK_RECORDS):
+    try:
+        owp_file = open(path, 'rb')
+    except IOError as e:
+        raise OWPFileError("Unable to open %s: %s" % (path, e))
+
+    with owp_file:
+        header = owp_file.read(OWP_HEADER.size)
+        if len(header) < OWP_HEADER.size:
+            raise OWPFileError("File is too short to be a session file")
+        (magic, version, header_length, finished, next_seq, skip_ranges,
+         num_records, skips_offset, records_offset) = OWP_HEADER.unpack(header)
+        if magic != OWP_MAGIC:
+            raise OWPFileError("File is not an OWAMP session file")
+        if version != OWP_FILE_VERSION:
+            raise OWPFileError("Unsupported session file version %d" % version)
+
+        if not records_offset:
+            records_offset = header_length
+        if not num_records:
+            #unfinished files don't have a count, so use what's there
+            end = skips_offset if skips_offset > records_offset else os.fstat(owp_file.fileno()).st_size
+            num_records = max(end - records_offset, 0) // OWP_RECORD_SIZE
+
+        owp_file.seek(records_offset)
+        decoders = {}
+        while num_records > 0:
+            count = min(num_records, block_records)
+            data = owp_file.read(count * OWP_RECORD_SIZE)
+            count = len(data) // OWP_RECORD_SIZE
+            if count == 0:
+                break
+            try:
+                decoder = decoders[count]
+            except KeyError:
+                decoder = struct.Struct('>' + OWP_RECORD_FORMAT * count)
+                decoders[count] = decoder
+            fields = decoder.unpack(data[:decoder.size])
+            yield tuple(fields[field::OWP_RECORD_FIELDS] for field in range(OWP_RECORD_FIELDS))
+            num_records -= count
+
+##
+# Read a session file directly. Returns the same results as
+# parse_raw_owamp_output() would for the output of owstats -R.
+def parse_owp_file(path, raw_output=False, bucket_width=TIME_SCALE):
+
+    results = { 
+        'schema': LATENCY_SCHEMA_VERSION, 
+        'succeeded': False 
+    }
+    sent = 0
+    duplicated = 0
+    reordered = 0
+    received_total = 0
+    latency = collections.Counter()
+    ttl = collections.Counter()
+    max_clock_error = None
+    if raw_output:
+        results['raw-packets'] = []
+    packets_seen = set()
+    prev_seq_number = -1
+
+    for (seqs, src_ts, src_scale, src_mult, dst_scale, dst_mult,
+         dst_ts, ttls) in read_owp_records(path):
+
+        #publish raw pings
+        if raw_output:
+            results['raw-packets'].extend({
+                'seq-num': seqs[i],
+                'src-ts': src_ts[i],
+                'src-clock-sync': bool(src_scale[i] & 0x80),
+                'src-clock-err': owp_error_estimate(src_scale[i], src_mult[i]),
+                'dst-ts': dst_ts[i],
+                'dst-clock-sync': bool(dst_scale[i] & 0x80),
+                'dst-clock-err': owp_error_estimate(dst_scale[i], dst_mult[i]),
+                'ip-ttl': ttls[i]
+            } for i in xrange(len(seqs)))
+
+        #the counts depend on order, everything else works on the received packets as a whole
+        received = []
+        for i, seq_number in enumerate(seqs):
+            if seq_number in packets_seen:
+                duplicated += 1
+                continue
+            packets_seen.add(seq_number)
+            sent += 1
+            #packet lost
+            if dst_ts[i] == 0:
+                continue
+            received.append(i)
+            if seq_number < prev_seq_number:
+                reordered += 1
+            prev_seq_number = seq_number
+
+        if not received:
+            continue
+        received_total += len(received)
+
+        #delay histogram. round and add 0 to prevent -0.00
+        latency.update(
+            round((dst_ts[i] - src_ts[i]) / OWP_TIMESTAMP_SCALE / bucket_width, DELAY_BUCKET_DIGITS) + 0
+            for i in received)
+
+        #TTL histogram
+        ttl.update(ttls[i] for i in received)
+
+        #clock error
+        block_clock_error = max(
+            owp_error_estimate(src_scale[i], src_mult[i]) + owp_error_estimate(dst_scale[i], dst_mult[i])
+            for i in received)
+        if max_clock_error is None or block_clock_error > max_clock_error:
+            max_clock_error = block_clock_error
+
+    results['packets-sent'] = sent
+    results['packets-received'] = received_total
+    results['packets-duplicated'] = duplicated
+    results['packets-reordered'] = reordered
+    results['packets-lost'] = sent - received_total
+
+    #bucket names are only formatted once per distinct bucket
+    results['histogram-latency'] = {}
+    for bucket, bucket_count in latency.iteritems():
+        name = DELAY_BUCKET_FORMAT % bucket
+        results['histogram-latency'][name] = results['histogram-latency'].get(name, 0) + bucket_count
+    results['histogram-ttl'] = dict((str(value), ttl_count) for value, ttl_count in ttl.iteritems())
+
+    #convert clock error to ms
+    if max_clock_error is not None:
+        results['max-clock-error'] = round(max_clock_error/TIME_SCALE, CLOCK_ERROR_DIGITS)
+
+    results['succeeded'] = True
+
+    return results
@@ -0,0 +1,192 @@
+"""
+tests for reading OWAMP session files in powstream_utils
+"""
+
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), "..", "powstream"))
+
+from powstream_utils import *
+
+
+#space between the fixed header and the records, which real files use
+#for the test request and other things that aren't read
+HEADER_PADDING = 56
+
+#OWAMP timestamp for 2017-01-01, in 32.32 fixed point
+BASE_TIMESTAMP = 3692217600 << 32
+
+
+def owp_record(seq, src_ts, src_error, dst_ts, dst_error, ttl):
+    """
+    Build the bytes of one record.  Errors are (sync, scale, multiplier).
+    """
+    src_sync, src_scale, src_mult = src_error
+    dst_sync, dst_scale, dst_mult = dst_error
+    return struct.pack('>' + OWP_RECORD_FORMAT, seq, src_ts,
+                       (0x80 if src_sync else 0) | src_scale, src_mult,
+                       (0x80 if dst_sync else 0) | dst_scale, dst_mult,
+                       dst_ts, ttl)
+
+
+def owp_file(path, records, finished=True, magic=OWP_MAGIC,
+             version=OWP_FILE_VERSION):
+    """
+    Write a version 3 session file.  Unfinished files have no record
+    count, the same as those powstream is still writing.
+    """
+    header_length = OWP_HEADER.size + HEADER_PADDING
+    with open(path, 'wb') as out:
+        out.write(OWP_HEADER.pack(magic, version, header_length,
+                                  1 if finished else 0, len(records), 0,
+                                  len(records) if finished else 0, 0,
+                                  header_length))
+        out.write('\0' * HEADER_PADDING)
+        for record in records:
+            out.write(owp_record(*record))
+
+
+def owstats_output(records):
+    """
+    Produce what 'owstats -R' prints for a set of records.
+    """
+    lines = []
+    for seq, src_ts, src_error, dst_ts, dst_error, ttl in records:
+        lines.append("%d %d %d %g %d %d %g %d" % (
+            seq, src_ts, 1 if src_error[0] else 0,
+            owp_error_estimate(src_error[1], src_error[2]),
+            dst_ts, 1 if dst_error[0] else 0,
+            owp_error_estimate(dst_error[1], dst_error[2]),
+            ttl))
+    return "\n".join(lines) + "\n"
+
+
+def session(count, seed):
+    """
+    Generate a session's worth of records with some packets lost,
+    duplicated and reordered.
+    """
+    rand = random.Random(seed)
+    interval = 1 << 28   #about 62 ms
+    records = []
+    for seq in range(count):
+        src_ts = BASE_TIMESTAMP + seq * interval
+        src_error = (rand.random() < 0.9, rand.randint(0, 30), rand.randint(1, 255))
+        dst_error = (rand.random() < 0.9, rand.randint(0, 30), rand.randint(1, 255))
+        roll = rand.random()
+        if roll < 0.05:
+            #lost
+            dst_ts = 0
+        else:
+            #delay of up to about 100 ms, with the occasional negative
+            #one from bad clocks
+            dst_ts = src_ts + rand.randint(-(1 << 22), 1 << 28)
+        records.append((seq, src_ts, src_error, dst_ts, dst_error, rand.choice([252, 253, 255])))
+    for _ in range(count // 50):
+        #duplicated, which owamp records again later in the file
+        records.insert(rand.randint(0, len(records)), rand.choice(records))
+    for _ in range(count // 50):
+        #reordered
+        i = rand.randint(1, len(records) - 1)
+        records[i - 1], records[i] = records[i], records[i - 1]
+    return records
+
+
+class OWPFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "session.owp")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def assert_same_as_owstats(self, records, raw_output=False, finished=True, bucket_width=TIME_SCALE):
+        owp_file(self.path, records, finished=finished)
+        expected = parse_raw_owamp_output(owstats_output(records), raw_output=raw_output, bucket_width=bucket_width)
+        results = parse_owp_file(self.path, raw_output=raw_output, bucket_width=bucket_width)
+
+        #owstats prints error estimates with limited precision
+        if raw_output:
+            expected_packets = expected.pop('raw-packets')
+            packets = results.pop('raw-packets')
+            self.assertEqual(len(packets), len(expected_packets))
+            for packet, expected_packet in zip(packets, expected_packets):
+                for field in ['src-clock-err', 'dst-clock-err']:
+                    error = packet.pop(field)
+                    self.assertTrue(abs(error - expected_packet.pop(field)) <= 1e-5 * error)
+                self.assertEqual(packet, expected_packet)
+
+        self.assertEqual(results, expected)
+        return results
+
+    def test_lost_duplicated_reordered(self):
+        error = (True, 10, 100)
+        records = [
+            (0, BASE_TIMESTAMP, error, BASE_TIMESTAMP + (1 << 24), error, 255),
+            (2, BASE_TIMESTAMP + 2, error, BASE_TIMESTAMP + (2 << 24), error, 255),
+            (1, BASE_TIMESTAMP + 1, error, BASE_TIMESTAMP + (3 << 24), error, 254),
+            (3, BASE_TIMESTAMP + 3, error, 0, error, 255),
+            (2, BASE_TIMESTAMP + 2, error, BASE_TIMESTAMP + (2 << 24), error, 255),
+            (4, BASE_TIMESTAMP + 4, (False, 20, 3), BASE_TIMESTAMP + (1 << 24), (True, 0, 1), 255),
+        ]
+        results = self.assert_same_as_owstats(records)
+        self.assertEqual(results['packets-sent'], 5)
+        self.assertEqual(results['packets-received'], 4)
+        self.assertEqual(results['packets-lost'], 1)
+        self.assertEqual(results['packets-duplicated'], 1)
+        self.assertEqual(results['packets-reordered'], 1)
+        self.assertEqual(results['histogram-ttl'], {'255': 3, '254': 1})
+        #(3 << 20) + 1, in 2^-32 seconds
+        self.assertEqual(results['max-clock-error'], 0.73)
+
+    def test_raw_packets(self):
+        self.assert_same_as_owstats(session(200, 1), raw_output=True)
+
+    def test_sessions(self):
+        #larger than a block of records so blocks are combined
+        for seed in range(3):
+            self.assert_same_as_owstats(session(OWP_BLOCK_RECORDS * 2 + 17, seed))
+
+    def test_bucket_width(self):
+        self.assert_same_as_owstats(session(500, 4), bucket_width=0.0001)
+
+    def test_unfinished(self):
+        self.assert_same_as_owstats(session(300, 5), finished=False)
+
+    def test_empty(self):
+        results = self.assert_same_as_owstats([])
+        self.assertEqual(results['packets-sent'], 0)
+        self.assertFalse('max-clock-error' in results)
+
+    def test_blocks(self):
+        records = session(10, 6)
+        owp_file(self.path, records)
+        blocks = list(read_owp_records(self.path, block_records=4))
+        self.assertEqual([len(block[0]) for block in blocks], [4, 4, 2])
+        seqs = sum([list(block[0]) for block in blocks], [])
+        self.assertEqual(seqs, [record[0] for record in records])
+
+    def test_bad_files(self):
+        self.assertRaises(OWPFileError, parse_owp_file, os.path.join(self.tmpdir, "missing.owp"))
+
+        with open(self.path, 'wb') as out:
+            out.write('OwA\0')
+        self.assertRaises(OWPFileError, parse_owp_file, self.path)
+
+        owp_file(self.path, session(10, 7), magic='XXXX')
+        self.assertRaises(OWPFileError, parse_owp_file, self.path)
+
+        owp_file(self.path, session(10, 7), version=2)
+        self.assertRaises(OWPFileError, parse_owp_file, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Benchmark for json_validate(), comparing cached validators with
+building a new one for every validation the way it used to be done.
+
+This is not part of the unit tests.  Run it by hand from the
+directory above this one to compare changes:
+
+    python benchmarks/jsonval.py
+"""
+
+import copy
+import jsonschema
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pscheduler.jsonval import json_validate, __default_schema__
+
+
+SKELETON = {
+    "type": "object",
+    "properties": {
+        "task": {"$ref": "#/pScheduler/TaskSpecification"}
+    },
+    "required": ["task"]
+}
+
+SAMPLE = { "task": {
+    "schema": 1,
+    "test": { "type": "rtt", "spec": { "dest": "www.perfsonar.net" } },
+    "schedule": { "repeat": "PT5M", "slip": "PT1M" }
+} }
+
+
+def uncached_validate(json, skeleton):
+    """
+    Validate the way json_validate() did before caching.
+    """
+    schema = copy.copy(__default_schema__)
+    for element in [ 'type', 'items', 'properties',
+                     'additionalProperties', 'required', 'local',
+                     '$ref' ]:
+        if element in skeleton:
+            schema[element] = skeleton[element]
+    jsonschema.Draft7Validator.check_schema(schema)
+    try:
+        jsonschema.validate(json, schema,
+                            format_checker=jsonschema.draft7_format_checker)
+    except jsonschema.exceptions.ValidationError as ex:
+        return (False, ex.message)
+    return (True, 'OK')
+
+
+def rate(function, count):
+    """
+    Return the number of validations per second 'function' does.
+    """
+    start = time.time()
+    for iteration in range(0, count):
+        function(SAMPLE, SKELETON)
+    return count / (time.time() - start)
+
+
+def main():
+    assert json_validate(SAMPLE, SKELETON) == (True, 'OK')
+    assert uncached_validate(SAMPLE, SKELETON) == (True, 'OK')
+
+    uncached = rate(uncached_validate, 20)
+    cached = rate(json_validate, 500)
+
+    print "Validations/sec: %.1f uncached, %.1f cached (%.0fx)" % (
+        uncached, cached, cached / uncached)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark for streaming JSON (RFC 7464) parsing and emitting.
+
+This is not part of the unit tests.  Run it by hand from the
+directory above this one to compare changes:
+
+    python benchmarks/rfc7464.py
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pscheduler.psjson import json_dump, RFC7464Emitter, RFC7464Parser
+
+
+SMALL = { "succeeded": True, "result": [ 1.5, 2.5, "three" ] }
+SMALL_COUNT = 20000
+
+LARGE_ELEMENTS = 100000
+LARGE = { "raw": [ { "interval": n, "bytes": n * 1000 }
+                   for n in range(0, LARGE_ELEMENTS) ] }
+LARGE_COUNT = 5
+
+
+def main():
+
+    read_fd, write_fd = os.pipe()
+    read_file = os.fdopen(read_fd, 'r')
+    write_file = os.fdopen(write_fd, 'w')
+
+    parser = RFC7464Parser(read_file)
+    emitter = RFC7464Emitter(write_file)
+
+    def write():
+        for count in range(0, SMALL_COUNT):
+            emitter(SMALL)
+        for count in range(0, LARGE_COUNT):
+            emitter(LARGE)
+        write_file.close()
+
+    writer = threading.Thread(target=write)
+    start = time.time()
+    writer.start()
+
+    for count in range(0, SMALL_COUNT):
+        assert parser() == SMALL
+    small_time = time.time() - start
+
+    start = time.time()
+    for count in range(0, LARGE_COUNT):
+        assert len(parser()["raw"]) == LARGE_ELEMENTS
+    large_time = time.time() - start
+
+    writer.join()
+    read_file.close()
+
+    print "Small records:  %.0f/sec" % (SMALL_COUNT / small_time)
+    print "%.1f MB records: %.1f/sec" % (len(json_dump(LARGE)) / 1048576.0,
+                                         LARGE_COUNT / large_time)
+    print "Peak RSS:       %d kB" % (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,11 +24,13 @@ from .numeric import *
 from .numericrange import *
 from .program import *
 from .pidfile import *
+from .pluginhost import *
 from .psas import *
 from .psdns import *
 from .psjson import *
 from .psselect import *
 from .pstime import *
+from .rangeoverlap import *
 from .psurl import *
 from .retry import *
 from .saferun import *
@@ -38,5 +40,6 @@ from .ipcidrmatcher import *
 from .speccli import *
 from .text import *
 from .threadsafe import *
+from .timerqueue import *
 from .unittesting import *
 from .interface import *
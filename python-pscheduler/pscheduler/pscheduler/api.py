@@ -2,10 +2,7 @@
 Functions related to the pScheduler REST and Plugin APIs
 """
 
-import multiprocessing
-import multiprocessing.dummy
 import socket
-import threading
 import urlparse
 import uuid
 
@@ -164,18 +161,11 @@ def api_result_delimiter():
 
 
 
-def api_ping(host=None, bind=None, timeout=3):
+def __api_ping_status(status, result):
     """
-    See if an API server is alive within a given timeout.  If 'host'
-    is None, ping the local server.
-
-    Returns a tuple of (up, reason), where reason is a string
-    explaining why 'up' is what is is.
+    Interpret the status and result of fetching an API's root URL
+    and return a tuple of (up, reason).
     """
-    url = pscheduler.api_url(host)
-
-    status, result = url_get(url, bind=bind, json=False,
-                             throw=False, timeout=timeout)
 
     if status == 200:
 
@@ -201,36 +191,40 @@ def api_ping(host=None, bind=None, timeout=3):
 
 
 
+def api_ping(host=None, bind=None, timeout=3):
+    """
+    See if an API server is alive within a given timeout.  If 'host'
+    is None, ping the local server.
+
+    Returns a tuple of (up, reason), where reason is a string
+    explaining why 'up' is what is is.
+    """
+    url = pscheduler.api_url(host)
+
+    status, result = url_get(url, bind=bind, json=False,
+                             throw=False, timeout=timeout)
+
+    return __api_ping_status(status, result)
+
+
+
 
 def api_ping_list(hosts, bind=None, timeout=None, threads=10):
     """
-    Ping a list of hosts and return a list of their statuses.
+    Ping a list of hosts all at once and return a dictionary of their
+    statuses.  The 'threads' argument is no longer used.
     """
 
     if len(hosts) == 0:
         return {}
 
-    # Work around a bug in 2.6
-    # TODO: Get rid of this when 2.6 is no longer in the picture.
-    if not hasattr(threading.current_thread(), "_children"):
-        threading.current_thread()._children = weakref.WeakKeyDictionary()
-
-    pool = multiprocessing.dummy.Pool(processes=min(len(hosts), threads))
+    results = url_get_many([ pscheduler.api_url(host) for host in hosts ],
+                           bind=bind, json=False, timeout=timeout)
 
-    pool_args = [(host, timeout) for host in hosts]
     result = {}
-
-    def ping_one(arg):
-        host, timeout = arg
-        up, _ = api_ping(host, bind=bind, timeout=timeout)
-        return (host, up)
-
-    for host, state in pool.imap(
-            ping_one,
-            pool_args,
-            chunksize=1):
-        result[host] = state
-    pool.close()
+    for host, (status, text) in zip(hosts, results):
+        up, _ = __api_ping_status(status, text)
+        result[host] = up
     return result
 
 
@@ -2,12 +2,16 @@
 Functions for connecting to the pScheduler database
 """
 
+import collections
 import errno
 import os
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 import select
 import sys
 import threading
+import time
 
 from filestring import string_from_file
 from psselect import polled_select
@@ -203,6 +207,321 @@ class PgConnection:
         self.pg.rowback()
 
 
+#
+# Bounded connection pool
+#
+
+class PgPoolTimeout(Exception):
+    """Raised when no pooled connection became available in time."""
+    pass
+
+
+class _PgPoolWaiter(object):
+    """
+    INTERNAL USE ONLY: A thread waiting on a PgConnectionPool.  It is
+    handed either a connection or the right to open a new one.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.served = False
+        self.connection = None
+
+
+class PgConnectionPool(object):
+
+    """
+    Bounded, thread-safe pool of database connections.  Threads
+    wanting a connection when all of them are in use block until one
+    is returned or a timeout expires and are served in the order they
+    arrived.  Returned connections are handed directly to the next
+    waiter rather than being polled for.
+    """
+
+    def __init__(self, dsn, size,
+                 autocommit=True,
+                 name=None,
+                 timeout=None,
+                 check_interval=30,
+                 connector=None):
+        """
+        Create a pool.  Arguments:
+
+        dsn - Data source name, as for pg_connection().
+
+        size - Maximum number of connections the pool will open.
+
+        autocommit - As for pg_connection().
+
+        name - Application name to report to the server.
+
+        timeout - Default number of seconds getconn() will wait for a
+        connection.  None waits forever.
+
+        check_interval - Connections that have been idle longer than
+        this many seconds are checked with a trivial query before
+        being handed out.  None disables checking.
+
+        connector - Function taking (dsn, autocommit, name) which
+        returns a new connection.  Defaults to pg_connection().
+        """
+
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.dsn = dsn
+        self.size = size
+        self.autocommit = autocommit
+        self.name = name
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.connector = connector if connector is not None \
+                         else pg_connection
+
+        self.lock = threading.Lock()
+        self.idle = []                       # (connection, last_used)
+        self.waiters = collections.deque()   # _PgPoolWaiter, FIFO
+        self.opened = 0
+        self.in_use = 0
+        self.closed = False
+
+        self.counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait-time-total": 0.0,
+            "wait-time-max": 0.0,
+            "timeouts": 0,
+            "connects": 0,
+            "connect-failures": 0,
+            "discards": 0,
+            "failed-checks": 0
+        }
+
+
+    def __connect(self):
+        """
+        INTERNAL USE ONLY: Open a new connection for a slot that has
+        already been accounted for in self.opened.
+        """
+        try:
+            connection = self.connector(self.dsn, self.autocommit, self.name)
+        except Exception:
+            with self.lock:
+                self.counters["connect-failures"] += 1
+                self.__release_slot()
+            raise
+        with self.lock:
+            self.counters["connects"] += 1
+        return connection
+
+
+    def __release_slot(self):
+        """
+        INTERNAL USE ONLY: Give up a slot whose connection is gone,
+        passing the right to connect to the next waiter if there is
+        one.  Must be called with the lock held.
+        """
+        if self.waiters:
+            waiter = self.waiters.popleft()
+            waiter.served = True
+            waiter.event.set()
+        else:
+            self.opened -= 1
+
+
+    def __healthy(self, connection, last_used):
+        """
+        INTERNAL USE ONLY: Determine whether an idle connection is
+        still usable.
+        """
+        if connection.closed:
+            return False
+        if self.check_interval is None \
+           or (time.time() - last_used) < self.check_interval:
+            return True
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            return True
+        except psycopg2.Error:
+            with self.lock:
+                self.counters["failed-checks"] += 1
+            return False
+
+
+    def __close_quietly(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+    def getconn(self, timeout=-1):
+        """
+        Get a connection from the pool, waiting through 'timeout'
+        seconds (the pool's default if not specified, forever if None)
+        for one to become available.  Raises PgPoolTimeout if none
+        did.
+        """
+
+        if timeout == -1:
+            timeout = self.timeout
+
+        started = time.time()
+        waiter = None
+
+        with self.lock:
+
+            if self.closed:
+                raise psycopg2.pool.PoolError("Connection pool is closed")
+
+            self.counters["checkouts"] += 1
+
+            if self.waiters or (not self.idle and self.opened >= self.size):
+                waiter = _PgPoolWaiter()
+                self.waiters.append(waiter)
+                self.counters["waits"] += 1
+                candidate = None
+            elif self.idle:
+                candidate = self.idle.pop()
+            else:
+                self.opened += 1
+                candidate = (None, None)
+
+        if waiter is not None:
+            waiter.event.wait(timeout)
+            with self.lock:
+                waited = time.time() - started
+                self.counters["wait-time-total"] += waited
+                self.counters["wait-time-max"] = max(
+                    self.counters["wait-time-max"], waited)
+                if not waiter.served:
+                    self.waiters.remove(waiter)
+                    self.counters["timeouts"] += 1
+                    raise PgPoolTimeout(
+                        "No database connection available after %.3f seconds"
+                        % (waited))
+            candidate = (waiter.connection, time.time())
+
+        connection, last_used = candidate
+
+        if connection is not None and not self.__healthy(connection, last_used):
+            self.__close_quietly(connection)
+            with self.lock:
+                self.counters["discards"] += 1
+            connection = None
+
+        if connection is None:
+            connection = self.__connect()
+
+        with self.lock:
+            self.in_use += 1
+
+        return connection
+
+
+    def putconn(self, connection, discard=False):
+        """
+        Return a connection to the pool.  If 'discard' is True or the
+        connection is unusable, it will be closed and a new one opened
+        in its place when next needed.
+        """
+
+        if not discard and not connection.closed \
+           and connection.get_transaction_status() \
+               != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        discard = discard or bool(connection.closed) or self.closed
+
+        if discard:
+            self.__close_quietly(connection)
+
+        with self.lock:
+
+            self.in_use -= 1
+
+            if discard:
+                self.counters["discards"] += 1
+                self.__release_slot()
+                return
+
+            if self.waiters:
+                waiter = self.waiters.popleft()
+                waiter.connection = connection
+                waiter.served = True
+                waiter.event.set()
+            else:
+                self.idle.append((connection, time.time()))
+
+
+    def connection(self, timeout=-1):
+        """
+        Return a context manager that checks out a connection and
+        returns it when done, discarding it if an OperationalError was
+        raised while it was in use.
+        """
+        return _PgPoolConnection(self, timeout)
+
+
+    def closeall(self):
+        """
+        Close all idle connections and refuse further checkouts.
+        Connections in use are closed as they are returned.
+        """
+        with self.lock:
+            self.closed = True
+            idle = self.idle
+            self.idle = []
+            self.opened -= len(idle)
+        for connection, last_used in idle:
+            self.__close_quietly(connection)
+
+
+    def stats(self):
+        """
+        Return a dictionary of statistics about the pool.
+        """
+        with self.lock:
+            result = dict(self.counters)
+            result.update({
+                "size": self.size,
+                "open": self.opened,
+                "in-use": self.in_use,
+                "idle": len(self.idle),
+                "waiting": len(self.waiters)
+            })
+        return result
+
+
+
+class _PgPoolConnection(object):
+    """
+    INTERNAL USE ONLY: Context manager for PgConnectionPool.connection()
+    """
+
+    def __init__(self, pool, timeout):
+        self.pool = pool
+        self.timeout = timeout
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.getconn(self.timeout)
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.pool.putconn(
+            self.conn,
+            discard=exc_type is not None
+            and issubclass(exc_type, psycopg2.OperationalError))
+        self.conn = None
+
+
+
 #
 # Test Program
 #
@@ -63,8 +63,14 @@ class ExpiringSet(object):
 
 
 
-    def expire(self, key):
-        """Force immediate expiration and purging of an object"""
+    def expire(self, key, item=None):
+        """Force immediate expiration and purging of an object.  If
+        item is provided, the object is only expired if it is that
+        item."""
+
+        if item is not None and self.items[key]["item"] is not item:
+            self._debug("Not expiring replaced item %s" % (key))
+            return
 
         self._debug("Forced expiration of %s" % (key))
         self.destroyer(self.items[key]["item"])
@@ -3,9 +3,13 @@ Functions for validating JSON against the pScheduler JSON and standard
 values dictionaries
 """
 
+import collections
 import copy
 import jsonschema
 import sys
+import threading
+
+from json import dumps
 
 # TODO: Consider adding tile/description and maybe "example" (not
 # officially supported) as a way to generate the JSON dictionary.
@@ -1208,7 +1212,8 @@ __dictionary__ = {
                 "name":         { "$ref": "#/pScheduler/String" },
                 "description":  { "$ref": "#/pScheduler/String" },
                 "version":      { "$ref": "#/pScheduler/Version" },
-                "maintainer":   { "$ref": "#/pScheduler/Maintainer" }
+                "maintainer":   { "$ref": "#/pScheduler/Maintainer" },
+                "batch":        { "$ref": "#/pScheduler/Boolean" }
             },
             "additionalProperties": False,
             "required": [
@@ -1259,6 +1264,79 @@ __default_schema__ = {
 
 
 
+#
+# Compiled validators
+#
+# Building a validator means checking the schema, which includes the
+# entire dictionary, against the metaschema.  That's done once for
+# each distinct skeleton and the result kept.
+#
+
+__skeleton_elements__ = [ 'type', 'items', 'properties',
+                          'additionalProperties', 'required', 'local',
+                          '$ref' ]
+
+__validator_cache_size__ = 500
+__validators__ = collections.OrderedDict()  # Fingerprint -> (validator, lock)
+__validators_lock__ = threading.Lock()
+
+
+def __build_validator(skeleton):
+    """
+    Build a checked validator for a skeleton.
+    """
+
+    # Build up the schema from the dictionaries and user input.
+
+    # A shallow copy is sufficient for this since we don't clobber the
+    # innards.
+    schema = copy.copy(__default_schema__)
+
+    for element in __skeleton_elements__:
+        if element in skeleton:
+            schema[element] = skeleton[element]
+
+    # Let this throw whatever it's going to throw, since schema errors
+    # are problems wih the software, not the data.
+
+    jsonschema.Draft7Validator.check_schema(schema)
+
+    return jsonschema.Draft7Validator(
+        schema, format_checker=jsonschema.draft7_format_checker)
+
+
+def __validator(skeleton):
+    """
+    Return a tuple of the cached validator for a skeleton and the lock
+    that must be held while using it.  Throws a TypeError if the
+    skeleton can't be fingerprinted.
+    """
+
+    fingerprint = dumps(
+        dict([ (element, skeleton[element])
+               for element in __skeleton_elements__
+               if element in skeleton ]),
+        sort_keys=True)
+
+    with __validators_lock__:
+        try:
+            entry = __validators__.pop(fingerprint)
+            __validators__[fingerprint] = entry
+            return entry
+        except KeyError:
+            pass
+
+    # Build outside the lock; a race just means building it twice.
+    entry = (__build_validator(skeleton), threading.Lock())
+
+    with __validators_lock__:
+        __validators__[fingerprint] = entry
+        while len(__validators__) > __validator_cache_size__:
+            __validators__.popitem(last=False)
+
+    return entry
+
+
 def json_validate(json, skeleton):
     """Validate JSON against a jsonschema schema.
 
@@ -1305,36 +1383,27 @@ def json_validate(json, skeleton):
         raise ValueError("Skeleton provided must be a dictionary.")
 
 
-    # Build up the schema from the dictionaries and user input.
-
-    # A shallow copy is sufficient for this since we don't clobber the
-    # innards.
-    schema = copy.copy(__default_schema__)
-
-    for element in [ 'type', 'items', 'properties', 'additionalProperties',
-                     'required', 'local', '$ref' ]:
-        if element in skeleton:
-            schema[element] = skeleton[element]
-
-    # Let this throw whatever it's going to throw, since schema errors
-    # are problems wih the software, not the data.
+    try:
+        validator, lock = __validator(skeleton)
+    except TypeError:
+        # Skeletons that can't be fingerprinted don't get cached.
+        validator, lock = __build_validator(skeleton), threading.Lock()
 
-    jsonschema.Draft7Validator.check_schema(schema)
+    # Ref resolution isn't thread-safe, so each validator is used by
+    # one thread at a time.
+    with lock:
+        error = jsonschema.exceptions.best_match(validator.iter_errors(json))
 
-    try:
-        jsonschema.validate(json, schema,
-                            format_checker=jsonschema.draft7_format_checker
-        )
-    except jsonschema.exceptions.ValidationError as ex:
+    if error is not None:
 
         try:
-            message = ex.schema["x-invalid-message"].replace("%s", ex.instance)
+            message = error.schema["x-invalid-message"].replace("%s", error.instance)
         except (KeyError, TypeError):
-            message = ex.message
+            message = error.message
 
         # TODO: Remove version check once 2.6 support is gone
-        if sys.hexversion >= 0x2070000 and len(ex.absolute_path) > 0:
-            path = "/".join([str(x) for x in ex.absolute_path])
+        if sys.hexversion >= 0x2070000 and len(error.absolute_path) > 0:
+            path = "/".join([str(x) for x in error.absolute_path])
             return (False, "At /%s: %s" % (path, message))
         else:
             return (False, "%s" % (message))
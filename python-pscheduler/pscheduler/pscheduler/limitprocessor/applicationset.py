@@ -90,9 +90,13 @@ class ApplicationSet():
         self.limits = limits
 
 
-    def __check_group(self, proposal, group, check_schedule):
+    def __check_group(self, proposal, group, check_schedule, evaluations,
+                      shared):
         """
-        Check a group of limits and return a tuple:
+        Check a group of limits, using and adding to the results of
+        limits already evaluated for this proposal in 'evaluations'
+        and of limits that can be shared between schedules in 'shared'
+        (if not None), and return a tuple:
             pass - True if the group passed
             limits_passed - List of the limits that passed
             diags - Array of diagnostic messages
@@ -111,12 +115,22 @@ class ApplicationSet():
 
         for limit in group['limits']:
 
-            # TODO: Consider finding a way to cache these results so
-            # that if the same limit is applied in multiple places, it
-            # doesn't have to be processed again.  Might not actually
-            # be an issue.
+            # The same limit applied in multiple places comes out
+            # the same way for the same proposal, so only do it once.
+
+            try:
+                evaluated = evaluations[limit]
+            except KeyError:
+                evaluated = shared.get(limit, None) \
+                            if shared is not None else None
+                if evaluated is None:
+                    evaluated = self.limits.check(proposal, limit,
+                                                  check_schedule)
+                    if shared is not None \
+                       and self.limits.shares_results(limit):
+                        shared[limit] = evaluated
+                evaluations[limit] = evaluated
 
-            evaluated = self.limits.check(proposal, limit, check_schedule)
             limit_passed = evaluated['passed']
 
             if limit_passed:
@@ -143,7 +157,8 @@ class ApplicationSet():
         return passed, limits_passed, diags
 
 
-    def __check_application(self, application, proposal, classifiers, check_schedule):
+    def __check_application(self, application, proposal, classifiers,
+                            check_schedule, evaluations, shared):
 
         """Evaluate the groups of limits in an application, stopping when one
         fails.
@@ -158,7 +173,8 @@ class ApplicationSet():
         for group in application['apply']:
             group_no += 1
             group_passed, group_limits_passed, group_diags \
-                = self.__check_group(proposal, group, check_schedule)
+                = self.__check_group(proposal, group, check_schedule,
+                                     evaluations, shared)
             diags.extend([ "Group %d: %s" % (group_no, diag) for diag in group_diags ])
             if group_passed:
                 groups_failed -= 1
@@ -185,7 +201,8 @@ class ApplicationSet():
     def check(self,
               proposal,            # Task and hints
               classifiers,         # List of the classifiers
-              check_schedule=True  # Keep/disregard time-related limits
+              check_schedule=True, # Keep/disregard time-related limits
+              shared=None          # Results of limits shared between schedules
               ):
 
         """Determine if a task can be run, return true/false, a list of lists
@@ -195,11 +212,18 @@ class ApplicationSet():
         with that list containing descriptions of the limits passed
         for that application.  (See the code in the top-level limit
         processor to see how this is used.)
+
+        If 'shared' is a dictionary, results of limits that can be
+        shared between schedules (see LimitSet.shares_results()) are
+        taken from it and added to it so proposals differing only in
+        their run_schedule can be checked without evaluating those
+        limits again.
         """
 
         diags = []
         pass_count = 0
         limits_passed = []
+        evaluations = {}  # Limit name -> Result of checking it
 
         # Run through each application, stopping when one passes or a
         # failed one has stop-on-failure
@@ -222,7 +246,8 @@ class ApplicationSet():
 
             passed, forced_stop, check_limits_passed, app_diags \
                 = self.__check_application(application, proposal, classifiers,
-                                           check_schedule)
+                                           check_schedule, evaluations,
+                                           shared)
            
             diags.extend([ indent(diag) for diag in app_diags])
 
@@ -2,9 +2,10 @@
 Identifier Class for ip-cidr-list
 """
 
-import ipaddress
 import pscheduler
 
+from ..prefixindex import PrefixIndex
+
 data_validator = {
     "type": "object",
     "properties": {
@@ -45,9 +46,7 @@ class IdentifierIPCIDRList():
         if not valid:
             raise ValueError("Invalid data: %s" % message)
 
-        self.cidrs = []
-        for cidr in data['cidrs']:
-            self.cidrs.append(ipaddress.ip_network(unicode(cidr)))
+        self.cidrs = PrefixIndex(data['cidrs'])
 
 
 
@@ -61,19 +60,11 @@ class IdentifierIPCIDRList():
         """
 
         try:
-            ip = ipaddress.ip_network(unicode(hints['requester']))
+            ip = hints['requester']
         except KeyError:
             return False
 
-        # TODO: Find out of there's a more hash-like way to do this
-        # instead of a linear search.  This would be great if it
-        # weren't GPL: https://pypi.python.org/pypi/pytricia
-
-        for cidr in self.cidrs:
-            if cidr.overlaps(ip):
-                return True
-
-        return False
+        return self.cidrs.overlaps(ip)
 
 
 # A short test program
@@ -3,11 +3,12 @@ Identifier Class for ip-cidr-list-url
 """
 
 import datetime
-import radix
 import pscheduler
 import time
 import threading
 
+from ..prefixindex import PrefixIndex
+
 
 data_validator = {
     "type": "object",
@@ -91,8 +92,7 @@ class IdentifierIPCIDRListURL():
         # be retrieved if we fail to fetch at startup.
 
         # TODO: When threaded, hold this separately and swap old list
-        new_cidrs = radix.Radix()
-        new_length = 0
+        new_cidrs = PrefixIndex()
 
         for cidr in text.split('\n'):
 
@@ -102,7 +102,6 @@ class IdentifierIPCIDRListURL():
                 continue
             try:
                 new_cidrs.add(cidr)
-                new_length += 1
             except ValueError:
                 # Just ignore anything that looks fishy.
                 # TODO: Log it?
@@ -110,7 +109,7 @@ class IdentifierIPCIDRListURL():
 
         with self.data_lock:
             self.cidrs = new_cidrs
-            self.length = new_length
+            self.length = len(new_cidrs)
             self.next_attempt = datetime.datetime.now() + self.update
 
 
@@ -155,13 +154,8 @@ class IdentifierIPCIDRListURL():
             self.transform = None
 
 
-        self.exclusions = radix.Radix()
-        if 'exclude' in data:
-            try:
-                for excl in data['exclude']:
-                    self.exclusions.add(excl)
-            except ValueError:
-                raise ValueError("Invalid IP or CIDR '%s'" % excl)
+        # This will raise a ValueError if anything is wrong.
+        self.exclusions = PrefixIndex(data.get('exclude', []))
 
 
         self.data_lock = threading.Lock()
@@ -170,7 +164,7 @@ class IdentifierIPCIDRListURL():
         # TODO: Would be nice to support a timeout so the system
         # doesn't sit for too long.
 
-        self.cidrs = radix.Radix()
+        self.cidrs = PrefixIndex()
         self.length = 0
 
         # Prime the timer with the epoch and do a first load of the list
@@ -198,15 +192,10 @@ class IdentifierIPCIDRListURL():
         except KeyError:
             return False
 
-        try:
-            prefix = self.cidrs.search_best(ip)
-        except ValueError:
-            raise ValueError("Invalid IP '%s'" % ip)
-
-        if prefix is None:
+        if not self.cidrs.overlaps(ip):
             return False
 
-        return self.exclusions.search_best(ip) is None
+        return not self.exclusions.overlaps(ip)
 
 
 
@@ -3,9 +3,10 @@ Identifier Class for ip-cymru-bogon
 """
 
 import dns
-import ipaddress
 import pscheduler
 
+from ..prefixindex import PrefixIndex
+
 data_validator = {
     "type": "object",
     "properties": {
@@ -41,8 +42,7 @@ class IdentifierIPCymruBogon():
         if not valid:
             raise ValueError("Invalid data: %s" % message)
 
-        self.exclude = [ ipaddress.ip_network(unicode(addr))
-                         for addr in data['exclude'] ]
+        self.exclude = PrefixIndex(data['exclude'])
 
         try:
             timeout = pscheduler.iso8601_as_timedelta(data['timeout'])
@@ -55,10 +55,6 @@ class IdentifierIPCymruBogon():
         except KeyError:
             self.fail_result = False
 
-        self.resolver = dns.resolver.Resolver()
-        self.resolver.timeout = self.timeout
-        self.resolver.lifetime = self.timeout
-
 
 
     def evaluate(self,
@@ -84,7 +80,8 @@ class IdentifierIPCymruBogon():
         # IPv6 hosts.
 
         try:
-            resolved = self.resolver.query(host, 'A')[0]
+            resolved = pscheduler.dns_query(host, 'A',
+                                            timeout=self.timeout)[0]
         except dns.resolver.NXDOMAIN:
             return False
         except (dns.exception.Timeout,
@@ -95,15 +92,13 @@ class IdentifierIPCymruBogon():
         # The query will return 127.0.0.2 if it's in the bogon list.
         # See http://www.team-cymru.org/bogon-reference-dns.html.
 
-        if str(resolved) != '127.0.0.2':
+        if resolved != '127.0.0.2':
             return False
 
         # At this point, we have a bogon.  Filter out exclusions.
 
-        net_ip = ipaddress.ip_network(unicode(ip))
-        for exclude in self.exclude:
-            if exclude.overlaps(net_ip):
-                return False
+        if self.exclude.overlaps(ip):
+            return False
 
         # Not excluded; must be a legit bogon.
 
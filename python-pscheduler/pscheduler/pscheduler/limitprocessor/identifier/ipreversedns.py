@@ -44,13 +44,9 @@ class IdentifierIPReverseDNS():
 
         self.matcher = pscheduler.StringMatcher(data['match'])
 
-        timeout = pscheduler.timedelta_as_seconds(
+        self.timeout = pscheduler.timedelta_as_seconds(
             pscheduler.iso8601_as_timedelta(data['timeout']))
 
-        self.resolver = dns.resolver.Resolver()
-        self.resolver.timeout = timeout
-        self.resolver.lifetime = timeout
-
 
 
 
@@ -75,7 +71,8 @@ class IdentifierIPReverseDNS():
         # Resolve to a FQDN
 
         try:
-            reverse = str(self.resolver.query(ip_reverse, 'PTR')[0])
+            reverse = pscheduler.dns_query(ip_reverse, 'PTR',
+                                           timeout=self.timeout)[0]
         except (dns.resolver.NXDOMAIN,
                 dns.exception.Timeout,
                 dns.resolver.NoAnswer,
@@ -90,14 +87,15 @@ class IdentifierIPReverseDNS():
 
         record = 'A' if addr.version == 4 else 'AAAA'
         try:
-            forwards = self.resolver.query(reverse, record)
+            forwards = pscheduler.dns_query(reverse, record,
+                                            timeout=self.timeout)
         except (dns.resolver.NXDOMAIN,
                 dns.exception.Timeout,
                 dns.resolver.NoAnswer,
                 dns.resolver.NoNameservers):
             return False
 
-        if ip not in [ str(f) for f in forwards ]:
+        if ip not in forwards:
             return False
 
         # Try to match with and without the dot at the end.
@@ -2,27 +2,25 @@
 Limit Class for runschedule
 """
 
+import datetime
 import pscheduler
 
 
-def wrappable_range_overlaps(start, end, test,
-                             wrap_after=59, wrap_to=0,
-                             overlap=False
-                             ):
+def range_mask(lower, upper):
+    """Return a bitmask with bits 'lower' through 'upper' set."""
+    return ((1 << (upper + 1)) - 1) ^ ((1 << lower) - 1)
 
-    """Figure out whether a range of numbers (specified by 'start' and
-    'end') has any overlap with the set of numbers in the set 'test'.
+
+
+def wrappable_range_mask(start, end, wrap_after=59, wrap_to=0):
+
+    """Return a bitmask of a range of numbers from 'start' to 'end'.
     The numbers in the range may wrap (e.g., the 60th minute wraps to
     the 0th or the 12th month wraps to the 1st); where the wrap occurs
     is governed by 'wrap_after' (default 59) and where it wraps is
-    governed by 'wrap_to' (default 0).  If 'overlap' is true, the
-    start and end must simply overlap with the test set, otherwise it
-    must be completely contained within it.
+    governed by 'wrap_to' (default 0).
     """
 
-    if type(test) != set:
-        raise ValueError("Type of 'test' must be 'set'")
-
     if wrap_to >= wrap_after:
         raise ValueError("Unusuable wrap values.")
 
@@ -31,16 +29,81 @@ def wrappable_range_overlaps(start, end, test,
         raise ValueError("Start and end must be in [%d..%d]" \
                          % (wrap_to, wrap_after))
 
-    ranges = []
     if end >= start:
-        ranges.extend(range(start, end+1))
-    else:
-        ranges.extend(range(start, wrap_after+1))
-        ranges.extend(range(0, wrap_to+1))
-    ranges = set(ranges)
+        return range_mask(start, end)
+    return range_mask(start, wrap_after) | range_mask(wrap_to, end)
+
+
+
+def wrappable_range_overlaps(start, end, test,
+                             wrap_after=59, wrap_to=0,
+                             overlap=False
+                             ):
+
+    """Figure out whether a range of numbers (specified by 'start' and
+    'end') has any overlap with the set of numbers in the bitmask
+    'test'.  Wrapping works as it does for wrappable_range_mask().  If
+    'overlap' is true, the start and end must simply overlap with the
+    test set, otherwise it must be completely contained within it.
+    """
+
+    if not isinstance(test, (int, long)):
+        raise ValueError("Type of 'test' must be a bitmask")
+
+    ranges = wrappable_range_mask(start, end,
+                                  wrap_after=wrap_after, wrap_to=wrap_to)
+
+    return bool(ranges & test) if overlap \
+        else (ranges & test) == ranges
+
+
+
+def __next_second(when):
+    return when.replace(microsecond=0) + datetime.timedelta(seconds=1)
+
+def __next_minute(when):
+    return when.replace(second=0, microsecond=0) \
+        + datetime.timedelta(minutes=1)
+
+def __next_hour(when):
+    return when.replace(minute=0, second=0, microsecond=0) \
+        + datetime.timedelta(hours=1)
 
-    return bool(test.intersection(ranges)) if overlap \
-        else ranges.issubset(test)
+def __next_day(when):
+    return when.replace(hour=0, minute=0, second=0, microsecond=0) \
+        + datetime.timedelta(days=1)
+
+def __next_week(when):
+    return __next_day(when) + datetime.timedelta(days=6 - when.weekday())
+
+def __next_month(when):
+    if when.month == 12:
+        return __next_year(when)
+    return when.replace(month=when.month + 1, day=1, hour=0, minute=0,
+                        second=0, microsecond=0)
+
+def __next_year(when):
+    return when.replace(year=when.year + 1, month=1, day=1, hour=0,
+                        minute=0, second=0, microsecond=0)
+
+
+# Fields checked by the limit, from the coarsest to the finest.  Each
+# is the name, the function that pulls it from a datetime, where it
+# wraps after and to, and the function that finds the start of the
+# next value.
+
+FIELDS = [
+    # Feel free to resurrect me if this ever wraps.  :-)
+    ( 'year', lambda when: when.year, 294276, 1, __next_year ),
+    ( 'month', lambda when: when.month, 12, 1, __next_month ),
+    # Python's datetime doesn't have methods to get this.  Bravo.
+    ( 'week', lambda when: when.isocalendar()[1], 53, 1, __next_week ),
+    ( 'weekday', lambda when: when.isoweekday(), 7, 1, __next_day ),
+    ( 'day', lambda when: when.day, 31, 1, __next_day ),
+    ( 'hour', lambda when: when.hour, 23, 0, __next_hour ),
+    ( 'minute', lambda when: when.minute, 59, 0, __next_minute ),
+    ( 'second', lambda when: when.second, 59, 0, __next_second )
+]
 
 
 
@@ -264,22 +327,24 @@ class LimitRunSchedule():
 
         self.overlap = data['overlap'] if 'overlap' in data else False
 
-        # Turn numbers and ranges into one flat set
+        # Compile the numbers and ranges for each field into a
+        # bitmask of the permitted values and keep a list of the
+        # fields that need checking.
 
-        self.matches = {}
+        self.fields = []
 
-        for flatten in [ "year", "month", "week", "weekday",
-                         "day", "hour", "minute", "second" ]:
-            if flatten not in data:
+        for name, value, wrap_after, wrap_to, next_value in FIELDS:
+            if name not in data:
                 continue
-            value_list = []
-            for item in data[flatten]:
+            mask = 0
+            for item in data[name]:
                 if type(item) == dict:
-                    value_list.extend(range(item['lower'], item['upper']+1))
+                    if item['lower'] <= item['upper']:
+                        mask |= range_mask(item['lower'], item['upper'])
                 else:
-                    value_list.append(item)
-
-            self.matches[flatten] = set(value_list)
+                    mask |= 1 << item
+            self.fields.append((name, value, wrap_after, wrap_to,
+                                next_value, mask))
 
 
 
@@ -287,6 +352,25 @@ class LimitRunSchedule():
         return True
 
 
+    def __failures(self, start, end):
+        """
+        Return a list of the fields that a run from 'start' to 'end'
+        doesn't match, each as a tuple of the field's name and the
+        function that finds its next value.
+        """
+
+        failures = []
+
+        for name, value, wrap_after, wrap_to, next_value, mask in self.fields:
+            if not wrappable_range_overlaps(value(start), value(end), mask,
+                                            wrap_after=wrap_after,
+                                            wrap_to=wrap_to,
+                                            overlap=self.overlap):
+                failures.append((name, next_value))
+
+        return failures
+
+
     def evaluate(self,
                  proposal  # Task and hints
                  ):
@@ -295,44 +379,52 @@ class LimitRunSchedule():
 
         start = pscheduler.iso8601_as_datetime(proposal['task']['run_schedule']['start'])
         duration = pscheduler.iso8601_as_timedelta(proposal['task']['run_schedule']['duration'])
-        end = start + duration
-
-        # Python's datetime doesn't have methods to get this.  Bravo.
-        start_week = start.isocalendar()[1]
-        end_week = end.isocalendar()[1]
-
-        match_failures = []
-
-        for name, lower, upper, wrap_after, wrap_to in [
-                # Feel free to resurrect me if this ever wraps.  :-)
-                ('year', start.year, end.year, 294276, 1),
-                ('month', start.month, end.month, 12, 1),
-                ('week', start_week, end_week, 53, 1),
-                ('weekday', start.isoweekday(), end.isoweekday(), 7, 1),
-                ('day', start.day, end.day, 31, 1),
-                ('hour', start.hour, end.hour, 23, 0),
-                ('minute', start.minute, end.minute, 59, 0),
-                ('second', start.second, end.second, 59, 0)
-                ]:
-
-            # Don't bother matching things that weren't specified
-            if name not in self.matches:
-                continue
 
-            if not wrappable_range_overlaps(lower, upper, self.matches[name],
-                                            wrap_after=wrap_after,
-                                            wrap_to=wrap_to,
-                                            overlap=self.overlap):
-                match_failures.append(name)
+        match_failures = self.__failures(start, start + duration)
 
         result = { "passed": not match_failures }
         if match_failures:
-            result['reasons'] = [ "Mismatch on " + mis
-                                  for mis in match_failures ]
+            result['reasons'] = [ "Mismatch on " + name
+                                  for name, _ in match_failures ]
 
         return result
 
 
+    def next_permitted(self,
+                       start,     # Earliest start time (datetime)
+                       duration,  # Length of the run (timedelta)
+                       latest     # Latest start time to consider (datetime)
+                       ):
+        """
+        Find the earliest time at or after 'start' and no later than
+        'latest' that a run of 'duration' would pass this limit.
+        Returns a datetime or None if there isn't one.
+        """
+
+        while start <= latest:
+
+            failures = self.__failures(start, start + duration)
+            if not failures:
+                return start
+
+            # A field that doesn't match won't until the value at the
+            # start changes or, where overlapping is allowed, the
+            # value at the end does.  Every failed field has to
+            # change, so skip to the latest of those points.
+
+            candidates = []
+            for name, next_value in failures:
+                candidate = next_value(start)
+                if self.overlap:
+                    candidate = min(candidate,
+                                    next_value(start + duration) - duration)
+                candidates.append(candidate)
+            start = max(max(candidates),
+                        start + datetime.timedelta(seconds=1))
+
+        return None
+
+
 
 # A short test program
 
@@ -360,3 +452,9 @@ if __name__ == "__main__":
 
     ev = limit.evaluate({ "task": test })
     print test, ev
+
+    start = pscheduler.iso8601_as_datetime(test["run_schedule"]["start"])
+    print "Next permitted:", limit.next_permitted(
+        start,
+        pscheduler.iso8601_as_timedelta(test["run_schedule"]["duration"]),
+        start + datetime.timedelta(days=1))
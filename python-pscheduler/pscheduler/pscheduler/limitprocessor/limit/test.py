@@ -40,8 +40,8 @@ class LimitTest():
         self.test = data['test']
         self.limit = data['limit']
 
-        returncode, stdout, stderr = pscheduler.run_program(
-            [ "pscheduler", "internal", "invoke", "test", self.test, "limit-is-valid" ],
+        returncode, stdout, stderr = pscheduler.plugin_invoke(
+            "test", self.test, "limit-is-valid",
             stdin = pscheduler.json_dump(self.limit),
             # TODO:  Is this reasonable?
             timeout = 5
@@ -73,8 +73,8 @@ class LimitTest():
             "limit": self.limit
             }
 
-        returncode, stdout, stderr = pscheduler.run_program(
-            [ "pscheduler", "internal", "invoke", "test", self.test, "limit-passes" ],
+        returncode, stdout, stderr = pscheduler.plugin_invoke(
+            "test", self.test, "limit-passes",
             stdin = pscheduler.json_dump(pass_input),
             # TODO:  Is this reasonable?
             timeout = 5
@@ -2,6 +2,11 @@
 Limit Class for url-fetch
 """
 
+import collections
+import email.utils
+import threading
+import time
+
 import pscheduler
 
 
@@ -20,7 +25,18 @@ DATA_VALIDATOR = {
         "params-transform": { "$ref": "#/pScheduler/JQTransformSpecification" },
 
         "success-only": { "$ref": "#/pScheduler/Boolean" },
-        "fail-result": { "$ref": "#/pScheduler/Boolean" }
+        "fail-result": { "$ref": "#/pScheduler/Boolean" },
+
+        "cache": {
+            "type": "object",
+            "properties": {
+                "ttl": { "$ref": "#/pScheduler/Duration" },
+                "failure-ttl": { "$ref": "#/pScheduler/Duration" },
+                "stale": { "$ref": "#/pScheduler/Duration" },
+                "size": { "$ref": "#/pScheduler/Cardinal" }
+            },
+            "additionalProperties": False
+        }
     },
     "additionalProperties": False,
     "required": [ "url" ]
@@ -49,6 +65,157 @@ def _jq_filter(transform):
 
 
 
+def _duration_seconds(data, name, default):
+    """Get a duration from a dictionary as seconds"""
+    return pscheduler.timedelta_as_seconds(
+        pscheduler.iso8601_as_timedelta(data.get(name, default)))
+
+
+
+def _response_lifetimes(headers, now):
+    """
+    Figure out how long a response may be cached and served stale
+    based on its Cache-Control and Expires headers.  Returns a tuple
+    of (lifetime, stale), either of which will be None if the headers
+    don't say.  A lifetime of zero means the response must not be
+    cached.
+    """
+
+    lifetime = None
+    stale = None
+
+    directives = {}
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.strip().lower()] = value.strip().strip('"')
+
+    if "no-store" in directives or "no-cache" in directives:
+        return (0, None)
+
+    for name in [ "s-maxage", "max-age" ]:
+        try:
+            lifetime = max(int(directives[name]), 0)
+            break
+        except (KeyError, ValueError):
+            pass
+
+    try:
+        stale = max(int(directives["stale-while-revalidate"]), 0)
+    except (KeyError, ValueError):
+        pass
+
+    if lifetime is None and "expires" in headers:
+        expires = email.utils.parsedate_tz(headers["expires"])
+        # Unparseable dates mean the response is already expired.
+        lifetime = 0 if expires is None \
+                   else max(email.utils.mktime_tz(expires) - now, 0)
+
+    return (lifetime, stale)
+
+
+
+class URLFetchCache():
+
+    """
+    Bounded cache of responses from URL fetches, keyed by the URL,
+    headers and parameters that were sent.  Successful responses are
+    kept for as long as their Cache-Control or Expires headers allow
+    or 'ttl' seconds if they don't say; failures are kept for
+    'failure_ttl' seconds.  Expired responses are served for up to
+    'stale' seconds more while a fresh copy is fetched in the
+    background.
+    """
+
+    def __init__(self,
+                 fetch,            # Function taking (url, headers, params)
+                 ttl,              # Default seconds to keep successes
+                 failure_ttl,      # Seconds to keep failures
+                 stale,            # Seconds to serve expired responses
+                 size=1000         # Most responses to hold
+                 ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.stale = stale
+        self.size = size
+        # Key -> (expires, stale_until, response)
+        self.items = collections.OrderedDict()
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+
+    def __store(self, key, url, headers, params):
+        """
+        Fetch a response and cache it if allowed.  Returns the
+        response, which is a tuple of (status, text, headers).
+        """
+        response = self.fetch(url, headers, params)
+        status, _, response_headers = response
+
+        now = time.time()
+        lifetime, stale = _response_lifetimes(response_headers, now)
+        if status != 200:
+            lifetime = self.failure_ttl
+            stale = 0
+        elif lifetime is None:
+            lifetime = self.ttl
+        if stale is None:
+            stale = self.stale
+
+        with self.lock:
+            self.items.pop(key, None)
+            if lifetime > 0:
+                self.items[key] = (now + lifetime,
+                                   now + lifetime + stale,
+                                   response)
+                while len(self.items) > self.size:
+                    self.items.popitem(last=False)
+
+        return response
+
+
+    def __refresh(self, key, url, headers, params):
+        """Replace an expired response in the background."""
+        try:
+            self.__store(key, url, headers, params)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+
+    def get(self, url, headers, params):
+        """
+        Return a cached response for a request or fetch it.
+        """
+
+        key = pscheduler.json_dump([ url, headers, params ], pretty=True)
+        now = time.time()
+
+        with self.lock:
+            try:
+                expires, stale_until, response = self.items[key]
+            except KeyError:
+                response = None
+            else:
+                if now >= stale_until:
+                    del self.items[key]
+                    response = None
+                elif now >= expires and key not in self.refreshing:
+                    self.refreshing.add(key)
+                    refresher = threading.Thread(
+                        target=self.__refresh,
+                        args=(key, url, headers, params),
+                        name="urlfetch-refresh")
+                    refresher.daemon = True
+                    refresher.start()
+
+        if response is not None:
+            return response
+
+        return self.__store(key, url, headers, params)
+
+
+
 
 
 def urlfetch_data_is_valid(data):
@@ -99,11 +266,42 @@ class LimitURLFetch():
 
         self.success_only = data.get("success-only", False)
 
+        if "cache" in data:
+            cache = data["cache"]
+            self.cache = URLFetchCache(
+                self.__fetch,
+                _duration_seconds(cache, "ttl", "PT0S"),
+                _duration_seconds(cache, "failure-ttl", "PT0S"),
+                _duration_seconds(cache, "stale", "PT0S"),
+                size=cache.get("size", 1000)
+            )
+        else:
+            self.cache = None
+
 
     def checks_schedule(self):
         return False
 
 
+    def __fetch(self, url, headers, params):
+        """
+        Fetch the URL, returning (status, text, response headers).
+        """
+        response_headers = {}
+        status, text = pscheduler.url_get(url,
+                                          bind=self.bind,
+                                          headers=headers,
+                                          params=params,
+                                          json=False,
+                                          throw=False,
+                                          timeout=self.timeout,
+                                          allow_redirects=self.follow,
+                                          verify_keys=self.verify,
+                                          response_headers=response_headers
+        )
+        return (status, text, response_headers)
+
+
     def evaluate(self,
                  proposal  # Task and hints
                  ):
@@ -161,16 +359,10 @@ class LimitURLFetch():
             params = {}
 
         # Fetch the result
-        status, text = pscheduler.url_get(url,
-                                          bind=self.bind,
-                                          headers=headers,
-                                          params=params,
-                                          json=False,
-                                          throw=False,
-                                          timeout=self.timeout,
-                                          allow_redirects=self.follow,
-                                          verify_keys=self.verify
-        )
+        if self.cache is not None:
+            status, text, _ = self.cache.get(url, headers, params)
+        else:
+            status, text, _ = self.__fetch(url, headers, params)
 
         if self.success_only:
             if status == 200:
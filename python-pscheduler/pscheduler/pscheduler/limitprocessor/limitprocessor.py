@@ -238,6 +238,177 @@ class LimitProcessor():
 
 
 
+    def process_many(self, task, hints, schedules, rewrite=True,
+                     prioritize=False):
+        """Evaluate a task against the full limit set for each of a
+        list of run_schedules.
+
+        Identification, classification and rewriting are done once,
+        as are limits that the limit set says can share their results
+        between schedules (see LimitSet.shares_results()).  Everything
+        else, including prioritization, sees the task with each
+        schedule in place as its run_schedule, the same as if it had
+        been passed to process().
+
+        Arguments are the same as for process() except:
+            schedules - A list of run_schedules, each a dictionary
+                with a 'start' and 'duration'
+
+        Returns a list of tuples in the same form process() returns,
+        one per item in 'schedules'.
+        """
+
+        if self.inert:
+            return [ (True, [], "No limits were applied", None, None) ] \
+                * len(schedules)
+
+        def failure(message):
+            return [ (False, [], message, None, None) ] * len(schedules)
+
+        task = dict(task)
+        task.pop("run_schedule", None)
+
+        diags = []
+
+        if hints is not None and len(hints) > 0:
+            diags.append("Hints:")
+            diags.extend([
+                pscheduler.indent("%s: %s" % (item, str(hints[item])))
+                for item in sorted(hints)
+            ])
+
+        proposal = {
+            "hints": hints,
+            "task": task,
+        }
+
+        #
+        # Identification
+        #
+
+        identifications = self.identifiers.identities(hints)
+        if not identifications:
+            diags.append("Made no identifications.")
+            return failure('\n'.join(diags))
+        diags.append("Identified as %s" % (', '.join(identifications)))
+
+        #
+        # Classification
+        #
+
+        classifications = self.classifiers.classifications(identifications)
+        if not classifications:
+            diags.append("Made no classifications.")
+            return failure('\n'.join(diags))
+        diags.append("Classified as %s" % (', '.join(classifications)))
+
+        re_new_task = None
+
+        #
+        # Rewriting
+        #
+
+        if self.rewriter is not None and rewrite:
+
+            try:
+                re_changed, re_new_task, re_diags \
+                    = self.rewriter(proposal, classifications)
+            except Exception as ex:
+                return failure("Error while rewriting: %s" % (str(ex)))
+
+            if re_changed:
+                diags.append("Rewriter made changes:")
+                if len(re_diags):
+                    diags += map(lambda s: "  " + s, re_diags)
+                else:
+                    diags.append("  (Not enumerated)")
+                task = re_new_task
+
+        shared = {}    # Results of limits shared between schedules
+        results = []
+
+        for schedule in schedules:
+
+            scheduled = {
+                "hints": hints,
+                "task": dict(proposal["task"], run_schedule=schedule)
+            }
+
+            run_diags = list(diags)
+
+            #
+            # Applications
+            #
+
+            passed, app_limits_passed, app_diags \
+                = self.applications.check(scheduled, classifications,
+                                          True, shared=shared)
+
+            run_diags.append(app_diags)
+            run_diags.append("Proposal %s limits"
+                             % ("meets" if passed else "does not meet"))
+
+            unlimited = len(app_limits_passed) == 0 \
+                        or min([ len(item) for item in app_limits_passed ]) == 0
+
+            #
+            # Priorities
+            #
+
+            if prioritize and passed and self.prioritizer is not None:
+
+                priority, pri_diags, pri_error = self.__prioritize(
+                    dict(task, run_schedule=schedule), classifications)
+
+                if pri_error is not None:
+                    results.append((False, [], pri_error, None, None))
+                    continue
+
+                run_diags += pri_diags
+            else:
+                priority = 0
+                run_diags.append("Priority set to default of %d" % (priority))
+
+            results.append((
+                passed,
+                [] if (unlimited or not passed) else app_limits_passed,
+                '\n'.join(run_diags),
+                re_new_task,
+                priority
+            ))
+
+        return results
+
+
+    def __prioritize(self, task, classifications):
+        """
+        Prioritize a task, returning a tuple of the priority, a list of
+        diagnostics and an error message, which will be None if there
+        was no error.
+        """
+
+        try:
+            priority, pri_diags = self.prioritizer(task, classifications)
+        except Exception as ex:
+            return None, [], "Error determining priority: %s" % (str(ex))
+
+        if priority is None:
+            return None, [], "Prioritizer produced no result"
+
+        requested_priority = task.get("priority", None)
+        if requested_priority is not None:
+            requested_message = " %d requested," % (requested_priority)
+        else:
+            requested_message =""
+
+        diags = [ "Priority%s set at %d%s" % (
+            requested_message, priority, ":" if len(pri_diags) else ".") ]
+        diags += map(lambda s: "  " + s, pri_diags)
+
+        return priority, diags, None
+
+
+
 
 
 # Test program
@@ -4,7 +4,12 @@ Set of Limits
 
 from __future__ import absolute_import
 
+import collections
 import copy
+import datetime
+import threading
+
+import pscheduler
 
 # TODO: It would be nice if we could paw through the directory, import
 # all of the modules and set this up automagically.
@@ -37,6 +42,11 @@ limit_creator = {
     'url-fetch':     lambda data: urlfetch.LimitURLFetch(data)
     }
 
+# Limit types whose evaluators are handed the entire task, including
+# its run_schedule, whether or not they say they check the schedule.
+
+whole_task_limits = [ 'jq', 'test', 'url-fetch' ]
+
 
 
 def merge_dicts(a, b, path=None):
@@ -60,6 +70,66 @@ def merge_dicts(a, b, path=None):
 
 
 
+class LimitCache():
+
+    """
+    Bounded cache of the results of evaluating one limit for a given
+    task and set of hints.  Results expire 'ttl' after they were
+    added.  Everything in the cache has the same TTL, so the oldest
+    entries are always the first to go.
+    """
+
+    def __init__(self,
+                 ttl,        # How long results are good (timedelta)
+                 size=1000   # Most results to hold
+                 ):
+        self.ttl = ttl
+        self.size = size
+        self.items = collections.OrderedDict()  # Key -> (expires, result)
+        self.lock = threading.Lock()
+
+
+    def __key(self, proposal):
+        """
+        Build a key from the parts of the proposal that don't depend
+        on when it runs.
+        """
+        task = dict(proposal["task"])
+        task.pop("run_schedule", None)
+        return pscheduler.json_dump([ task, proposal["hints"] ], pretty=True)
+
+
+    def get(self, proposal, evaluate):
+        """
+        Return the cached result for a proposal or, if there isn't
+        one, call 'evaluate' to produce a result and cache it.
+        """
+        key = self.__key(proposal)
+        now = datetime.datetime.now()
+
+        with self.lock:
+            while self.items:
+                oldest, (expires, _) = next(self.items.iteritems())
+                if expires > now:
+                    break
+                del self.items[oldest]
+            try:
+                return self.items[key][1]
+            except KeyError:
+                pass
+
+        result = evaluate()
+
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = (now + self.ttl, result)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+        return result
+
+
+
 class LimitSet():
 
     """
@@ -105,6 +175,9 @@ class LimitSet():
                         copy.deepcopy(limit['data']))
                 }
 
+                if 'cache' in limit:
+                    new_limit['cache'] = limit['cache']
+
                 limit = new_limit
 
 
@@ -123,6 +196,16 @@ class LimitSet():
             # This will chuck whatever exceptions the evaluator does
             limit['evaluator'] = evaluator(data)
 
+            # Results of limits that don't depend on when the run
+            # happens may be kept around for later requests.
+
+            if 'cache' in limit:
+                if limit['evaluator'].checks_schedule():
+                    raise ValueError("Limit '%s' checks the schedule and"
+                                     " cannot be cached" % (name))
+                limit['cache'] = LimitCache(
+                    pscheduler.iso8601_as_timedelta(limit['cache']))
+
             self.limits[name] = limit
 
 
@@ -130,6 +213,30 @@ class LimitSet():
         return name in self.limits
 
 
+    def checks_schedule(self, limit):
+        """Determine whether or not a limit depends on the run schedule"""
+        try:
+            return self.limits[limit]['evaluator'].checks_schedule()
+        except KeyError:
+            raise ValueError("Undefined limit '%s'" % limit)
+
+
+    def shares_results(self, limit):
+        """
+        Determine whether or not the result of evaluating a limit for
+        one run_schedule can be used for another run of the same task.
+        That holds only for limits that don't check the schedule and
+        aren't handed the whole task, since those could be looking at
+        the run_schedule anyway.
+        """
+        try:
+            limit = self.limits[limit]
+        except KeyError:
+            raise ValueError("Undefined limit '%s'" % limit)
+        return not limit['evaluator'].checks_schedule() \
+            and limit['type'] not in whole_task_limits
+
+
     def check(self,
               proposal,       # Task and hints
               limit,          # The limit to check against
@@ -163,7 +270,12 @@ class LimitSet():
         if not check_schedule and evaluator.checks_schedule():
             return { "passed": True }
 
-        evaluated = evaluator.evaluate(proposal)
+        cache = self.limits[limit].get("cache", None)
+        if cache is not None:
+            evaluated = cache.get(proposal,
+                                  lambda: evaluator.evaluate(proposal))
+        else:
+            evaluated = evaluator.evaluate(proposal)
 
         passed = evaluated["passed"]
         result = {
@@ -0,0 +1,77 @@
+"""
+Index of IPv4 and IPv6 prefixes
+"""
+
+import ipaddress
+import radix
+
+
+class PrefixIndex():
+
+    """
+    Holds a list of IPv4 and IPv6 CIDRs in a radix tree so that
+    finding whether an address overlaps any of them takes time
+    proportional to the length of the address instead of the length
+    of the list.
+    """
+
+    def __init__(self,
+                 cidrs=[]  # CIDRs or bare addresses to index
+                 ):
+        self.tree = radix.Radix()
+        self.length = 0
+        for cidr in cidrs:
+            self.add(cidr)
+
+
+    def __len__(self):
+        return self.length
+
+
+    def __network(self, cidr):
+        """
+        Parse a CIDR or address into (network, prefix length), raising
+        a ValueError if it isn't valid.  Host bits are masked off.  This
+        is done before anything goes near the tree, which would try to
+        resolve anything that doesn't look like an address.
+        """
+        try:
+            network = ipaddress.ip_network(unicode(cidr), strict=False)
+        except ValueError:
+            raise ValueError("Invalid IP or CIDR '%s'" % (cidr))
+        return str(network.network_address), network.prefixlen
+
+
+    def add(self, cidr):
+        """
+        Add a CIDR or address to the index.
+        """
+        network, masklen = self.__network(cidr)
+        self.tree.add(network=network, masklen=masklen)
+        self.length += 1
+
+
+    def overlaps(self, cidr):
+        """
+        Determine whether a CIDR or address overlaps anything in the
+        index, either by being inside it or by containing it.
+        """
+        network, masklen = self.__network(cidr)
+        if self.tree.search_best(network=network, masklen=masklen) is not None:
+            return True
+        return len(self.tree.search_covered(network, masklen)) > 0
+
+
+
+# A short test program
+
+if __name__ == "__main__":
+
+    index = PrefixIndex([ "10.0.0.0/8",
+                          "172.16.0.0/12",
+                          "192.168.0.0/16",
+                          "fd00::/8"
+                      ])
+
+    for ip in [ "10.9.8.6", "198.6.1.1", "fd00:dead:beef::1", "0.0.0.0/0" ]:
+        print ip, index.overlaps(ip)
@@ -0,0 +1,349 @@
+"""
+Invocation of plugin (test, tool, archiver and context) methods,
+running those written in Python inside the calling process.
+"""
+
+import __builtin__
+import ast
+import ctypes
+import imp
+import os
+import sys
+import threading
+import traceback
+
+from .program import run_program
+
+
+this = sys.modules[__name__]
+
+# Where the plugin classes live.  None disables in-process execution.
+this.classes_dir = None
+
+# Methods that are short-lived and free of side effects, which makes
+# them candidates for running inside a long-lived process.  Only
+# those that declare an entry function are actually run that way.
+this.in_process_methods = set([
+    "cli-to-spec",
+    "data-is-valid",
+    "enumerate",
+    "limit-is-valid",
+    "limit-passes",
+    "participants",
+    "result-format",
+    "spec-format",
+    "spec-is-valid",
+    "spec-to-cli"
+])
+
+# Name of the function a plugin method defines at the top level to
+# declare that it can be run in-process.  It is called with the list
+# of arguments and a string containing standard input and must return
+# a tuple of (status, stdout, stderr) without touching the process'
+# standard I/O, signals or environment.  Declaring it is a promise
+# that the method is safe to run in any thread.  Output and error
+# text get the trailing newline succeed_json() and fail() would have
+# added.
+ENTRY_FUNCTION = "method_main"
+
+# Held only while loading methods.  Calls to entry functions run
+# without it.
+this.lock = threading.Lock()
+
+this.entries = {}   # Path -> (mtime, entry function or None)
+
+# Modules plugins bring with them (e.g., their own validate.py), kept
+# apart from sys.modules so those of different plugins with the same
+# name don't collide.
+this.plugin_modules = {}   # Plugin directory -> _PluginModules
+
+# Name of the global that marks code as belonging to a plugin and
+# holds the plugin's modules.
+PLUGIN_MODULES_GLOBAL = "__pscheduler_plugin_modules__"
+
+
+class PluginTimeout(BaseException):
+    """
+    Raised inside an in-process method that ran past its timeout.
+    """
+    pass
+
+
+class _PluginModules(object):
+    """
+    INTERNAL USE ONLY: Modules found in a plugin's directory.
+    """
+
+    def __init__(self, plugin_dir):
+        self.plugin_dir = plugin_dir
+        self.modules = {}   # Name -> module or None if there isn't one
+        self.lock = threading.RLock()
+
+    def find(self, name):
+        """
+        Return the plugin's module 'name', loading it if necessary, or
+        None if the plugin doesn't have one.
+        """
+        with self.lock:
+
+            try:
+                return self.modules[name]
+            except KeyError:
+                pass
+
+            path = os.path.join(self.plugin_dir, name + ".py")
+            if not os.path.isfile(path):
+                self.modules[name] = None
+                return None
+
+            with open(path, 'r') as source_file:
+                code = compile(source_file.read(), path, 'exec')
+
+            module = imp.new_module(name)
+            module.__file__ = path
+            setattr(module, PLUGIN_MODULES_GLOBAL, self)
+
+            # Registered first so modules that import each other work
+            # the same way they would from sys.modules.
+            self.modules[name] = module
+            try:
+                exec code in module.__dict__
+            except BaseException:
+                del self.modules[name]
+                raise
+
+            return module
+
+
+def __plugin_modules(plugin_dir):
+    """
+    INTERNAL USE ONLY: Get the module set for a plugin directory.
+    Must be called with the lock held.
+    """
+    try:
+        return this.plugin_modules[plugin_dir]
+    except KeyError:
+        modules = _PluginModules(plugin_dir)
+        this.plugin_modules[plugin_dir] = modules
+        return modules
+
+
+# The import function in place before the plugin host took over.
+this.base_import = None
+
+
+def __plugin_import(name, globals=None, locals=None, fromlist=None,
+                    level=-1):
+    """
+    INTERNAL USE ONLY: Import function that resolves imports made by
+    plugin code to modules in the plugin's directory before anything
+    else, the same way having the directory at the front of sys.path
+    would when the method is run as a program.  This works for imports
+    done while loading and while running, in any thread.
+    """
+    modules = globals.get(PLUGIN_MODULES_GLOBAL) \
+              if globals is not None and level <= 0 else None
+
+    if modules is not None and '.' not in name:
+        module = modules.find(name)
+        if module is not None:
+            return module
+
+    return this.base_import(name, globals, locals, fromlist, level)
+
+
+def plugin_host_init(classes_dir):
+    """
+    Enable in-process execution of plugins found under 'classes_dir',
+    which should be the directory containing the 'test', 'tool',
+    'archiver' and 'context' directories.  None disables it.
+    """
+    with this.lock:
+        this.classes_dir = classes_dir
+        this.entries = {}
+        this.plugin_modules = {}
+        if classes_dir is not None and this.base_import is None:
+            this.base_import = __builtin__.__import__
+            __builtin__.__import__ = __plugin_import
+
+
+def __declares_entry(source, path):
+    """
+    INTERNAL USE ONLY: Determine whether the source of a Python
+    program defines the entry function at the top level.
+    """
+    tree = ast.parse(source, path)
+    return any([ isinstance(node, ast.FunctionDef)
+                 and node.name == ENTRY_FUNCTION
+                 for node in tree.body ])
+
+
+def __load(path):
+    """
+    INTERNAL USE ONLY: Return the entry function for the plugin method
+    at 'path' or None if it doesn't have one.  The method is loaded as
+    a module, which does not run anything guarded by a check for
+    __main__.  Results are cached until the file changes.  Must be
+    called with the lock held.
+    """
+
+    mtime = os.stat(path).st_mtime
+
+    try:
+        cached_mtime, entry = this.entries[path]
+        if cached_mtime == mtime:
+            return entry
+    except KeyError:
+        pass
+
+    with open(path, 'r') as source_file:
+        source = source_file.read()
+
+    first_line = source.split('\n', 1)[0]
+    if not (first_line.startswith('#!') and 'python' in first_line) \
+       or not __declares_entry(source, path):
+        this.entries[path] = (mtime, None)
+        return None
+
+    code = compile(source, path, 'exec')
+
+    plugin_dir = os.path.dirname(path)
+
+    # A method that changed gets fresh copies of the plugin's modules.
+    if path in this.entries:
+        this.plugin_modules.pop(plugin_dir, None)
+
+    namespace = {
+        "__name__": "pscheduler_plugin",
+        "__file__": path,
+        "__builtins__": __builtins__,
+        PLUGIN_MODULES_GLOBAL: __plugin_modules(plugin_dir)
+    }
+
+    exec code in namespace
+
+    entry = namespace[ENTRY_FUNCTION]
+    this.entries[path] = (mtime, entry)
+    return entry
+
+
+def __interrupt(thread):
+    """
+    INTERNAL USE ONLY: Raise PluginTimeout in a thread.  This takes
+    effect the next time the thread runs Python code, so one blocked
+    in a system call finishes that first.
+    """
+    ident = ctypes.c_long(thread.ident)
+    if ctypes.pythonapi.PyThreadState_SetAsyncExc(
+            ident, ctypes.py_object(PluginTimeout)) > 1:
+        # Hit more than one thread, which should never happen.  Undo.
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ident, None)
+
+
+def __entry_result(status, stdout, stderr):
+    """
+    INTERNAL USE ONLY: Make the output of an entry function look like
+    what the same method would produce as a program.
+    """
+    if stdout and not stdout.endswith('\n'):
+        stdout += '\n'
+    if stderr:
+        stderr = stderr.strip() + '\n'
+    return status, stdout, stderr
+
+
+def __run_entry(entry, args, stdin, timeout):
+    """
+    INTERNAL USE ONLY: Call a plugin's entry function in its own
+    thread so the timeout can be enforced, returning what
+    run_program() would.
+    """
+
+    result = []
+
+    def runner():
+        try:
+            status, stdout, stderr = entry(list(args),
+                                           stdin if stdin is not None else '')
+            result.append(__entry_result(status, stdout, stderr))
+        except PluginTimeout:
+            pass
+        except SystemExit as ex:
+            result.append((ex.code if isinstance(ex.code, int) else 1,
+                           '', '' if ex.code is None else str(ex.code)))
+        except Exception:
+            result.append((1, '', traceback.format_exc()))
+
+    thread = threading.Thread(target=runner, name="plugin-method")
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+
+    if not result:
+        if thread.is_alive():
+            __interrupt(thread)
+        return 2, '', "Method took too long to run."
+    return result[0]
+
+
+def plugin_invoke(plugin_class, name, method, args=[], stdin=None,
+                  timeout=None):
+    """
+    Invoke a method on a plugin and return the results the same way
+    run_program() does.
+
+    Arguments:
+
+    plugin_class - The class of plugin (test, tool, archiver, context)
+    name - The name of the plugin
+    method - The method to invoke
+    args - List of additional arguments to the method
+    stdin - String containing what should be sent to standard input
+    timeout - Seconds to allow the method to run
+
+    Methods in the in-process list that are written in Python and
+    define the entry function are run in this process once
+    plugin_host_init() has been called.  Everything else goes through
+    'pscheduler internal invoke'.
+    """
+
+    if this.classes_dir is not None and method in this.in_process_methods:
+
+        path = os.path.join(this.classes_dir, plugin_class, name, method)
+
+        with this.lock:
+            try:
+                entry = __load(path)
+            except (IOError, OSError):
+                entry = None
+            except Exception as ex:
+                return 1, '', "Unable to load %s: %s" % (path, str(ex))
+
+        if entry is not None:
+            return __run_entry(entry, args, stdin, timeout)
+
+    return run_program(
+        ["pscheduler", "internal", "invoke", plugin_class, name, method] + args,
+        stdin=stdin,
+        timeout=timeout)
+
+
+def plugin_method_run(entry):
+    """
+    Run a plugin method's entry function as a program, passing it the
+    command-line arguments and standard input, writing what it returns
+    to standard output and error and exiting with its status.  Methods
+    that define an entry function call this when run as __main__.
+    """
+    status, stdout, stderr = __entry_result(
+        *entry(sys.argv[1:], sys.stdin.read()))
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(status)
+
+
+
+if __name__ == "__main__":
+
+    print plugin_invoke("test", "rtt", "participants",
+                        stdin='{ "dest": "www.perfsonar.net" }')
@@ -2,18 +2,16 @@
 Functions for resolving hostnames and IPs
 """
 
+import collections
+import dns.exception
 import dns.reversename
 import dns.resolver 
-import multiprocessing
-import multiprocessing.dummy
 import os
 import Queue
 import socket
+import sys
 import threading
-
-# See Python 2.6 workaround below.
-
-import weakref
+import time
 
 
 __DEFAULT_TIMEOUT__ = 2
@@ -27,45 +25,324 @@ def __check_ip_version__(ip_version):
         raise ValueError("Invalid IP version; must be 4 or 6")
 
 
+
+#
+# Cache
+#
+
+class DNSCache(object):
+
+    """
+    Thread-safe cache of lookup results that expire after their own
+    time to live, evicting the least-recently-used ones when full.
+    """
+
+    def __init__(self, size=10000):
+        self.size = size
+        self.items = collections.OrderedDict()  # Key -> (expires, value)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key):
+        """
+        Return a tuple of (found, value) for a key.
+        """
+        with self.lock:
+            try:
+                expires, value = self.items.pop(key)
+            except KeyError:
+                return (False, None)
+            if expires < time.time():
+                return (False, None)
+            # Re-inserting makes this the most recently used.
+            self.items[key] = (expires, value)
+            return (True, value)
+
+    def put(self, key, value, ttl):
+        """
+        Cache a value for 'ttl' seconds.
+        """
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = (time.time() + ttl, value)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+
+#
+# Resolver
+#
+# Lookups are done by a fixed pool of worker threads so a slow
+# resolver can't cause threads to pile up.  Identical lookups that
+# are in progress at the same time are done once, and results are
+# cached.  Only answers and names that definitely don't exist are
+# cached; transient failures are not.
+#
+
+this = sys.modules[__name__]
+
+this.worker_count = 20
+this.positive_ttl = 60     # For results that don't carry a TTL
+this.negative_ttl = 30     # For names that don't exist
+this.max_ttl = 3600        # Cap on TTLs from DNS answers
+
+this.cache = DNSCache()
+this.lock = threading.Lock()
+this.pending = {}          # Key -> _DNSLookup
+this.jobs = Queue.Queue()
+this.workers = []
+this.worker_data = threading.local()
+this.counters = {
+    "hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "timeouts": 0
+}
+
+
+class _DNSLookup(object):
+    """
+    INTERNAL USE ONLY: A lookup in progress, shared by everyone who
+    asked for it.  The function is called with the number of seconds
+    the lookup may take and returns a tuple of (value, ttl), where a
+    value that is an exception will be raised to callers and a ttl of
+    None marks a transient failure that isn't cached.  If the
+    function fails in any other way, the lookup is treated as if it
+    timed out.
+    """
+
+    def __init__(self, key, function, timeout):
+        self.key = key
+        self.function = function
+        self.timeout = timeout  # Longest wait of those who asked
+        self.allowed = None     # What the function was given
+        self.value = None
+        self.transient = False
+        self.failed = False
+        self.done = threading.Event()
+
+
+def __dns_worker():
+    """
+    INTERNAL USE ONLY: Do lookups from the job queue forever.
+    """
+    while True:
+        lookup = this.jobs.get()
+        try:
+            lookup.allowed = lookup.timeout
+            value, ttl = lookup.function(lookup.allowed)
+            if ttl is not None:
+                this.cache.put(lookup.key, value, ttl)
+            else:
+                lookup.transient = True
+            lookup.value = value
+        except BaseException:
+            lookup.failed = True
+        finally:
+            with this.lock:
+                del this.pending[lookup.key]
+            lookup.done.set()
+
+
+def __dns_lookup_start(key, function, timeout):
+    """
+    INTERNAL USE ONLY: Start a lookup that will be waited on for
+    'timeout' seconds, returning a tuple of (cached, value or
+    _DNSLookup).
+    """
+
+    found, value = this.cache.get(key)
+
+    with this.lock:
+
+        if found:
+            this.counters["hits"] += 1
+            return (True, value)
+
+        this.counters["misses"] += 1
+
+        try:
+            lookup = this.pending[key]
+            this.counters["coalesced"] += 1
+            # This only helps if the lookup hasn't been picked up by
+            # a worker yet.  __dns_lookup_finish() covers the rest.
+            lookup.timeout = max(lookup.timeout, timeout)
+            return (False, lookup)
+        except KeyError:
+            pass
+
+        lookup = _DNSLookup(key, function, timeout)
+        this.pending[key] = lookup
+
+        while len(this.workers) < this.worker_count:
+            worker = threading.Thread(target=__dns_worker)
+            worker.setDaemon(True)
+            worker.start()
+            this.workers.append(worker)
+
+    this.jobs.put(lookup)
+    return (False, lookup)
+
+
+def __dns_lookup_finish(started, timeout):
+    """
+    INTERNAL USE ONLY: Wait through 'timeout' seconds for a lookup
+    started with __dns_lookup_start and return a tuple of (finished,
+    value).  Cached exceptions are raised.  Lookups that failed
+    unexpectedly come back the same way as those that timed out.
+
+    A lookup shared with someone who was willing to wait less time
+    may fail transiently before this caller's time is up, in which
+    case it is tried again for whatever time remains.
+    """
+    deadline = time.time() + timeout
+    cached, value = started
+    retried = False
+    while not cached:
+        lookup = value
+        if not lookup.done.wait(max(deadline - time.time(), 0)) \
+           or lookup.failed:
+            with this.lock:
+                this.counters["timeouts"] += 1
+            return (False, None)
+        remaining = deadline - time.time()
+        if lookup.transient and not retried and lookup.allowed < timeout \
+           and remaining > 0:
+            cached, value = __dns_lookup_start(lookup.key, lookup.function,
+                                               remaining)
+            retried = True
+            continue
+        value = lookup.value
+        break
+    if isinstance(value, Exception):
+        raise value
+    return (True, value)
+
+
+def __dns_lookup(key, function, timeout):
+    """
+    INTERNAL USE ONLY: Look something up and wait for the result.
+    """
+    return __dns_lookup_finish(__dns_lookup_start(key, function, timeout),
+                               timeout)
+
+
+def dns_stats():
+    """
+    Return a dictionary of statistics about lookups.
+    """
+    with this.lock:
+        result = dict(this.counters)
+        result["cached"] = len(this.cache)
+        result["pending"] = len(this.pending)
+        result["workers"] = len(this.workers)
+    return result
+
+
+def dns_cache_clear():
+    """
+    Throw away all cached lookup results.
+    """
+    this.cache.clear()
+
+
+
 #
 # Single Resolution
 #
 
-def __dns_resolve_host(host, ip_version, timeout):
+# Lookup failures that mean the name or address has no records, as
+# opposed to trouble getting an answer.  Only these are cached.
+
+__NOT_FOUND_GAIERRORS__ = [
+    getattr(socket, name)
+    for name in [ "EAI_NONAME", "EAI_NODATA", "EAI_ADDRFAMILY" ]
+    if hasattr(socket, name)
+]
+
+__NOT_FOUND_HERRORS__ = [
+    1,  # HOST_NOT_FOUND
+    4   # NO_DATA
+]
+
+def __dns_host_proc(host, ip_version):
     """
-    Resolve a host using the system's facilities
+    INTERNAL USE ONLY: Make a function that resolves a host using the
+    system's facilities.
     """
     family = socket.AF_INET if ip_version == 4 else socket.AF_INET6
 
-    def proc(host, family, queue):
+    def proc(timeout):
+        # The system resolver can't be told how long to take.
         try:
-            queue.put(socket.getaddrinfo(host, 0, family))
+            results = socket.getaddrinfo(host, 0, family)
         except socket.gaierror as ex:
-            # TODO: Would be nice if we could isolate just the not
-            # found error.
-            queue.put([])
-        except socket.timeout:
-            # Don't care, we just want the queue to be empty if
-            # there's an error.
-            pass
-
-    queue = Queue.Queue()
-    thread = threading.Thread(target=proc, args=(host, family, queue))
-    thread.setDaemon(True)
-    thread.start()
-    try:
-        results = queue.get(True, timeout)
+            if ex.errno in __NOT_FOUND_GAIERRORS__:
+                return (None, this.negative_ttl)
+            return (None, None)
         if len(results) == 0:
-            return None
-        family, socktype, proto, canonname, sockaddr = results[0]
-    except Queue.Empty:
-        return None
+            return (None, this.negative_ttl)
+        family_, socktype, proto, canonname, sockaddr = results[0]
+        return (str(sockaddr[0]), this.positive_ttl)
+
+    return proc
+
 
-    # NOTE: Don't make any attempt to kill the thread, as it will get
-    # Python all confused if it holds the GIL.
+def __dns_resolve_host(host, ip_version, timeout):
+    """
+    Resolve a host using the system's facilities
+    """
+    finished, ip = __dns_lookup(("host", host, ip_version),
+                                __dns_host_proc(host, ip_version),
+                                timeout)
+    return ip
+
+
+
+def dns_query(name, record, timeout=__DEFAULT_TIMEOUT__):
+    """
+    Query DNS for records of type 'record' (e.g., 'A', 'PTR') for
+    'name' and return a list of their text forms.  Raises the same
+    dnspython exceptions a Resolver would, including
+    dns.exception.Timeout.  Answers are cached for their TTL and
+    nonexistent names for a shorter period.
+    """
+
+    name = str(name)
+    record = str(record)
+
+    def proc(timeout):
+        try:
+            resolver = this.worker_data.resolver
+        except AttributeError:
+            resolver = dns.resolver.Resolver()
+            this.worker_data.resolver = resolver
+        resolver.timeout = timeout
+        resolver.lifetime = timeout
+        try:
+            answers = resolver.query(name, record)
+        except (dns.name.EmptyLabel,
+                dns.resolver.NXDOMAIN,
+                dns.resolver.NoAnswer) as ex:
+            return (ex, this.negative_ttl)
+        except (dns.exception.Timeout,
+                dns.resolver.NoNameservers) as ex:
+            return (ex, None)
+        ttl = min(answers.rrset.ttl, this.max_ttl) \
+              if answers.rrset is not None else this.positive_ttl
+        return ([ str(answer) for answer in answers ], ttl)
 
-    (ip) = sockaddr
-    return str(ip[0])
+    finished, answers = __dns_lookup(("query", name, record), proc, timeout)
+    if not finished:
+        raise dns.exception.Timeout()
+    return answers
 
 
 
@@ -91,12 +368,7 @@ def dns_resolve(host,
         # Any other explicit query value is forced to use DNS.
 
         try:
-            resolver = dns.resolver.Resolver()
-            resolver.timeout = timeout
-            resolver.lifetime = timeout
-            if query is None:
-                query = 'A' if ip_version == 4 else 'AAAA'
-            answers = resolver.query(host, query)
+            answers = dns_query(host, query, timeout=timeout)
         except (dns.exception.Timeout,
                 dns.name.EmptyLabel,
                 dns.resolver.NXDOMAIN,
@@ -104,11 +376,28 @@ def dns_resolve(host,
                 dns.resolver.NoNameservers):
             return None
 
-        return str(answers[0])
+        return answers[0]
 
 
 
 
+def __dns_reverse_proc(ip_addr):
+    """
+    INTERNAL USE ONLY: Make a function that reverse-resolves an IP
+    using the system's facilities.
+    """
+    def proc(timeout):
+        try:
+            return (socket.gethostbyaddr(ip_addr)[0], this.positive_ttl)
+        except socket.herror as ex:
+            if ex.errno in __NOT_FOUND_HERRORS__:
+                return (None, this.negative_ttl)
+            return (None, None)
+        except socket.gaierror as ex:
+            if ex.errno in __NOT_FOUND_GAIERRORS__:
+                return (None, this.negative_ttl)
+            return (None, None)
+    return proc
 
 
 def dns_resolve_reverse(ip,
@@ -118,35 +407,11 @@ def dns_resolve_reverse(ip,
     found or there was a timeout.
     """
 
-    """
-    Reverse-resolve a host using the system's facilities
-    """
-
-    # TODO: It would be nice of the queue/timeout code wasn't duplicated
     # TODO: Validate 'ip' as an IP and raise a ValueError
 
-    def proc(ip_addr, queue):
-        """Process the query"""
-        try:
-            queue.put(socket.gethostbyaddr(ip_addr)[0])
-        except socket.herror:
-            queue.put(None)
-        except socket.gaierror as ex:
-            if ex.errno != -2:
-                raise ex
-            queue.put(None)
-
-    queue = Queue.Queue()
-    thread = threading.Thread(target=proc, args=(ip, queue))
-    thread.setDaemon(True)
-    thread.start()
-    try:
-        return queue.get(True, timeout)
-    except Queue.Empty:
-        return None
-
-    # NOTE: Don't make any attempt to kill the thread, as it will get
-    # Python all confused if it holds the GIL.
+    finished, name = __dns_lookup(("reverse", ip), __dns_reverse_proc(ip),
+                                  timeout)
+    return name
 
 
 
@@ -156,33 +421,18 @@ def dns_resolve_reverse(ip,
 #
 
 
-def __forwarder__(arg):
-    """
-    Query DNS for (name) and return (name, ip))
-    """
-    host, ip_version = arg
-    return (host, dns_resolve(host, ip_version=ip_version))
-
-
-def __reverser__(arg):
-    """
-    Query reverse DNS for (ip) and return (ip, hostname)
-    """
-    host, ip_version = arg
-    return (host, dns_resolve_reverse(host))
-
-
-def dns_bulk_resolve(candidates, reverse=False, ip_version=None, threads=50):
+def dns_bulk_resolve(candidates, reverse=False, ip_version=None, threads=50,
+                     timeout=__DEFAULT_TIMEOUT__):
     """
     Resolve a list of host names to IPs or, if reverse is true, IPs to
     host names.  Return a map of each result keyed to its candidate.
 
-    WARNING: This function will create a pool of up to 'threads'
-    threads.
+    All of the lookups are started at once and share the resolver's
+    workers.  The 'timeout' is per lookup but is applied to the set
+    as a whole, stretched to allow for the lookups having to take
+    turns with the workers.  The 'threads' argument is no longer used.
     """
 
-    # This is based loosely on http://stackoverflow.com/a/34377198
-
     if reverse and ip_version is not None:
         raise ValueError("Unable to force IP version when reverse-resolving")
 
@@ -195,22 +445,28 @@ def dns_bulk_resolve(candidates, reverse=False, ip_version=None, threads=50):
     if len(candidates) == 0:
         return result
 
-    # Work around a bug in 2.6
-    # TODO: Get rid of this when 2.6 is no longer in the picture.
-    if not hasattr(threading.current_thread(), "_children"):
-        threading.current_thread()._children = weakref.WeakKeyDictionary()
-
-    pool = multiprocessing.dummy.Pool(
-        processes=min(len(candidates), threads) )
-
-    candidate_args = [ (candidate, ip_version) for candidate in candidates ]
+    started = {}
+    for candidate in candidates:
+        if reverse:
+            started[candidate] = __dns_lookup_start(
+                ("reverse", candidate), __dns_reverse_proc(candidate),
+                timeout)
+        else:
+            started[candidate] = __dns_lookup_start(
+                ("host", candidate, ip_version),
+                __dns_host_proc(candidate, ip_version), timeout)
+
+    rounds = (len(candidates) + this.worker_count - 1) / this.worker_count
+    deadline = time.time() + (timeout * rounds)
+
+    for candidate in candidates:
+        try:
+            finished, value = __dns_lookup_finish(
+                started[candidate], max(deadline - time.time(), 0))
+        except Exception:
+            value = None
+        result[candidate] = value
 
-    for ip, name in pool.imap(
-        __reverser__ if reverse else __forwarder__,
-        candidate_args,
-        chunksize=1):
-        result[ip] = name
-    pool.close()
     return result
 
 
@@ -3,7 +3,8 @@ Functions for inhaling JSON in a pScheduler-normalized way
 """
 
 from json import load, loads, dump, dumps
-import string
+import errno
+import os
 import sys
 import pscheduler
 
@@ -113,7 +114,7 @@ def json_load(source=None, exit_on_error=False, strip=True, max_schema=None):
     try:
         if type(source) is str or type(source) is unicode:
             json_in = loads(str(source))
-        elif type(source) is file:
+        elif type(source) is file or hasattr(source, "read"):
             json_in = load(source)
         else:
             raise Exception("Internal error: bad source type ", type(source))
@@ -167,6 +168,23 @@ def json_dump(obj, dest=None, pretty=False):
 # Classes for reading and writing streaming JSON per RFC 7464
 #
 
+# Decoder used for streamed records.  ujson is considerably faster
+# than the standard library for large documents and is used if it's
+# installed.  It has to be asked to parse floats exactly as the
+# standard library does so results don't depend on which is there;
+# versions that can't do that aren't used.
+try:
+    import ujson
+    ujson.loads("0.1", precise_float=True)
+    stream_loads = lambda text: ujson.loads(text, precise_float=True)
+except (ImportError, TypeError):
+    stream_loads = loads
+
+
+# Size of reads done by RFC7464Parser
+RFC7464_BLOCK_SIZE = 65536
+
+
 class RFC7464Emitter(object):
     """Emit JSON documents to a file handle in RFC 7464 format"""
 
@@ -176,21 +194,38 @@ class RFC7464Emitter(object):
             raise TypeError("Handle must be a file.")
 
         self.handle = handle
+        self.fd = handle.fileno()
         self.timeout = timeout
 
 
     def emit_text(self, text):
         """Emit straight text to the file"""
 
-        if self.timeout is not None:
-            if polled_select([],[self.handle],[], self.timeout) == ([],[],[]):
-                raise IOError("Timed out waiting for write")
+        # Serialized JSON never contains newlines, so this rarely
+        # needs to make a copy.
+        if "\n" in text:
+            text = text.replace("\n", "")
+        if isinstance(text, unicode):
+            text = text.encode("utf-8")
 
-        self.handle.write(
-            "\x1e%s\n" % (text.translate(string.maketrans('', ''), "\n"))
-        )
+        # Anything written through the file object has to go first.
         self.handle.flush()
 
+        for piece in ["\x1e", text, "\n"]:
+            view = memoryview(piece)
+            while len(view):
+                if self.timeout is not None:
+                    if polled_select([], [self.fd], [], self.timeout) \
+                       == ([], [], []):
+                        raise IOError("Timed out waiting for write")
+                try:
+                    written = os.write(self.fd, view)
+                except OSError as ex:
+                    if ex.errno == errno.EINTR:
+                        continue
+                    raise IOError(ex.errno, ex.strerror)
+                view = view[written:]
+
 
     def __call__(self, json):
         """Emit serialized JSON to the file"""
@@ -200,30 +235,136 @@ class RFC7464Emitter(object):
 
 
 class RFC7464Parser(object):
-    """Iterable parser for reading streaming JSON from a file handle"""
+    """Iterable parser for reading streaming JSON from a file handle.
 
-    def __init__(self, handle, timeout=None):
+    Input is read directly from the file descriptor in large blocks
+    and split into records without copying anything more than once.
+    Memory use is bounded by the size of the largest record plus one
+    block.  Records are only decoded when they're asked for.
+    """
+
+    def __init__(self, handle, timeout=None, max_record=None,
+                 block_size=None):
+        """
+        Arguments:
+
+        handle - File to read from
+        timeout - Seconds to wait for data before raising an IOError
+        max_record - Maximum size of a record in bytes or None
+        block_size - Bytes to read at a time
+        """
         if type(handle) != file:
             raise TypeError("Handle must be a file.")
         self.handle = handle
+        self.fd = handle.fileno()
         self.timeout = timeout
+        self.max_record = max_record
+        self.block_size = block_size or RFC7464_BLOCK_SIZE
 
-    # PYTHON3: def __next__(self)
-    def next(self):
-        """Read and parse one item from the file"""
+        self.buffer = ""    # Last block read
+        self.offset = 0     # Where the unconsumed part of it starts
+        self.pieces = []    # Parts of a record spanning blocks
+        self.pieces_size = 0
+        self.skipping = False  # Discarding the rest of an oversized record
+        self.eof = False
+
+
+    def __read(self):
+        """Read another block, returning False at end of file."""
         if self.timeout is not None:
-            if polled_select([self.handle],[],[], self.timeout) == ([],[],[]):
+            if polled_select([self.fd],[],[], self.timeout) == ([],[],[]):
                 raise IOError("Timed out waiting for read")
-        data = self.handle.readline()
-
-        if len(data) == 0:
-            raise StopIteration
+        while True:
+            try:
+                self.buffer = os.read(self.fd, self.block_size)
+                break
+            except OSError as ex:
+                if ex.errno != errno.EINTR:
+                    raise IOError(ex.errno, ex.strerror)
+        self.offset = 0
+        return len(self.buffer) > 0
+
+
+    def __bad_separator(self, line):
+        raise ValueError("Line '%s' did not start with record separator" % (line))
+
+
+    def __check_size(self, more, complete):
+        """
+        Make sure the pending record plus 'more' bytes isn't too big,
+        discarding it if it is.  If the record isn't 'complete', the
+        rest of it will be skipped.
+        """
+        if self.max_record is not None \
+           and self.pieces_size + more > self.max_record:
+            self.pieces = []
+            self.pieces_size = 0
+            self.skipping = not complete
+            raise ValueError("Record exceeds %d bytes" % (self.max_record))
+
+
+    def __assemble(self, last):
+        """
+        Join the pieces of a record that spanned blocks plus the final
+        piece, 'last', into the record's text without the separator.
+        """
+        first = self.pieces[0]
+        if first[0] != b'\x1e':
+            self.__bad_separator("".join(self.pieces) + last)
+        self.pieces[0] = first[1:]
+        self.pieces.append(last)
+        record = "".join(self.pieces)
+        self.pieces = []
+        self.pieces_size = 0
+        return record
+
+
+    def next_text(self):
+        """Read the next record and return its text undecoded."""
+
+        while True:
+
+            if self.offset < len(self.buffer):
+
+                end = self.buffer.find("\n", self.offset)
+
+                if end >= 0:
+                    start = self.offset
+                    self.offset = end + 1
+                    if self.skipping:
+                        self.skipping = False
+                        continue
+                    self.__check_size(end - start, True)
+                    if self.pieces:
+                        return self.__assemble(self.buffer[start:end])
+                    if self.buffer[start] != b'\x1e':
+                        self.__bad_separator(self.buffer[start:end+1])
+                    return self.buffer[start+1:end]
+
+                if not self.skipping:
+                    piece = self.buffer[self.offset:] if self.offset else self.buffer
+                    self.pieces.append(piece)
+                    self.pieces_size += len(piece)
+                    self.__check_size(0, False)
+                self.buffer = ""
+                self.offset = 0
+
+            if self.eof or not self.__read():
+                self.eof = True
+                # A final record with no newline still counts.
+                if self.pieces:
+                    return self.__assemble("")
+                raise StopIteration
 
-        if data[0] != b'\x1e':
-            raise ValueError("Line '%s' did not start with record separator" % (data))
 
-        # json_load() will raise a ValueError if something's not right.
-        return pscheduler.json_load(data[1:])
+    # PYTHON3: def __next__(self)
+    def next(self):
+        """Read and parse one item from the file"""
+        text = self.next_text()
+        try:
+            return json_decomment(stream_loads(text))
+        except ValueError as ex:
+            raise ValueError("Invalid JSON: " + str(ex))
 
 
     def __iter__(self):
@@ -233,4 +374,3 @@ class RFC7464Parser(object):
     def __call__(self):
         """Single-shot read of next item"""
         return self.next()
-
@@ -7,7 +7,11 @@ from psjson import *
 import httplib
 import pycurl
 import StringIO
+import sys
+import threading
+import time
 import urllib
+import urlparse
 
 
 # TODO: Decide what to do about this.  It's necessary for the time
@@ -25,12 +29,154 @@ class URLException(Exception):
 
 
 
+class CurlHandlePool(object):
+
+    """
+    Thread-safe pool of cURL handles kept per (scheme, host, port,
+    bind).  Each handle keeps its connection and TLS session caches
+    between uses, so repeated requests to the same place can reuse
+    an open connection instead of making a new one.
+    """
+
+    def __init__(self, max_per_host=8, idle_time=60):
+        """
+        max_per_host - Most idle handles kept for any one destination.
+        Handles beyond that are closed when returned.
+
+        idle_time - Seconds a handle may sit unused before it is closed.
+        """
+        self.max_per_host = max_per_host
+        self.idle_time = idle_time
+        self.lock = threading.Lock()
+        self.idle = {}   # Key -> list of (handle, last_used)
+        self.next_purge = time.time() + idle_time
+        self.counters = {
+            "created": 0,
+            "reused": 0,
+            "closed": 0
+        }
+
+
+    def __close(self, handle):
+        try:
+            handle.close()
+        except pycurl.error:
+            pass
+        self.counters["closed"] += 1
+
+
+    def __purge(self, now):
+        """
+        INTERNAL USE ONLY: Close handles that have been idle too long.
+        Must be called with the lock held.
+        """
+        if now < self.next_purge:
+            return
+        horizon = now - self.idle_time
+        for key in self.idle.keys():
+            keep = []
+            for handle, last_used in self.idle[key]:
+                if last_used < horizon:
+                    self.__close(handle)
+                else:
+                    keep.append((handle, last_used))
+            if keep:
+                self.idle[key] = keep
+            else:
+                del self.idle[key]
+        self.next_purge = now + self.idle_time
+
+
+    def get(self, key):
+        """
+        Check out a handle for a destination, making a new one if none
+        are idle.  The handle's options will have been reset.
+        """
+        now = time.time()
+        with self.lock:
+            self.__purge(now)
+            handles = self.idle.get(key)
+            while handles:
+                handle, last_used = handles.pop()
+                if last_used >= now - self.idle_time:
+                    self.counters["reused"] += 1
+                    handle.reset()
+                    return handle
+                self.__close(handle)
+            self.counters["created"] += 1
+        return pycurl.Curl()
+
+
+    def put(self, key, handle, discard=False):
+        """
+        Return a handle to the pool, closing it if 'discard' is true or
+        there are already enough idle handles for the destination.
+        """
+        now = time.time()
+        with self.lock:
+            handles = self.idle.setdefault(key, [])
+            if discard or len(handles) >= self.max_per_host:
+                self.__close(handle)
+            else:
+                handles.append((handle, now))
+            if not handles:
+                del self.idle[key]
+
+
+    def clear(self):
+        """Close all idle handles."""
+        with self.lock:
+            for key in self.idle:
+                for handle, last_used in self.idle[key]:
+                    self.__close(handle)
+            self.idle = {}
+
+
+    def stats(self):
+        """Return a dictionary of statistics about the pool."""
+        with self.lock:
+            result = dict(self.counters)
+            result["idle"] = sum([ len(handles)
+                                   for handles in self.idle.values() ])
+            result["destinations"] = len(self.idle)
+        return result
+
+
+
+this = sys.modules[__name__]
+this.handle_pool = CurlHandlePool()
+
+
+def url_handle_pool():
+    """
+    Return the pool of cURL handles shared by all of the url_*
+    functions.
+    """
+    return this.handle_pool
+
+
+
+def _url_pool_key(url, bind):
+    """
+    INTERNAL USE ONLY: Figure out the pool key for a URL and bind
+    address.
+    """
+    try:
+        parsed = urlparse.urlparse(url)
+        return (parsed.scheme, parsed.hostname, parsed.port, bind)
+    except ValueError:
+        # Bad URLs get a private handle that cURL will complain about.
+        return (None, url, None, bind)
+
+
+
 class PycURLRunner(object):
 
     def __init__(self, url, params, bind, timeout, allow_redirects, headers, verify_keys):
         """Constructor"""
 
-        self.curl = pycurl.Curl()
+        self.pool_key = _url_pool_key(url, bind)
+        self.curl = this.handle_pool.get(self.pool_key)
 
         full_url = url if params is None else "%s?%s" % (url, urllib.urlencode(params))
         self.curl.setopt(pycurl.URL, str(full_url))
@@ -55,19 +201,58 @@ class PycURLRunner(object):
         self.buf = StringIO.StringIO()
         self.curl.setopt(pycurl.WRITEFUNCTION, self.buf.write)
 
+        self.response_headers = None
+
+
+    def collect_headers(self, headers):
+        """
+        Fill the dictionary 'headers' with the response headers,
+        keyed by their names in lower case.  Only the headers from
+        the last response are kept if there were redirects.
+        """
+        self.response_headers = headers
+        self.curl.setopt(pycurl.HEADERFUNCTION, self.__header_line)
+
+
+    def __header_line(self, line):
+        line = line.strip()
+        if line.startswith("HTTP/"):
+            # Status line; a new response is starting.
+            self.response_headers.clear()
+        elif ":" in line:
+            name, value = line.split(":", 1)
+            self.response_headers[name.strip().lower()] = value.strip()
+
 
     def __call__(self, json, throw):
         """Fetch the URL"""
         try:
             self.curl.perform()
-            status = self.curl.getinfo(pycurl.HTTP_CODE)
-            text = self.buf.getvalue()
+            error = None
         except pycurl.error as ex:
-            (code, message) = ex
-            status = 400
-            text = message
+            (code, error) = ex
+        return self.finish(json, throw, error)
+
+
+    def finish(self, json, throw, error=None):
+        """
+        Release the handle and produce the results of a transfer that
+        has been performed.  'error' is the message from cURL if the
+        transfer failed.
+        """
+        try:
+            if error is None:
+                status = self.curl.getinfo(pycurl.HTTP_CODE)
+                text = self.buf.getvalue()
+            else:
+                status = 400
+                text = error
         finally:
-            self.curl.close()
+            # Handles that had trouble may be holding a connection in
+            # an unknown state, so they aren't reused.
+            this.handle_pool.put(self.pool_key, self.curl,
+                                 discard=error is not None)
+            self.curl = None
             self.buf.close()
             
         #If status is outside the HTTP 2XX success  range
@@ -84,6 +269,70 @@ class PycURLRunner(object):
 
 
 
+def _url_perform_many(runners, json):
+    """
+    INTERNAL USE ONLY: Perform the transfers for a list of
+    PycURLRunners concurrently on a single CurlMulti and return a list
+    of their (status, result) tuples in the same order.  Results that
+    should be JSON but can't be parsed come back with a status of 400.
+    """
+
+    multi = pycurl.CurlMulti()
+    errors = {}
+
+    for runner in runners:
+        multi.add_handle(runner.curl)
+
+    try:
+        remaining = len(runners)
+        while remaining:
+
+            while True:
+                ret, active = multi.perform()
+                if ret != pycurl.E_CALL_MULTI_PERFORM:
+                    break
+
+            while True:
+                queued, succeeded, failed = multi.info_read()
+                for handle, errno, message in failed:
+                    errors[handle] = message if message \
+                                     else "cURL error %d" % (errno)
+                remaining -= len(succeeded) + len(failed)
+                if not queued:
+                    break
+
+            if remaining:
+                multi.select(1.0)
+
+    finally:
+        for runner in runners:
+            multi.remove_handle(runner.curl)
+        multi.close()
+
+    results = []
+    for runner in runners:
+        error = errors.get(runner.curl, None)
+        try:
+            results.append(runner.finish(json, False, error))
+        except ValueError as ex:
+            results.append((400, str(ex)))
+
+    return results
+
+
+
+def __many_values(value, count, name):
+    """
+    INTERNAL USE ONLY: Expand a single value into one per request, or
+    check that a list of them is the right length.
+    """
+    if isinstance(value, list):
+        if len(value) != count:
+            raise ValueError("Need one %s per URL" % (name))
+        return value
+    return [ value ] * count
+
+
 
 def url_get( url,          # GET URL
              params=None,  # GET parameters
@@ -93,17 +342,45 @@ def url_get( url,          # GET URL
              timeout=None, # Seconds before giving up
              allow_redirects=True, # Allows URL to be redirected
              headers=None, # Hash of HTTP headers
-             verify_keys=verify_keys_default  # Verify SSL keys
+             verify_keys=verify_keys_default,  # Verify SSL keys
+             response_headers=None  # Dictionary to fill with response headers
              ):
     """
     Fetch a URL using GET with parameters, returning whatever came back.
     """
 
     curl = PycURLRunner(url, params, bind, timeout, allow_redirects, headers, verify_keys)
+    if response_headers is not None:
+        curl.collect_headers(response_headers)
     return curl(json, throw)
 
 
 
+def url_get_many( urls,         # List of GET URLs
+                  params=None,  # GET parameters, one for all or a list
+                  bind=None,    # Bind requests to specified address
+                  json=True,    # Interpret results as JSON
+                  timeout=None, # Seconds before giving up on each
+                  allow_redirects=True, # Allows URLs to be redirected
+                  headers=None, # Hash of HTTP headers
+                  verify_keys=verify_keys_default  # Verify SSL keys
+                  ):
+    """
+    Fetch a list of URLs using GET all at once, returning a list of
+    (status, result) tuples in the same order as the URLs.  The
+    timeout applies to each request.  This never throws; failures are
+    reported in the status.
+    """
+
+    params = __many_values(params, len(urls), "set of parameters")
+
+    runners = [ PycURLRunner(url, url_params, bind, timeout,
+                             allow_redirects, headers, verify_keys)
+                for url, url_params in zip(urls, params) ]
+    return _url_perform_many(runners, json)
+
+
+
 
 def __content_type_data(content_type, headers, data):
 
@@ -158,6 +435,42 @@ def url_post( url,          # GET URL
 
 
 
+def url_post_many( urls,         # List of POST URLs
+                   params={},    # GET parameters, one for all or a list
+                   data=None,    # Data to post, one for all or a list
+                   content_type=None,  # Content type
+                   bind=None,    # Bind requests to specified address
+                   json=True,    # Interpret results as JSON
+                   timeout=None, # Seconds before giving up on each
+                   allow_redirects=True, #Allows URLs to be redirected
+                   headers={},   # Hash of HTTP headers
+                   verify_keys=verify_keys_default  # Verify SSL keys
+                   ):
+    """
+    Post to a list of URLs all at once, returning a list of (status,
+    result) tuples in the same order as the URLs.  The timeout applies
+    to each request.  This never throws; failures are reported in the
+    status.
+    """
+
+    params = __many_values(params, len(urls), "set of parameters")
+    data = __many_values(data, len(urls), "set of data")
+
+    runners = []
+    for url, url_params, url_data in zip(urls, params, data):
+        url_headers = dict(headers)
+        url_content_type, url_data = __content_type_data(
+            content_type, url_headers, url_data)
+        url_headers["Content-Type"] = url_content_type
+        runner = PycURLRunner(url, url_params, bind, timeout,
+                              allow_redirects, url_headers, verify_keys)
+        runner.curl.setopt(pycurl.POSTFIELDS, url_data)
+        runners.append(runner)
+
+    return _url_perform_many(runners, json)
+
+
+
 def url_put( url,          # GET URL
              params={},    # GET parameters
              data=None,    # Data for body
@@ -217,11 +530,16 @@ def url_delete_list(
         verify_keys=verify_keys_default  # Verify SSL keys
         ):
     """
-    Delete a list of URLs and return tuples of the status and error for
-    each.  Note that the timeout is per delete, not for the aggregated
-    operation.
+    Delete a list of URLs all at once and return tuples of the status
+    and error for each.  Note that the timeout is per delete, not for
+    the aggregated operation.
     """
-    return [ url_delete(url, throw=False, timeout=timeout, params=params,
-                        bind=bind, headers=headers, verify_keys=verify_keys, 
-                        allow_redirects=allow_redirects)
-             for url in urls ]
+
+    runners = []
+    for url in urls:
+        runner = PycURLRunner(url, params, bind, timeout, allow_redirects,
+                              headers, verify_keys)
+        runner.curl.setopt(pycurl.CUSTOMREQUEST, "DELETE")
+        runners.append(runner)
+
+    return _url_perform_many(runners, False)
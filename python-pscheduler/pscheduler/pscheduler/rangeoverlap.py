@@ -0,0 +1,124 @@
+"""
+Ranges of values and where lists of them overlap
+"""
+
+import heapq
+
+
+class Range():
+    """
+    Expresses ranges of values.  Values may be of any type with a
+    less-than operator.
+    """
+
+    def __init__(self, lower, upper):
+        self.lower = min(lower, upper)
+        self.upper = max(lower, upper)
+
+    def __repr__(self):
+        return "R(%s..%s)" % (self.lower, self.upper)
+
+    # Note that this is not __len__, which has to return an integer.
+    def length(self):
+        return self.upper - self.lower
+
+    def __lt__(self, rhs):
+        return self.lower < rhs.lower \
+            or ( self.lower == rhs.lower and self.upper < rhs.upper)
+
+    def __or__(self, rhs):
+        """Find where two ranges overlap, return None if no overlap"""
+        assert type(rhs) == type(self), "Wrong type"
+
+        if self.lower > rhs.upper or self.upper < rhs.lower:
+            return None
+        return Range(max(self.lower, rhs.lower), min(self.upper, rhs.upper))
+
+    def overlaps(self, candidates):
+        """
+        Find overlap in a list of candidate ranges, filtering out any that
+        don't have any.
+        """
+        assert type(candidates) == list, "Wrong type"
+        return [
+            overlap for overlap in [
+                self | x for x in candidates
+            ] if overlap is not None
+        ]
+
+
+
+def __overlap_pair(first, second):
+    """
+    INTERNAL USE ONLY: Find the overlaps between every range in one
+    list and every range in another.
+
+    This sweeps across both lists in order of their lower bounds,
+    keeping a heap of the ranges on each side that haven't ended yet.
+    When a range starts, everything still open on the other side
+    overlaps it.  Each overlapping pair is found exactly once, when
+    the later of the two starts.  Ranges are closed, so ranges that
+    only touch produce zero-length overlaps.
+    """
+
+    # Starts sort by lower bound, then by which list they came from
+    # and where in it so values never have to be compared otherwise.
+    starts = [ (item.lower, 0, index, item)
+               for index, item in enumerate(first) ] \
+           + [ (item.lower, 1, index, item)
+               for index, item in enumerate(second) ]
+    starts.sort(key=lambda start: start[0:3])
+
+    open_ranges = ([], [])   # Heaps of (upper, index, range) per side
+    result = []
+
+    for lower, side, index, item in starts:
+
+        others = open_ranges[1 - side]
+        while others and others[0][0] < lower:
+            heapq.heappop(others)
+
+        for _, _, other in others:
+            result.append(Range(lower, min(item.upper, other.upper)))
+
+        heapq.heappush(open_ranges[side], (item.upper, index, item))
+
+    return result
+
+
+
+def find_overlaps(range_lists):
+
+    """
+    Find a set of common ranges among several sets of them.
+
+    (The use case for this in pScheduler is finding the common times
+    that all participants in a task have available.)
+
+    Applying this function to this input...
+
+        [ [ Range(10, 50), Range(60, 77), Range(80, 90) ],
+          [ Range(10, 12), Range(15,20), Range(20, 25), Range(51, 54),
+            Range(65, 74), Range(81, 100) ],
+          [ Range(22, 27), Range(65, 77), Range(82, 89) ],
+          [ Range(1, 1000) ] ]
+
+    ...will yield a result of [Range(22..25), Range(65..74), Range(82..89)].
+
+    Every combination of one range from each list that overlaps
+    contributes one range to the result, which is sorted.  The work
+    done is proportional to the total number of ranges (times its log)
+    plus the number of overlaps found.
+    """
+
+    if not range_lists:
+        # Nothing is... Nothing.
+        return []
+
+    result = list(range_lists[0])
+    for range_list in range_lists[1:]:
+        if not result:
+            break
+        result = __overlap_pair(result, range_list)
+
+    return sorted(result)
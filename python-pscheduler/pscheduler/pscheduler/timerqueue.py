@@ -0,0 +1,125 @@
+"""
+Queue of functions to be called at specific times
+"""
+
+import heapq
+import threading
+import time
+
+
+class TimerQueue(object):
+
+    """
+    Calls functions at specified times.  A function can reschedule
+    itself by returning the number of seconds until it should be
+    called again or drop out of the queue by returning None.
+
+    Functions are called in the thread that invokes run() or
+    run_due(), in order of when they're due.  Those due at the same
+    time are called in the order they were added.  Exceptions raised
+    by a function are passed along to the caller and the function is
+    not rescheduled.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self, clock=time.time):
+        """
+        Construct a queue.  'clock' is a function that returns the
+        current time in seconds.
+        """
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.heap = []      # (when, sequence, name, function)
+        self.sequence = 0
+        self.stopped = False
+
+
+    def __len__(self):
+        with self.lock:
+            return len(self.heap)
+
+
+    def __push(self, when, name, function):
+        """
+        INTERNAL USE ONLY: Add an item to the heap.  Must be called
+        with the lock held.
+        """
+        heapq.heappush(self.heap, (when, self.sequence, name, function))
+        self.sequence += 1
+        self.changed.notify()
+
+
+    def add(self, function, delay=0, name=None):
+        """
+        Call 'function' after 'delay' seconds.  The 'name' is
+        informational.
+        """
+        with self.lock:
+            self.__push(self.clock() + delay, name, function)
+
+
+    def every(self, interval, function, delay=0, name=None):
+        """
+        Call 'function' every 'interval' seconds, starting after
+        'delay' seconds.  Anything 'function' returns is ignored.
+        """
+        def periodic():
+            function()
+            return interval
+        self.add(periodic, delay=delay, name=name)
+
+
+    def run_due(self):
+        """
+        Call everything that's due and return the number of seconds
+        until the next item is due or None if the queue is empty.
+        """
+
+        while True:
+
+            with self.lock:
+                if not self.heap:
+                    return None
+                when, sequence, name, function = self.heap[0]
+                now = self.clock()
+                if when > now:
+                    return when - now
+                heapq.heappop(self.heap)
+
+            delay = function()
+
+            if delay is not None:
+                with self.lock:
+                    self.__push(self.clock() + delay, name, function)
+
+
+    def run(self):
+        """
+        Call functions as they become due until stop() is called.
+        """
+
+        while True:
+
+            self.run_due()
+
+            with self.lock:
+                if self.stopped:
+                    return
+                # Look again since something may have been added.
+                if not self.heap:
+                    self.changed.wait()
+                else:
+                    remaining = self.heap[0][0] - self.clock()
+                    if remaining > 0:
+                        self.changed.wait(remaining)
+
+
+    def stop(self):
+        """
+        Make run() return once whatever it's calling finishes.
+        """
+        with self.lock:
+            self.stopped = True
+            self.changed.notify()
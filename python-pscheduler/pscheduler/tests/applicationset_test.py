@@ -0,0 +1,92 @@
+"""
+test for the Applicationset module.
+"""
+
+import unittest
+
+from base_test import PschedTestBase
+
+from pscheduler.limitprocessor.applicationset import ApplicationSet
+from pscheduler.limitprocessor.classifierset import ClassifierSet
+from pscheduler.limitprocessor.identifierset import IdentifierSet
+from pscheduler.limitprocessor.limitset import LimitSet
+
+
+PROPOSAL = {
+    "task": {
+        "test": { "type": "rtt", "spec": { "dest": "192.0.2.9" } },
+        "run_schedule": { "start": "2020-01-01T10:30:00Z", "duration": "PT10S" }
+    },
+    "hints": { "requester": "192.0.2.1" }
+}
+
+
+class TestApplicationset(PschedTestBase):
+    """
+    Applicationset tests.
+    """
+
+    def setUp(self):
+        identifiers = IdentifierSet([
+            { "name": "everybody", "description": "Everybody",
+              "type": "always", "data": {} }
+        ])
+        classifiers = ClassifierSet([
+            { "name": "everybody", "description": "Everybody",
+              "identifiers": [ "everybody" ] }
+        ], identifiers)
+        self.limits = LimitSet([
+            { "name": "always", "description": "Always", "type": "pass-fail",
+              "data": { "pass": True } },
+            { "name": "hours", "description": "Hours", "type": "run-schedule",
+              "data": { "hour": [ 10 ] } },
+            { "name": "jq", "description": "JQ", "type": "jq",
+              "data": { "script": ".run_schedule != null" } }
+        ])
+
+        # Count how many times each limit is evaluated
+        self.calls = { "always": 0, "hours": 0 }
+        for name in self.calls:
+            evaluator = self.limits.limits[name]["evaluator"]
+            def counted(proposal, name=name, real=evaluator.evaluate):
+                self.calls[name] += 1
+                return real(proposal)
+            evaluator.evaluate = counted
+
+        self.applications = ApplicationSet([
+            { "description": "First",
+              "apply": [ { "require": "all", "limits": [ "always", "hours" ] } ] },
+            { "description": "Second",
+              "apply": [ { "require": "all", "limits": [ "always" ] },
+                         { "require": "any", "limits": [ "hours", "always" ] } ] }
+        ], classifiers, self.limits)
+
+    def test_evaluated_once(self):
+        """Limits applied in several places are evaluated once"""
+        passed, limits_passed, diags = self.applications.check(
+            PROPOSAL, [ "everybody" ])
+        self.assertTrue(passed)
+        self.assertEqual(self.calls, { "always": 1, "hours": 1 })
+
+        # Separate checks don't share results
+        self.applications.check(PROPOSAL, [ "everybody" ])
+        self.assertEqual(self.calls, { "always": 2, "hours": 2 })
+
+    def test_shared(self):
+        """Shared results only hold limits that don't check the schedule"""
+        shared = {}
+        for _ in range(3):
+            self.applications.check(PROPOSAL, [ "everybody" ], shared=shared)
+        self.assertEqual(shared.keys(), [ "always" ])
+        self.assertEqual(self.calls, { "always": 1, "hours": 3 })
+
+    def test_whole_task_not_shared(self):
+        """Limits handed the whole task aren't shared"""
+        self.assertTrue(self.limits.shares_results("always"))
+        self.assertFalse(self.limits.shares_results("hours"))
+        self.assertFalse(self.limits.shares_results("jq"))
+        self.assertRaises(ValueError, self.limits.shares_results, "nope")
+
+
+if __name__ == '__main__':
+    unittest.main()
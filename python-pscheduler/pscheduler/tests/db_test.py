@@ -2,10 +2,33 @@
 test for the Db module.
 """
 
+import threading
+import time
 import unittest
 
+import psycopg2.extensions
+
 from base_test import PschedTestBase
 
+from pscheduler.db import PgConnectionPool, PgPoolTimeout
+
+
+class FakeConnection(object):
+    """Just enough of a psycopg2 connection to exercise the pool."""
+
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+def fake_connector(dsn, autocommit, name):
+    return FakeConnection()
+
 
 class TestDb(PschedTestBase):
     """
@@ -21,5 +44,67 @@ class TestDb(PschedTestBase):
         pass
 
 
+    def test_pool_reuse(self):
+        """Pooled connections are reused"""
+        pool = PgConnectionPool("", 2, connector=fake_connector)
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertIs(pool.getconn(), first)
+        self.assertEqual(pool.stats()["connects"], 1)
+
+
+    def test_pool_bounded(self):
+        """Exhausted pools time out"""
+        pool = PgConnectionPool("", 1, connector=fake_connector)
+        pool.getconn()
+        self.assertRaises(PgPoolTimeout, pool.getconn, 0.05)
+        stats = pool.stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["waiting"], 0)
+
+
+    def test_pool_handoff(self):
+        """Returned connections go straight to a waiter"""
+        pool = PgConnectionPool("", 1, connector=fake_connector)
+        held = pool.getconn()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.getconn(5)))
+        waiter.start()
+        while pool.stats()["waiting"] == 0:
+            time.sleep(0.01)
+        pool.putconn(held)
+        waiter.join()
+        self.assertEqual(got, [held])
+
+
+    def test_pool_discard(self):
+        """Discarded and broken connections are replaced"""
+        pool = PgConnectionPool("", 1, connector=fake_connector)
+        first = pool.getconn()
+        pool.putconn(first, discard=True)
+        self.assertTrue(first.closed)
+        second = pool.getconn()
+        self.assertIsNot(second, first)
+        second.close()
+        pool.putconn(second)
+        self.assertIsNot(pool.getconn(), second)
+        self.assertEqual(pool.stats()["open"], 1)
+
+
+    def test_pool_context(self):
+        """Context manager discards on OperationalError"""
+        pool = PgConnectionPool("", 1, connector=fake_connector)
+        with pool.connection() as conn:
+            pass
+        self.assertFalse(conn.closed)
+        try:
+            with pool.connection() as conn:
+                raise psycopg2.OperationalError("Gone")
+        except psycopg2.OperationalError:
+            pass
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["in-use"], 0)
+
+
 if __name__ == '__main__':
     unittest.main()
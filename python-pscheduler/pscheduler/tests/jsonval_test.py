@@ -2,12 +2,14 @@
 test for the Jsonval module.
 """
 
+import copy
+import jsonschema
 import unittest
-import sys
 
 from base_test import PschedTestBase
 
-from pscheduler.jsonval import json_validate
+import pscheduler.jsonval as jsonval
+from pscheduler.jsonval import json_validate, __default_schema__
 
 
 class TestJsonval(PschedTestBase):
@@ -67,5 +69,88 @@ class TestJsonval(PschedTestBase):
         self.assertEqual((valid, message), (True, 'OK'))
 
 
+    def uncached_validate(self, json, skeleton):
+        """Validate the way json_validate() did before caching"""
+        schema = copy.copy(__default_schema__)
+        for element in [ 'type', 'items', 'properties',
+                         'additionalProperties', 'required', 'local',
+                         '$ref' ]:
+            if element in skeleton:
+                schema[element] = skeleton[element]
+        jsonschema.Draft7Validator.check_schema(schema)
+        try:
+            jsonschema.validate(json, schema,
+                                format_checker=jsonschema.draft7_format_checker)
+        except jsonschema.exceptions.ValidationError as ex:
+            try:
+                message = ex.schema["x-invalid-message"].replace("%s", ex.instance)
+            except (KeyError, TypeError):
+                message = ex.message
+            if len(ex.absolute_path) > 0:
+                path = "/".join([str(x) for x in ex.absolute_path])
+                return (False, "At /%s: %s" % (path, message))
+            return (False, "%s" % (message))
+        return (True, 'OK')
+
+
+    def test_cached_messages(self):
+        """Cached validators produce the same results"""
+
+        skeleton = {
+            "type": "object",
+            "properties": {
+                "howlong": {"$ref": "#/pScheduler/Duration"},
+                "count": {"$ref": "#/pScheduler/Cardinal"},
+                "task": {"$ref": "#/pScheduler/TaskSpecification"}
+            },
+            "additionalProperties": False,
+            "required": ["howlong"]
+        }
+
+        for sample in [
+                { "howlong": "PT10M" },
+                { "howlong": "PT10Mxx" },
+                { "howlong": "PT1M", "count": -3 },
+                { "howlong": "PT1M", "extra": True },
+                { "count": 3 },
+                { "howlong": "PT1M", "task": { "schema": 1 } },
+                { "howlong": "PT1M", "task": {
+                    "test": { "type": "rtt", "spec": {} } } }
+        ]:
+            expected = self.uncached_validate(sample, skeleton)
+            # Twice to get both a fresh and a cached validator
+            self.assertEqual(json_validate(sample, skeleton), expected)
+            self.assertEqual(json_validate(sample, skeleton), expected)
+
+        self.assertEqual(json_validate({ "howlong": "PT10Mxx" }, skeleton),
+                         (False, "At /howlong: 'PT10Mxx' is not a valid ISO 8601 duration."))
+
+
+    def test_validator_cached(self):
+        """Validators are built once and reused"""
+
+        skeleton = {
+            "type": "object",
+            "properties": {
+                "task": {"$ref": "#/pScheduler/TaskSpecification"}
+            },
+            "required": ["task"]
+        }
+        sample = { "task": {
+            "schema": 1,
+            "test": { "type": "rtt", "spec": { "dest": "www.perfsonar.net" } },
+            "schedule": { "repeat": "PT5M", "slip": "PT1M" }
+        } }
+
+        self.assertEqual(json_validate(sample, skeleton), (True, 'OK'))
+
+        # Looked up by name since it would be mangled inside a class.
+        validator = getattr(jsonval, "__validator")
+        first, first_lock = validator(skeleton)
+        second, second_lock = validator(copy.deepcopy(skeleton))
+        self.assertIs(first, second)
+        self.assertIs(first_lock, second_lock)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,151 @@
+"""
+test for the Limitprocessor module.
+"""
+
+import os
+import tempfile
+import unittest
+
+from base_test import PschedTestBase
+
+import pscheduler
+from pscheduler.limitprocessor.limitprocessor import LimitProcessor
+
+
+LIMITS = {
+    "schema": 1,
+    "identifiers": [
+        { "name": "everybody", "description": "Everybody",
+          "type": "always", "data": {} }
+    ],
+    "classifiers": [
+        { "name": "everybody", "description": "Everybody",
+          "identifiers": [ "everybody" ] }
+    ],
+    "limits": [
+        { "name": "always", "description": "Always", "type": "pass-fail",
+          "data": { "pass": True } },
+        { "name": "mornings", "description": "Mornings",
+          "type": "run-schedule", "data": { "hour": [ 9, 10, 11 ] } }
+    ],
+    "applications": [
+        { "description": "Mornings only",
+          "apply": [ { "require": "all",
+                       "limits": [ "always", "mornings" ] } ] }
+    ]
+}
+
+TASK = {
+    "schema": 1,
+    "test": { "type": "rtt", "spec": { "schema": 1, "dest": "192.0.2.9" } }
+}
+
+HINTS = { "requester": "192.0.2.1" }
+
+# A limit and a priority that look at the run_schedule without saying
+# they check the schedule
+
+JQ_LIMITS = dict(LIMITS, schema=3,
+    limits=[
+        { "name": "mornings", "description": "Mornings", "type": "jq",
+          "data": { "script": ".run_schedule.start | test(\"T1[01]:\")" } }
+    ],
+    applications=[
+        { "description": "Mornings only",
+          "apply": [ { "require": "all", "limits": [ "mornings" ] } ] }
+    ],
+    priority={
+        "script": [
+            ".",
+            "| if .run_schedule.start | test(\"T11:\")",
+            "  then set(5; \"Late morning\") else . end"
+        ]
+    }
+)
+
+
+class TestLimitprocessor(PschedTestBase):
+    """
+    Limitprocessor tests.
+    """
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.write(handle, pscheduler.json_dump(LIMITS))
+        os.close(handle)
+        self.processor = LimitProcessor(self.path)
+
+        # Count how many times each limit is evaluated
+        self.calls = { "always": 0, "mornings": 0 }
+        for name in self.calls:
+            evaluator = self.processor.limits.limits[name]["evaluator"]
+            def counted(proposal, name=name, real=evaluator.evaluate):
+                self.calls[name] += 1
+                return real(proposal)
+            evaluator.evaluate = counted
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def processor_for(self, limits):
+        handle, path = tempfile.mkstemp()
+        os.write(handle, pscheduler.json_dump(limits))
+        os.close(handle)
+        try:
+            return LimitProcessor(path)
+        finally:
+            os.unlink(path)
+
+    def schedules(self, hours):
+        return [ { "start": "2020-01-01T%02d:10:00+00:00" % (hour),
+                   "duration": "PT10M" }
+                 for hour in hours ]
+
+    def test_process_many(self):
+        """Same results as processing one schedule at a time"""
+        hours = [ 8, 9, 10, 11, 12 ]
+        many = self.processor.process_many(TASK, HINTS, self.schedules(hours),
+                                           rewrite=False, prioritize=True)
+        self.assertEqual([ result[0] for result in many ],
+                         [ False, True, True, True, False ])
+
+        for schedule, result in zip(self.schedules(hours), many):
+            self.assertEqual(self.processor.process(
+                dict(TASK, run_schedule=schedule), HINTS,
+                rewrite=False, prioritize=True), result)
+
+    def test_evaluated_once(self):
+        """Limits that don't check the schedule are evaluated once"""
+        self.processor.process_many(TASK, HINTS, self.schedules(range(24)))
+        self.assertEqual(self.calls, { "always": 1, "mornings": 24 })
+
+    def test_whole_task_limits(self):
+        """Limits and priorities that see the run_schedule see each one"""
+        processor = self.processor_for(JQ_LIMITS)
+        hours = [ 9, 10, 11, 12 ]
+        many = processor.process_many(TASK, HINTS, self.schedules(hours),
+                                      rewrite=False, prioritize=True)
+        self.assertEqual([ (result[0], result[4]) for result in many ],
+                         [ (False, 0), (True, 0), (True, 5), (False, 0) ])
+
+        for schedule, result in zip(self.schedules(hours), many):
+            self.assertEqual(processor.process(
+                dict(TASK, run_schedule=schedule), HINTS,
+                rewrite=False, prioritize=True), result)
+
+    def test_run_schedule_ignored(self):
+        """A run_schedule in the task is replaced by each schedule"""
+        task = dict(TASK, run_schedule=self.schedules([ 10 ])[0])
+        many = self.processor.process_many(task, HINTS, self.schedules([ 8 ]))
+        self.assertFalse(many[0][0])
+
+    def test_edges(self):
+        """No schedules and no limits"""
+        self.assertEqual(self.processor.process_many(TASK, HINTS, []), [])
+        self.assertEqual(
+            LimitProcessor().process_many(TASK, HINTS, self.schedules([ 1, 2 ])),
+            [ (True, [], "No limits were applied", None, None) ] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
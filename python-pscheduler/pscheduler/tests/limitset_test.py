@@ -0,0 +1,113 @@
+"""
+test for the Limitset module.
+"""
+
+import datetime
+import unittest
+
+from base_test import PschedTestBase
+
+from pscheduler.limitprocessor.limitset import LimitCache, LimitSet
+
+
+class Counter(object):
+    """Evaluation function that counts its calls"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def proposal(dest, start="2020-01-01T00:00:00Z", hints=None):
+    return {
+        "task": {
+            "test": { "type": "rtt", "spec": { "dest": dest } },
+            "run_schedule": { "start": start, "duration": "PT10S" }
+        },
+        "hints": hints if hints is not None else { "requester": "192.0.2.1" }
+    }
+
+
+class TestLimitset(PschedTestBase):
+    """
+    Limitset tests.
+    """
+
+    def test_cache_hits(self):
+        """Cached results are reused regardless of the schedule"""
+        cache = LimitCache(datetime.timedelta(hours=1))
+        counter = Counter({ "passed": True })
+
+        self.assertEqual(cache.get(proposal("a"), counter), { "passed": True })
+        self.assertEqual(cache.get(
+            proposal("a", start="2021-06-01T12:00:00Z"), counter),
+                         { "passed": True })
+        self.assertEqual(counter.calls, 1)
+
+        # Different tasks and hints are different keys
+        cache.get(proposal("b"), counter)
+        cache.get(proposal("a", hints={ "requester": "192.0.2.2" }), counter)
+        self.assertEqual(counter.calls, 3)
+
+    def test_cache_expiration(self):
+        """Expired results are evaluated again"""
+        cache = LimitCache(datetime.timedelta(0))
+        counter = Counter({ "passed": False })
+        cache.get(proposal("a"), counter)
+        cache.get(proposal("a"), counter)
+        self.assertEqual(counter.calls, 2)
+
+    def test_cache_size(self):
+        """The oldest results are dropped when the cache is full"""
+        cache = LimitCache(datetime.timedelta(hours=1), size=2)
+        counter = Counter({ "passed": True })
+        for dest in [ "a", "b", "c" ]:
+            cache.get(proposal(dest), counter)
+        self.assertEqual(len(cache.items), 2)
+        cache.get(proposal("c"), counter)
+        self.assertEqual(counter.calls, 3)
+        cache.get(proposal("a"), counter)
+        self.assertEqual(counter.calls, 4)
+
+    def test_cached_limit(self):
+        """Limits with a cache only evaluate once"""
+        limits = LimitSet([
+            { "name": "always", "description": "Always", "type": "pass-fail",
+              "data": { "pass": True }, "cache": "PT1H" },
+            { "name": "never", "description": "Never", "clone": "always",
+              "data": { "pass": False }, "cache": "PT1H" }
+        ])
+
+        counters = {}
+        for name in [ "always", "never" ]:
+            evaluator = limits.limits[name]["evaluator"]
+            counters[name] = Counter(None)
+            def counted(proposal, counter=counters[name],
+                        real=evaluator.evaluate):
+                counter()
+                return real(proposal)
+            evaluator.evaluate = counted
+
+        for start in [ "2020-01-01T00:00:00Z", "2020-01-02T00:00:00Z" ]:
+            self.assertTrue(
+                limits.check(proposal("a", start=start), "always", True)["passed"])
+            self.assertFalse(
+                limits.check(proposal("a", start=start), "never", True)["passed"])
+
+        self.assertEqual(counters["always"].calls, 1)
+        self.assertEqual(counters["never"].calls, 1)
+
+    def test_schedule_limits_not_cached(self):
+        """Limits that check the schedule can't be cached"""
+        self.assertRaises(ValueError, LimitSet, [
+            { "name": "hours", "description": "Hours", "type": "run-schedule",
+              "data": { "hour": [ 1 ] }, "cache": "PT1H" }
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
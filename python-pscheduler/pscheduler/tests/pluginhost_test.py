@@ -0,0 +1,175 @@
+"""
+test for the Pluginhost module.
+"""
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+
+from base_test import PschedTestBase
+
+import pscheduler
+from pscheduler.pluginhost import plugin_host_init, plugin_invoke
+
+
+ENTRY_METHOD = """#!/usr/bin/python
+import pscheduler
+import time
+from validate import NAME
+
+def method_main(args, stdin):
+    spec = pscheduler.json_load(stdin)
+    if spec.get("fail"):
+        return 1, "", "Failed as requested"
+    if spec.get("sleep"):
+        time.sleep(spec["sleep"])
+    if spec.get("spin"):
+        end = time.time() + spec["spin"]
+        while time.time() < end:
+            pass
+    if spec.get("lazy"):
+        from lazy import LAZY_NAME
+        return 0, pscheduler.json_dump({"lazy": LAZY_NAME}), ""
+    return 0, pscheduler.json_dump({
+        "name": NAME, "args": args, "spec": spec}), ""
+
+if __name__ == "__main__":
+    raise RuntimeError("Should not be run as a program here")
+"""
+
+# A method without an entry function that does things that only work
+# in the main thread of its own process.
+LOG_METHOD = """#!/usr/bin/python
+import pscheduler
+log = pscheduler.Log(prefix="pluginhost-test", quiet=True)
+pscheduler.succeed_json({"logged": True})
+"""
+
+# Stands in for the pscheduler command, running methods directly.
+INVOKER = """#!/bin/sh
+shift 2
+CLASS=$1
+NAME=$2
+METHOD=$3
+shift 3
+PYTHONPATH=%s exec %s "%s/${CLASS}/${NAME}/${METHOD}" "$@"
+"""
+
+
+class TestPluginhost(PschedTestBase):
+    """
+    Pluginhost tests.
+    """
+
+    def setUp(self):
+        self.classes = tempfile.mkdtemp()
+        for name in ["first", "second"]:
+            plugin = os.path.join(self.classes, "test", name)
+            os.makedirs(plugin)
+            with open(os.path.join(plugin, "spec-is-valid"), "w") as method:
+                method.write(ENTRY_METHOD)
+            with open(os.path.join(plugin, "participants"), "w") as method:
+                method.write(LOG_METHOD)
+            with open(os.path.join(plugin, "validate.py"), "w") as module:
+                module.write("NAME = '%s'\n" % (name))
+            with open(os.path.join(plugin, "lazy.py"), "w") as module:
+                module.write("LAZY_NAME = 'lazy-%s'\n" % (name))
+
+        self.bin = tempfile.mkdtemp()
+        invoker = os.path.join(self.bin, "pscheduler")
+        with open(invoker, "w") as script:
+            script.write(INVOKER % (
+                os.path.dirname(os.path.dirname(pscheduler.__file__)),
+                sys.executable, self.classes))
+        os.chmod(invoker, stat.S_IRWXU)
+        self.saved_path = os.environ["PATH"]
+        os.environ["PATH"] = self.bin + os.pathsep + self.saved_path
+
+        plugin_host_init(self.classes)
+
+    def tearDown(self):
+        plugin_host_init(None)
+        os.environ["PATH"] = self.saved_path
+        shutil.rmtree(self.classes)
+        shutil.rmtree(self.bin)
+
+    def test_in_process(self):
+        """In-process invocation"""
+        status, stdout, stderr = plugin_invoke(
+            "test", "first", "spec-is-valid", args=["x"], stdin='{"a": 1}')
+        self.assertEqual(status, 0)
+        self.assertEqual(pscheduler.json_load(stdout),
+                         {"args": ["x"], "name": "first", "spec": {"a": 1}})
+
+    def test_module_isolation(self):
+        """Plugins' own modules don't collide"""
+        for name in ["first", "second", "first"]:
+            status, stdout, stderr = plugin_invoke(
+                "test", name, "spec-is-valid", stdin='{}')
+            self.assertEqual(status, 0)
+            self.assertEqual(pscheduler.json_load(stdout)["name"], name)
+
+    def test_failure(self):
+        """Failing plugins"""
+        status, stdout, stderr = plugin_invoke(
+            "test", "first", "spec-is-valid", stdin='{"fail": true}')
+        self.assertEqual(status, 1)
+        self.assertEqual(stderr, "Failed as requested\n")
+
+        status, stdout, stderr = plugin_invoke(
+            "test", "first", "spec-is-valid", stdin='not json')
+        self.assertEqual(status, 1)
+        self.assertTrue("ValueError" in stderr)
+
+    def test_timeout(self):
+        """In-process methods are held to the timeout"""
+        status, stdout, stderr = plugin_invoke(
+            "test", "first", "spec-is-valid", stdin='{"sleep": 2}',
+            timeout=0.1)
+        self.assertEqual(status, 2)
+
+    def test_lazy_import(self):
+        """Plugins' own modules can be imported while running"""
+        for name in ["first", "second"]:
+            status, stdout, stderr = plugin_invoke(
+                "test", name, "spec-is-valid", stdin='{"lazy": true}')
+            self.assertEqual(status, 0, stderr)
+            self.assertEqual(pscheduler.json_load(stdout),
+                             {"lazy": "lazy-%s" % (name)})
+        self.assertFalse("lazy" in sys.modules)
+        self.assertFalse("validate" in sys.modules)
+
+    def test_timeout_stops_method(self):
+        """Methods that time out are stopped"""
+        status, stdout, stderr = plugin_invoke(
+            "test", "first", "spec-is-valid", stdin='{"spin": 30}',
+            timeout=0.1)
+        self.assertEqual(status, 2)
+        for thread in threading.enumerate():
+            if thread.name == "plugin-method":
+                thread.join(5)
+                self.assertFalse(thread.is_alive())
+
+    def test_log_in_thread(self):
+        """Methods without an entry function run as programs"""
+        results = []
+
+        def invoke():
+            results.append(plugin_invoke(
+                "test", "first", "participants", stdin='{}', timeout=30))
+
+        thread = threading.Thread(target=invoke)
+        thread.start()
+        thread.join()
+
+        status, stdout, stderr = results[0]
+        self.assertEqual(status, 0, stderr)
+        self.assertEqual(pscheduler.json_load(stdout), {"logged": True})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+test for the Prefixindex module.
+"""
+
+import ipaddress
+import random
+import unittest
+
+from base_test import PschedTestBase
+
+from pscheduler.limitprocessor.prefixindex import PrefixIndex
+
+
+class TestPrefixindex(PschedTestBase):
+    """
+    Prefixindex tests.
+    """
+
+    def test_lookups(self):
+        """Addresses and networks in both families"""
+        index = PrefixIndex([ "10.0.0.0/8", "192.168.1.1", "fd00::/8" ])
+        self.assertEqual(len(index), 3)
+        self.assertTrue(index.overlaps("10.9.8.7"))
+        self.assertTrue(index.overlaps("192.168.1.1"))
+        self.assertFalse(index.overlaps("192.168.1.2"))
+        self.assertTrue(index.overlaps("fd00:dead:beef::1"))
+        self.assertFalse(index.overlaps("2001:db8::1"))
+        # Networks containing something in the index
+        self.assertTrue(index.overlaps("192.168.0.0/16"))
+        self.assertTrue(index.overlaps("::/0"))
+        self.assertFalse(index.overlaps("172.16.0.0/12"))
+
+    def test_empty(self):
+        """Empty indexes match nothing"""
+        index = PrefixIndex()
+        self.assertEqual(len(index), 0)
+        self.assertFalse(index.overlaps("10.0.0.1"))
+
+    def test_invalid(self):
+        """Things that aren't addresses are refused"""
+        self.assertRaises(ValueError, PrefixIndex, [ "10.0.0.0/33" ])
+        self.assertRaises(ValueError, PrefixIndex().overlaps, "example.com")
+
+    def test_matches_linear(self):
+        """Same results as checking every network on random input"""
+
+        generator = random.Random(5551212)
+
+        def random_network():
+            address = ipaddress.ip_address(generator.getrandbits(32))
+            return ipaddress.ip_network(
+                u"%s/%d" % (address, generator.randint(8, 32)), strict=False)
+
+        networks = [ random_network() for _ in range(2000) ]
+        index = PrefixIndex([ str(network) for network in networks ])
+
+        for trial in range(500):
+            candidate = random_network() if trial % 2 \
+                else ipaddress.ip_network(
+                    unicode(ipaddress.ip_address(generator.getrandbits(32))))
+            self.assertEqual(
+                index.overlaps(str(candidate)),
+                any(network.overlaps(candidate) for network in networks),
+                "Mismatch for %s" % (candidate))
+
+
+if __name__ == '__main__':
+    unittest.main()
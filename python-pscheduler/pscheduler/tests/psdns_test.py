@@ -2,11 +2,16 @@
 test for the Psdns module.
 """
 
+import dns.exception
+import socket
+import time
 import unittest
 
 from base_test import PschedTestBase
 
-from pscheduler.psdns import dns_resolve, dns_bulk_resolve
+from pscheduler import psdns
+from pscheduler.psdns import dns_resolve, dns_bulk_resolve, dns_query, \
+    dns_stats, dns_cache_clear, DNSCache
 
 
 class TestPsdns(PschedTestBase):
@@ -26,6 +31,88 @@ class TestPsdns(PschedTestBase):
         #self.assertEqual(
         #    dns_resolve('www.perfsonar.net', ip_version=6), '2001:48a8:68fe::248')
 
+    def test_cache(self):
+        """Cache expiration and eviction"""
+
+        cache = DNSCache(size=2)
+        cache.put("a", 1, 60)
+        cache.put("b", 2, 60)
+        self.assertEqual(cache.get("a"), (True, 1))
+        cache.put("c", 3, 60)   # Evicts b, the least recently used
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("c"), (True, 3))
+
+        cache.put("d", None, 0)
+        time.sleep(0.01)
+        self.assertEqual(cache.get("d"), (False, None))
+
+    def test_resolve_cached(self):
+        """Repeated lookups come from the cache"""
+
+        dns_cache_clear()
+        before = dns_stats()
+        self.assertEqual(dns_resolve('192.0.2.1'), '192.0.2.1')
+        self.assertEqual(dns_resolve('192.0.2.1'), '192.0.2.1')
+        after = dns_stats()
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertTrue(after["workers"] > 0)
+
+        self.assertEqual(dns_bulk_resolve(['192.0.2.1', '192.0.2.2']),
+                         {'192.0.2.1': '192.0.2.1', '192.0.2.2': '192.0.2.2'})
+
+    def test_query_failure(self):
+        """Unexpected failures look like timeouts"""
+
+        # dnspython raises its own exception for unknown record types,
+        # which isn't one dns_query() handles.
+        self.assertRaises(dns.exception.Timeout,
+                          dns_query, "localhost", "NOT-A-TYPE")
+
+    def test_negative_caching(self):
+        """Only names that don't exist are cached"""
+
+        errors = []
+        def getaddrinfo(host, port, family):
+            raise errors.pop(0)
+
+        real_getaddrinfo = socket.getaddrinfo
+        socket.getaddrinfo = getaddrinfo
+        try:
+            dns_cache_clear()
+            errors.append(socket.gaierror(socket.EAI_AGAIN, "Try again"))
+            self.assertEqual(dns_resolve('transient.example'), None)
+            # Not cached, so this one gets looked up and isn't found.
+            errors.append(socket.gaierror(socket.EAI_NONAME, "Not found"))
+            self.assertEqual(dns_resolve('transient.example'), None)
+            # Cached, so no lookup is made.
+            self.assertEqual(dns_resolve('transient.example'), None)
+            self.assertEqual(errors, [])
+        finally:
+            socket.getaddrinfo = real_getaddrinfo
+
+    def test_coalesced_timeouts(self):
+        """Coalesced lookups get as long as each waiter allows"""
+
+        dns_cache_clear()
+        given = []
+        def proc(timeout):
+            given.append(timeout)
+            time.sleep(min(timeout, 0.3))
+            if timeout < 0.3:
+                return (dns.exception.Timeout(), None)
+            return ("answer", 60)
+
+        key = ("test", "coalesced")
+        getattr(psdns, "__dns_lookup_start")(key, proc, 0.1)
+        time.sleep(0.02)
+        self.assertEqual(getattr(psdns, "__dns_lookup")(key, proc, 1.0),
+                         (True, "answer"))
+        self.assertEqual(len(given), 2)
+        self.assertEqual(given[0], 0.1)
+        self.assertTrue(given[1] > 0.3)
+
     def test_bulk_resolve(self):
         """Bulk resolve test."""
 
@@ -2,6 +2,8 @@
 test for the Psjson module.
 """
 
+import os
+import threading
 import unittest
 
 from base_test import PschedTestBase
@@ -11,6 +13,8 @@ from pscheduler.psjson import (
     json_dump,
     json_load,
     json_substitute,
+    RFC7464Emitter,
+    RFC7464Parser,
 )
 
 
@@ -57,9 +61,92 @@ class TestPsjson(PschedTestBase):
         self.assertEqual(ret, '{"foo": "foo"}')
 
 
-    # TODO: Need tests for streaming JSON classes.  These will involve
-    # more code than the actual classes.
+    def pipe(self):
+        """Return a pair of file objects for reading and writing a pipe"""
+        read_fd, write_fd = os.pipe()
+        return os.fdopen(read_fd, 'r'), os.fdopen(write_fd, 'w')
 
+    def test_rfc7464(self):
+        """Streaming JSON round trips"""
+
+        read_file, write_file = self.pipe()
+
+        # Small blocks force records to span reads.
+        parser = RFC7464Parser(read_file, timeout=5, block_size=7)
+        emitter = RFC7464Emitter(write_file, timeout=5)
+
+        docs = [
+            { "foo": "bar" },
+            [ 1, 2, 3 ],
+            { "#comment": "x", "long": "y" * 1000, "nl": "a\nb" },
+            "string",
+            { "unicode": u"\u00e9t\u00e9" }
+        ]
+
+        for doc in docs:
+            emitter(doc)
+        write_file.write("\x1e{\"last\": true}")
+        write_file.close()
+
+        self.assertEqual(parser(), docs[0])
+        self.assertEqual(parser(), docs[1])
+        self.assertEqual(parser(), { "long": "y" * 1000, "nl": "a\nb" })
+        self.assertEqual(list(parser), docs[3:] + [ { "last": True } ])
+        self.assertRaises(StopIteration, parser.next)
+
+        read_file.close()
+
+    def test_rfc7464_errors(self):
+        """Streaming JSON errors"""
+
+        read_file, write_file = self.pipe()
+        parser = RFC7464Parser(read_file, timeout=0.1, max_record=100,
+                               block_size=16)
+
+        self.assertRaises(IOError, parser.next)
+
+        write_file.write('{"no": "separator"}\n')
+        write_file.write('\x1e{"bad json"\n')
+        write_file.write('\x1e"%s"\n' % ("x" * 200))
+        write_file.write('\x1e"fine"\n')
+        write_file.flush()
+
+        self.assertRaises(ValueError, parser.next)
+        self.assertRaises(ValueError, parser.next)
+        self.assertRaises(ValueError, parser.next)
+        self.assertEqual(parser(), "fine")
+
+        write_file.close()
+        read_file.close()
+
+    def test_rfc7464_mixed_sizes(self):
+        """Streaming JSON with small records between large ones"""
+
+        read_file, write_file = self.pipe()
+        parser = RFC7464Parser(read_file, timeout=5)
+        emitter = RFC7464Emitter(write_file, timeout=5)
+
+        small = { "succeeded": True, "result": [ 1.5, 2.5, "three" ] }
+        large = { "raw": [ { "interval": n, "bytes": n * 1000 }
+                           for n in range(0, 10000) ] }
+        docs = [ small ] * 100 + [ large ] + [ small ] * 100 + [ large ] * 2
+
+        # The pipe holds less than a large record, so this has to be
+        # written while it's being read.
+        def write():
+            for doc in docs:
+                emitter(doc)
+            write_file.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+
+        for doc in docs:
+            self.assertEqual(parser(), doc)
+
+        writer.join()
+        self.assertRaises(StopIteration, parser.next)
+        read_file.close()
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,11 +2,52 @@
 test for the psurl module.
 """
 
+import BaseHTTPServer
+import SocketServer
+import threading
+import time
 import unittest
 
 from base_test import PschedTestBase
 
 from pscheduler.psurl import *
+from pscheduler.psurl import _url_pool_key
+
+class EchoHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers with the method, path and body after an optional delay"""
+
+    def __answer(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else ""
+        if "redirect" in self.path:
+            self.send_response(302)
+            self.send_header("Location", "/fast")
+            self.send_header("X-Redirected", "yes")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if "slow" in self.path:
+            time.sleep(0.5)
+        text = '{"method": "%s", "path": "%s", "body": "%s"}' % (
+            self.command, self.path, body.replace('"', "'"))
+        self.send_response(404 if "missing" in self.path else 200)
+        self.send_header("Content-Length", str(len(text)))
+        self.send_header("Cache-Control", "max-age=30")
+        self.end_headers()
+        self.wfile.write(text)
+
+    do_GET = __answer
+    do_POST = __answer
+    do_DELETE = __answer
+
+    def log_message(self, *args):
+        pass
+
+
+class EchoServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
 
 class TestPsurl(PschedTestBase):
     """
@@ -58,6 +99,108 @@ class TestPsurl(PschedTestBase):
         )
 
 
+    def test_handle_pool(self):
+        """Handle reuse, caps and expiration"""
+        pool = CurlHandlePool(max_per_host=1, idle_time=60)
+        key = _url_pool_key("https://host.example.com/tasks", None)
+        self.assertEqual(key, ("https", "host.example.com", None, None))
+
+        first = pool.get(key)
+        second = pool.get(key)
+        pool.put(key, first)
+        pool.put(key, second)  # Over the cap; closed
+        self.assertIs(pool.get(key), first)
+        self.assertEqual(pool.stats()["closed"], 1)
+
+        # Different binds don't share
+        pool.put(key, first)
+        other = pool.get(_url_pool_key("https://host.example.com/", "192.0.2.1"))
+        self.assertIsNot(other, first)
+
+        # Failed handles are discarded
+        pool.put(key, pool.get(key), discard=True)
+        self.assertEqual(pool.stats()["idle"], 0)
+
+        # Stale handles aren't handed out
+        pool = CurlHandlePool(idle_time=0)
+        handle = pool.get(key)
+        pool.put(key, handle)
+        time.sleep(0.01)
+        self.assertIsNot(pool.get(key), handle)
+
+
+    def test_url_many(self):
+        """Batched requests"""
+
+        server = EchoServer(("127.0.0.1", 0), EchoHandler)
+        worker = threading.Thread(target=server.serve_forever)
+        worker.setDaemon(True)
+        worker.start()
+        base = "http://127.0.0.1:%d" % (server.server_address[1])
+
+        try:
+            # Ordering follows the URLs, not completion
+            started = time.time()
+            results = url_get_many(["%s/slow1" % base, "%s/fast" % base,
+                                    "%s/slow2" % base, "%s/missing" % base])
+            self.assertTrue(time.time() - started < 1.0)
+            self.assertEqual([ status for status, _ in results ],
+                             [200, 200, 200, 404])
+            self.assertEqual([ result["path"] for _, result in results[:3] ],
+                             ["/slow1", "/fast", "/slow2"])
+
+            # Per-request parameters and timeouts
+            results = url_get_many(["%s/a" % base, "%s/slow" % base],
+                                   params=[{"x": 1}, None], timeout=0.2)
+            self.assertEqual(results[0][1]["path"], "/a?x=1")
+            self.assertEqual(results[1][0], 400)
+
+            self.assertRaises(ValueError, url_get_many, ["%s/a" % base],
+                              params=[None, None])
+            self.assertEqual(url_get_many([]), [])
+
+            results = url_post_many(["%s/p1" % base, "%s/p2" % base],
+                                    data=["one", "two"], json=True)
+            self.assertEqual([ (r["method"], r["body"]) for _, r in results ],
+                             [("POST", "one"), ("POST", "two")])
+
+            results = url_delete_list(["%s/d1" % base, "%s/missing" % base])
+            self.assertEqual([ status for status, _ in results ], [200, 404])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+    def test_url_get_headers(self):
+        """Response headers"""
+
+        server = EchoServer(("127.0.0.1", 0), EchoHandler)
+        worker = threading.Thread(target=server.serve_forever)
+        worker.setDaemon(True)
+        worker.start()
+        base = "http://127.0.0.1:%d" % (server.server_address[1])
+
+        try:
+            headers = {}
+            status, result = url_get("%s/fast" % base,
+                                     response_headers=headers)
+            self.assertEqual(status, 200)
+            self.assertEqual(result["path"], "/fast")
+            self.assertEqual(headers["cache-control"], "max-age=30")
+
+            # Only the last response's headers are kept
+            headers = {}
+            status, result = url_get("%s/redirect" % base,
+                                     response_headers=headers)
+            self.assertEqual(result["path"], "/fast")
+            self.assertFalse("x-redirected" in headers)
+            self.assertFalse("location" in headers)
+            self.assertEqual(headers["cache-control"], "max-age=30")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
     def test_url_put(self):
         # TODO: Would need a web server to test this
         pass
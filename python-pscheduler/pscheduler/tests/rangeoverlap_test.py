@@ -0,0 +1,149 @@
+"""
+test for the Rangeoverlap module.
+"""
+
+import datetime
+import random
+import unittest
+
+from base_test import PschedTestBase
+
+from pscheduler.rangeoverlap import Range, find_overlaps
+
+
+def pairwise_overlaps(range_lists):
+    """
+    The original implementation, which compares every range in each
+    list against every range in the others.
+    """
+
+    sets = len(range_lists)
+
+    if sets == 0:
+        return []
+
+    if sets == 1:
+        return sorted(range_lists[0])
+
+    if sets == 2:
+        return sorted([
+            overlap
+            for item in range_lists[0]
+            for overlap in item.overlaps(range_lists[1])
+        ])
+
+    return sorted(pairwise_overlaps(
+        range_lists[0:-2] + [ pairwise_overlaps(range_lists[-2:]) ]
+    ))
+
+
+def as_tuples(ranges):
+    """Sorted bounds of a list of ranges, for comparison"""
+    return sorted([ (item.lower, item.upper) for item in ranges ])
+
+
+class TestRangeoverlap(PschedTestBase):
+    """
+    Rangeoverlap tests.
+    """
+
+    def test_range(self):
+        """Basic range operations"""
+        self.assertEqual(Range(10, 5).lower, 5)
+        self.assertEqual(Range(5, 10).length(), 5)
+        self.assertEqual(repr(Range(5, 10) | Range(7, 20)), "R(7..10)")
+        self.assertEqual(repr(Range(5, 10) | Range(10, 20)), "R(10..10)")
+        self.assertIsNone(Range(5, 10) | Range(11, 20))
+        self.assertEqual(
+            as_tuples(Range(5, 10).overlaps([Range(1, 2), Range(8, 12)])),
+            [ (8, 10) ])
+
+    def test_docstring_example(self):
+        """The example in find_overlaps' documentation"""
+        result = find_overlaps([
+            [ Range(10, 50), Range(60, 77), Range(80, 90) ],
+            [ Range(10, 12), Range(15, 20), Range(20, 25), Range(51, 54),
+              Range(65, 74), Range(81, 100) ],
+            [ Range(22, 27), Range(65, 77), Range(82, 89) ],
+            [ Range(1, 1000) ]
+        ])
+        self.assertEqual(as_tuples(result),
+                         [ (22, 25), (65, 74), (82, 89) ])
+
+    def test_edges(self):
+        """Empty input, single lists and touching ranges"""
+        self.assertEqual(find_overlaps([]), [])
+        self.assertEqual(find_overlaps([ [] ]), [])
+        self.assertEqual(find_overlaps([ [ Range(1, 2) ], [] ]), [])
+        self.assertEqual(
+            as_tuples(find_overlaps([ [ Range(5, 6), Range(1, 2) ] ])),
+            [ (1, 2), (5, 6) ])
+        self.assertEqual(
+            as_tuples(find_overlaps([ [ Range(1, 5) ], [ Range(5, 9) ] ])),
+            [ (5, 5) ])
+
+    def test_times(self):
+        """Ranges of datetimes"""
+        start = datetime.datetime(2020, 1, 1)
+        hour = datetime.timedelta(hours=1)
+        result = find_overlaps([
+            [ Range(start, start + 3 * hour) ],
+            [ Range(start + hour, start + 5 * hour) ]
+        ])
+        self.assertEqual(as_tuples(result),
+                         [ (start + hour, start + 3 * hour) ])
+
+    def test_matches_pairwise(self):
+        """Same results as the pairwise implementation on random input"""
+
+        generator = random.Random(8675309)
+
+        def random_list(count, span, fragmented):
+            ranges = []
+            for _ in range(count):
+                lower = generator.randint(0, span)
+                if fragmented:
+                    # Disjoint-ish, like a busy host's free time
+                    upper = lower + generator.randint(0, 20)
+                else:
+                    upper = generator.randint(0, span)
+                ranges.append(Range(lower, upper))
+            return ranges
+
+        for trial in range(300):
+            participants = generator.randint(0, 5)
+            fragmented = generator.random() < 0.5
+            # Wide ranges overlap almost everything, so keep those lists
+            # short enough that the combinations stay manageable.
+            count = 15 if fragmented else 5
+            range_lists = [
+                random_list(generator.randint(0, count), 200, fragmented)
+                for _ in range(participants)
+            ]
+            self.assertEqual(as_tuples(find_overlaps(range_lists)),
+                             as_tuples(pairwise_overlaps(range_lists)),
+                             "Mismatch for %s" % (range_lists))
+
+    def test_results_are_sorted_and_contained(self):
+        """Results are sorted and inside a range from every list"""
+
+        generator = random.Random(1234)
+
+        for trial in range(100):
+            range_lists = [
+                [ Range(generator.randint(0, 500), generator.randint(0, 500))
+                  for _ in range(generator.randint(1, 6)) ]
+                for _ in range(generator.randint(1, 5))
+            ]
+            result = find_overlaps(range_lists)
+            self.assertEqual(result, sorted(result))
+            for item in result:
+                for range_list in range_lists:
+                    self.assertTrue(any(
+                        candidate.lower <= item.lower
+                        and item.upper <= candidate.upper
+                        for candidate in range_list))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+test for the Runschedule limit module.
+"""
+
+import datetime
+import random
+import unittest
+
+import dateutil.tz
+
+from base_test import PschedTestBase
+
+from pscheduler.limitprocessor.limit.runschedule import \
+    FIELDS, LimitRunSchedule, wrappable_range_overlaps, range_mask
+
+
+def mask(values):
+    result = 0
+    for value in values:
+        result |= 1 << value
+    return result
+
+
+def reference_failures(data, start, end):
+    """
+    Check a run the slow way, with sets of every value in each range.
+    """
+    failures = []
+    for name, value, wrap_after, wrap_to, _ in FIELDS:
+        if name not in data:
+            continue
+        allowed = set()
+        for item in data[name]:
+            if isinstance(item, dict):
+                allowed |= set(range(item["lower"], item["upper"] + 1))
+            else:
+                allowed.add(item)
+        lower, upper = value(start), value(end)
+        if upper >= lower:
+            run = set(range(lower, upper + 1))
+        else:
+            run = set(range(lower, wrap_after + 1)) \
+                  | set(range(wrap_to, upper + 1))
+        if data.get("overlap", False):
+            passed = bool(run & allowed)
+        else:
+            passed = run <= allowed
+        if not passed:
+            failures.append(name)
+    return failures
+
+
+def proposal(start, duration):
+    return { "task": { "run_schedule": {
+        "start": start.isoformat(),
+        "duration": "PT%dS" % (duration.total_seconds())
+    } } }
+
+
+class TestRunschedule(PschedTestBase):
+    """
+    Runschedule tests.
+    """
+
+    def setUp(self):
+        self.generator = random.Random(8675309)
+        self.zone = dateutil.tz.tzoffset(None, -4 * 3600)
+
+    def random_data(self):
+        generator = self.generator
+        data = { "overlap": generator.random() < 0.5 }
+        if generator.random() < 0.6:
+            data["hour"] = [ generator.randint(0, 23),
+                             { "lower": generator.randint(0, 10),
+                               "upper": generator.randint(8, 23) } ]
+        if generator.random() < 0.6:
+            data["minute"] = [ generator.randint(0, 59)
+                               for _ in range(generator.randint(1, 5)) ]
+        if generator.random() < 0.4:
+            data["weekday"] = [ { "lower": generator.randint(1, 4),
+                                  "upper": generator.randint(3, 7) } ]
+        if generator.random() < 0.3:
+            data["second"] = [ { "lower": generator.randint(0, 30),
+                                 "upper": generator.randint(20, 59) } ]
+        return data
+
+    def test_masks(self):
+        """Range masks and overlap checks"""
+        self.assertEqual(range_mask(2, 4), mask([ 2, 3, 4 ]))
+        self.assertEqual(range_mask(0, 0), 1)
+        self.assertTrue(wrappable_range_overlaps(3, 5, mask(range(0, 10))))
+        self.assertFalse(wrappable_range_overlaps(3, 5, mask([ 3, 5 ])))
+        self.assertTrue(wrappable_range_overlaps(3, 5, mask([ 4 ]),
+                                                 overlap=True))
+        self.assertRaises(ValueError, wrappable_range_overlaps, 3, 5, set([4]))
+        self.assertRaises(ValueError, wrappable_range_overlaps, 3, 60, 0)
+
+    def test_wrap(self):
+        """Ranges that wrap include the values on both sides"""
+        # Minutes 58 through 2
+        self.assertTrue(wrappable_range_overlaps(
+            58, 2, mask([ 58, 59, 0, 1, 2 ])))
+        self.assertFalse(wrappable_range_overlaps(
+            58, 2, mask([ 58, 59, 0 ])))
+        self.assertTrue(wrappable_range_overlaps(
+            58, 2, mask([ 2 ]), overlap=True))
+        # Months November through February
+        self.assertTrue(wrappable_range_overlaps(
+            11, 2, mask([ 11, 12, 1, 2 ]), wrap_after=12, wrap_to=1))
+        self.assertFalse(wrappable_range_overlaps(
+            11, 2, mask([ 0, 11, 12, 1 ]), wrap_after=12, wrap_to=1))
+
+        limit = LimitRunSchedule({ "minute": [ 58, 59, 0, 1, 2 ] })
+        start = datetime.datetime(2020, 1, 1, 10, 58, 30, tzinfo=self.zone)
+        self.assertTrue(limit.evaluate(
+            proposal(start, datetime.timedelta(minutes=4)))["passed"])
+        self.assertEqual(limit.evaluate(
+            proposal(start, datetime.timedelta(minutes=5))),
+                         { "passed": False, "reasons": [ "Mismatch on minute" ] })
+
+    def test_matches_reference(self):
+        """Same results as checking sets on random input"""
+        base = datetime.datetime(2020, 12, 30, tzinfo=self.zone)
+        for _ in range(2000):
+            data = self.random_data()
+            limit = LimitRunSchedule(data)
+            start = base + datetime.timedelta(
+                seconds=self.generator.randint(0, 10 ** 7))
+            duration = datetime.timedelta(
+                seconds=self.generator.randint(0, 20000))
+            self.assertEqual(
+                limit.evaluate(proposal(start, duration))["passed"],
+                not reference_failures(data, start, start + duration),
+                "Mismatch for %s at %s for %s" % (data, start, duration))
+
+    def test_next_permitted(self):
+        """Same results as trying every second"""
+        base = datetime.datetime(2020, 12, 30, tzinfo=self.zone)
+        second = datetime.timedelta(seconds=1)
+        for _ in range(10):
+            data = self.random_data()
+            limit = LimitRunSchedule(data)
+            start = base + datetime.timedelta(
+                seconds=self.generator.randint(0, 10 ** 6))
+            duration = datetime.timedelta(
+                seconds=self.generator.randint(0, 5000))
+            latest = start + datetime.timedelta(hours=4)
+
+            expected = start
+            while expected <= latest \
+                  and reference_failures(data, expected, expected + duration):
+                expected += second
+            if expected > latest:
+                expected = None
+
+            self.assertEqual(limit.next_permitted(start, duration, latest),
+                             expected,
+                             "Mismatch for %s at %s for %s"
+                             % (data, start, duration))
+
+    def test_next_permitted_simple(self):
+        """Skipping to the next permitted window"""
+        limit = LimitRunSchedule({ "hour": [ 9 ], "minute": [ 30 ] })
+        start = datetime.datetime(2020, 1, 1, 10, 0, tzinfo=self.zone)
+        duration = datetime.timedelta(seconds=30)
+        self.assertEqual(
+            limit.next_permitted(start, duration,
+                                 start + datetime.timedelta(days=2)),
+            datetime.datetime(2020, 1, 2, 9, 30, tzinfo=self.zone))
+        self.assertIsNone(
+            limit.next_permitted(start, duration,
+                                 start + datetime.timedelta(hours=12)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+test for the TimerQueue module.
+"""
+
+import threading
+import unittest
+
+from base_test import PschedTestBase
+
+from pscheduler.timerqueue import TimerQueue
+
+
+class FakeClock(object):
+    """Clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimerQueue(PschedTestBase):
+    """
+    TimerQueue tests.
+    """
+
+    def test_order(self):
+        """Functions are called in order of due time"""
+        clock = FakeClock()
+        queue = TimerQueue(clock=clock)
+        called = []
+
+        queue.add(lambda: called.append("b"), delay=2)
+        queue.add(lambda: called.append("a"), delay=1)
+        queue.add(lambda: called.append("c"), delay=2)
+
+        self.assertEqual(queue.run_due(), 1)
+        self.assertEqual(called, [])
+
+        clock.now += 2
+        self.assertEqual(queue.run_due(), None)
+        self.assertEqual(called, ["a", "b", "c"])
+        self.assertEqual(len(queue), 0)
+
+    def test_reschedule(self):
+        """Returned delays reschedule, None drops out"""
+        clock = FakeClock()
+        queue = TimerQueue(clock=clock)
+        called = []
+        limited_calls = []
+
+        def limited():
+            called.append(clock.now)
+            limited_calls.append(clock.now)
+            return 5 if len(limited_calls) < 3 else None
+
+        queue.add(limited)
+        queue.every(3, lambda: called.append("every"), delay=3)
+
+        self.assertEqual(queue.run_due(), 3)
+        clock.now += 3
+        self.assertEqual(queue.run_due(), 2)
+        clock.now += 2
+        self.assertEqual(queue.run_due(), 1)
+        clock.now += 5
+        queue.run_due()
+        self.assertEqual(called, [1000.0, "every", 1005.0, "every", 1010.0])
+        self.assertEqual(len(queue), 1)
+
+    def test_run(self):
+        """Real-time running and stopping"""
+        queue = TimerQueue()
+        done = threading.Event()
+
+        queue.add(lambda: done.set(), delay=0.05)
+        queue.add(lambda: queue.stop(), delay=0.1)
+
+        runner = threading.Thread(target=queue.run)
+        runner.start()
+        runner.join(5)
+
+        self.assertFalse(runner.is_alive())
+        self.assertTrue(done.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+"""
+test for the Urlfetch limit module.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import threading
+import time
+import unittest
+
+from base_test import PschedTestBase
+
+from pscheduler.limitprocessor.limit.urlfetch import \
+    LimitURLFetch, URLFetchCache, _response_lifetimes
+
+
+class Fetcher(object):
+    """Fetch function that hands back canned responses and counts calls"""
+
+    def __init__(self, status=200, headers={}):
+        self.status = status
+        self.headers = headers
+        self.calls = 0
+        self.called = threading.Event()
+
+    def __call__(self, url, headers, params):
+        self.calls += 1
+        self.called.set()
+        return (self.status, "%s %d" % (url, self.calls), dict(self.headers))
+
+
+class AuthorizationHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Approves everything, allowing caching for a minute"""
+
+    requests = 0
+
+    def do_GET(self):
+        AuthorizationHandler.requests += 1
+        text = '{"result": true}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(text)))
+        self.send_header("Cache-Control", "max-age=60")
+        self.end_headers()
+        self.wfile.write(text)
+
+    def log_message(self, *args):
+        pass
+
+
+class AuthorizationServer(SocketServer.ThreadingMixIn,
+                          BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+
+class TestUrlfetch(PschedTestBase):
+    """
+    Urlfetch tests.
+    """
+
+    def test_lifetimes(self):
+        """Cache lifetimes from response headers"""
+        self.assertEqual(_response_lifetimes({}, 0), (None, None))
+        self.assertEqual(_response_lifetimes(
+            {"cache-control": "max-age=30, stale-while-revalidate=5"}, 0),
+                         (30, 5))
+        self.assertEqual(_response_lifetimes(
+            {"cache-control": "s-maxage=10, max-age=30"}, 0), (10, None))
+        self.assertEqual(_response_lifetimes(
+            {"cache-control": "no-store, max-age=30"}, 0), (0, None))
+        self.assertEqual(_response_lifetimes(
+            {"cache-control": "no-cache"}, 0), (0, None))
+        self.assertEqual(_response_lifetimes(
+            {"expires": "Thu, 01 Jan 1970 00:01:40 GMT"}, 50), (50, None))
+        self.assertEqual(_response_lifetimes(
+            {"expires": "Thu, 01 Jan 1970 00:01:40 GMT"}, 500), (0, None))
+        self.assertEqual(_response_lifetimes({"expires": "garbage"}, 50),
+                         (0, None))
+        # Cache-Control wins over Expires
+        self.assertEqual(_response_lifetimes(
+            {"cache-control": "max-age=5",
+             "expires": "Thu, 01 Jan 1970 00:01:40 GMT"}, 0), (5, None))
+
+    def test_cache(self):
+        """Responses are cached by URL, headers and parameters"""
+        fetcher = Fetcher()
+        cache = URLFetchCache(fetcher, 60, 0, 0)
+        first = cache.get("http://a", {"h": 1}, {"p": 1})
+        self.assertEqual(cache.get("http://a", {"h": 1}, {"p": 1}), first)
+        self.assertEqual(fetcher.calls, 1)
+        cache.get("http://a", {"h": 2}, {"p": 1})
+        cache.get("http://a", {"h": 1}, {"p": 2})
+        cache.get("http://b", {"h": 1}, {"p": 1})
+        self.assertEqual(fetcher.calls, 4)
+
+    def test_cache_headers(self):
+        """Response headers override the configured TTL"""
+        fetcher = Fetcher(headers={"cache-control": "no-store"})
+        cache = URLFetchCache(fetcher, 60, 0, 0)
+        cache.get("http://a", {}, {})
+        cache.get("http://a", {}, {})
+        self.assertEqual(fetcher.calls, 2)
+
+        fetcher = Fetcher(headers={"cache-control": "max-age=60"})
+        cache = URLFetchCache(fetcher, 0, 0, 0)
+        cache.get("http://a", {}, {})
+        cache.get("http://a", {}, {})
+        self.assertEqual(fetcher.calls, 1)
+
+    def test_cache_failures(self):
+        """Failures are cached for their own TTL"""
+        fetcher = Fetcher(status=500, headers={"cache-control": "max-age=60"})
+        cache = URLFetchCache(fetcher, 60, 0, 0)
+        cache.get("http://a", {}, {})
+        cache.get("http://a", {}, {})
+        self.assertEqual(fetcher.calls, 2)
+
+        cache = URLFetchCache(fetcher, 0, 60, 0)
+        cache.get("http://a", {}, {})
+        cache.get("http://a", {}, {})
+        self.assertEqual(fetcher.calls, 3)
+
+    def test_cache_size(self):
+        """The oldest responses are dropped when the cache is full"""
+        fetcher = Fetcher()
+        cache = URLFetchCache(fetcher, 60, 0, 0, size=2)
+        for url in [ "http://a", "http://b", "http://c", "http://c" ]:
+            cache.get(url, {}, {})
+        self.assertEqual(len(cache.items), 2)
+        self.assertEqual(fetcher.calls, 3)
+        cache.get("http://a", {}, {})
+        self.assertEqual(fetcher.calls, 4)
+
+    def test_cache_stale(self):
+        """Expired responses are served while being refreshed"""
+        fetcher = Fetcher(headers={
+            "cache-control": "max-age=0, stale-while-revalidate=60"})
+        cache = URLFetchCache(fetcher, 60, 0, 0)
+
+        # A lifetime of zero isn't cached at all.
+        cache.get("http://a", {}, {})
+        self.assertEqual(len(cache.items), 0)
+
+        fetcher.headers = {}
+        cache = URLFetchCache(fetcher, 60, 0, 60)
+        first = cache.get("http://a", {}, {})
+
+        # Make the entry expired but still usable.
+        key = cache.items.keys()[0]
+        expires, stale_until, response = cache.items[key]
+        cache.items[key] = (time.time() - 1, stale_until, response)
+
+        fetcher.called.clear()
+        self.assertEqual(cache.get("http://a", {}, {}), first)
+        self.assertTrue(fetcher.called.wait(5))
+        for _ in range(100):
+            if cache.items[key][2] != first:
+                break
+            time.sleep(0.05)
+        self.assertNotEqual(cache.get("http://a", {}, {}), first)
+
+    def test_limit(self):
+        """The limit only asks the server once while it may cache"""
+
+        server = AuthorizationServer(("127.0.0.1", 0), AuthorizationHandler)
+        worker = threading.Thread(target=server.serve_forever)
+        worker.setDaemon(True)
+        worker.start()
+
+        try:
+            limit = LimitURLFetch({
+                "url": "http://127.0.0.1:%d/authorize"
+                % (server.server_address[1]),
+                "params-transform": {
+                    "script": ".params.requester = hint(\"requester\")"
+                },
+                "cache": { "failure-ttl": "PT1M" }
+            })
+
+            AuthorizationHandler.requests = 0
+            for requester in [ "192.0.2.1", "192.0.2.1", "192.0.2.2" ]:
+                self.assertEqual(limit.evaluate({
+                    "task": { "test": { "type": "rtt", "spec": {} } },
+                    "hints": { "requester": requester }
+                }), { "passed": True })
+            self.assertEqual(AuthorizationHandler.requests, 2)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()